@@ -0,0 +1,93 @@
+"""Agendador em segundo plano que renova os caches antes de expirarem.
+
+Roda fora do caminho das requisições: a cada ciclo, toda tarefa cuja entrada
+já passou de ``1 - antecedencia`` do TTL é recarregada, de modo que as
+sessões encontram o cache sempre quente (inclusive na virada da abertura).
+Tarefas cuja última busca falhou (falha ainda em cache, ver ``ttl_falha``) ficam
+de fora até a falha expirar, em vez de baterem na fonte a cada ciclo.
+
+Tarefas agendadas com ``grupo`` (ex.: o universo da B3 completa, caro de manter) só
+rodam enquanto alguma sessão tiver pedido aquele grupo (:meth:`Agendador.solicitar`)
+há menos de ``validade_demanda`` segundos: um processo que ninguém usa com a B3
+completa não aquece a B3 completa.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# Tempo (s) que um grupo continua aquecido depois do último pedido de uma sessão
+VALIDADE_DEMANDA = 30 * 60
+
+
+class Agendador:
+    """Mantém quentes as entradas de funções decoradas com ``cache.cacheado``."""
+
+    def __init__(self, intervalo=5, antecedencia=0.2, max_paralelo=4, validade_demanda=VALIDADE_DEMANDA):
+        self.intervalo = intervalo
+        self.antecedencia = antecedencia
+        self.validade_demanda = validade_demanda
+        self.tarefas = []
+        # Grupo -> instante (time.monotonic) do último pedido de uma sessão
+        self._demandas = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix="agendador")
+        self._parar = threading.Event()
+        self._thread = None
+
+    def agendar(self, func, *args, grupo=None):
+        """Registra uma chamada (função cacheada + argumentos) para manter aquecida.
+
+        Com `grupo`, a chamada só é renovada enquanto o grupo estiver solicitado.
+        """
+        self.tarefas.append((func, args, grupo))
+
+    def solicitar(self, grupo):
+        """Marca `grupo` como em uso agora (chamado pelas sessões a cada execução)."""
+        self._demandas[grupo] = time.monotonic()
+
+    def _em_demanda(self, grupo, agora):
+        if grupo is None:
+            return True
+        pedido_em = self._demandas.get(grupo)
+        return pedido_em is not None and agora - pedido_em < self.validade_demanda
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="agendador-cache", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            self.ciclo()
+            self._parar.wait(self.intervalo)
+
+    def ciclo(self):
+        """Recarrega (em paralelo) as tarefas vencidas ou perto de vencer.
+
+        Ficam de fora as com falha em cache e as de grupos que nenhuma sessão pediu recentemente.
+        """
+        agora = time.monotonic()
+        vencidas = []
+        for func, args, grupo in self.tarefas:
+            if not self._em_demanda(grupo, agora):
+                continue
+            idade = func.idade(*args)
+            if idade is not None and idade < func.ttl * (1 - self.antecedencia):
+                continue
+            if func.em_falha(*args):
+                continue
+            vencidas.append(self._pool.submit(self._recarregar, func, args))
+        wait(vencidas)
+
+    @staticmethod
+    def _recarregar(func, args):
+        try:
+            func.recarregar(*args)
+        except Exception as e:
+            logger.warning("Falha ao pré-aquecer %s%s: %s", func.__name__, args, e)
@@ -1,23 +1,36 @@
 
  
+import os
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-from GoogleNews import GoogleNews
-from datetime import datetime
+import altair as alt
 import numpy as np
-
-# --- HELPER: GARANTE O SUFIXO .SA ---
-def get_yf_ticker(ticker):
-    """Garante o sufixo .SA para B3, mas respeita tickers internacionais (ex: AAPL)."""
-    ticker = str(ticker).upper() 
-    
-    # Se o ticker já contiver um ponto (ex: AAPL, .SA), retorna como está
-    if '.' in ticker:
-        return ticker
-    
-    # Adiciona .SA por padrão (para tickers B3)
-    return f"{ticker}.SA"
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metricas
+from agendador import Agendador
+from cliente_upstream import FalhaUpstream
+from fundamentos import obter_fundamentos
+from intraday import CotacoesIntraday, INTERVALO_PADRAO as INTERVALO_INTRADAY, FUSO_B3, intervalo_minimo
+from simbolos import obter_simbolos, eh_externo, eh_codigo_b3, normalizar_codigo
+from nucleo import (
+    tickers_monitor,
+    carregar_universo_b3,
+    carregar_dados_mercado,
+    carregar_sinais_mercado,
+    carregar_top_dividend_yield,
+    carregar_ranking_sentimento,
+    carregar_serie_sentimento,
+    atualizar_fundamentos_mercado,
+    buscar_noticias_e_sentimento,
+    carregar_dados_dividendos,
+    carregar_historico_curto,
+    carregar_info_ativo,
+    calcular_sinal_mms20,
+    calcular_rsi,
+    calcular_sinal_rsi,
+)
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Monitor B3", layout="wide")
@@ -47,272 +60,125 @@ with st.sidebar:
 # --- DISCLAIMER (REFORÇO DA RESPONSABILIDADE) ---
 st.warning("⚠️ **Disclaimer:** Este monitor é apenas uma ferramenta de visualização de dados de mercado e notícias. Ele **não constitui recomendação de investimento**. O investidor é totalmente responsável por suas decisões.")
 
-# --- LISTA DE AÇÕES PARA MONITORAR ---
-tickers_monitor = [
-    'PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'BBAS3.SA',
-    'MGLU3.SA', 'VIIA3.SA', 'HAPV3.SA', 'WEGE3.SA', 'RENT3.SA',
-    'PRIO3.SA', 'SUZB3.SA', 'GGBR4.SA', 'CSNA3.SA', 'ELET3.SA'
-]
-
-# --- FUNÇÃO OTIMIZADA PARA PEGAR DADOS DE COTAÇÃO (Calculo de variação com Pandas) ---
-@st.cache_data(ttl=300) 
-def carregar_dados_mercado(lista_tickers):
-    dados = []
-    
-    try:
-        df_historico = yf.download(lista_tickers, period="2d", progress=False)['Close']
-        df_historico = df_historico.dropna(axis=1, how='all')
-    except Exception as e:
-        st.error(f"Erro ao carregar dados do yfinance: {e}")
-        return pd.DataFrame()
-    
-    if len(df_historico) >= 2:
-        variacoes = df_historico.pct_change().iloc[-1] * 100 
-        precos_atuais = df_historico.iloc[-1]
-    elif len(df_historico) == 1:
-        variacoes = pd.Series(0.0, index=df_historico.columns)
-        precos_atuais = df_historico.iloc[-1]
-    else:
-        return pd.DataFrame() 
-        
-    for ticker in df_historico.columns:
-        preco = precos_atuais.get(ticker)
-        variacao = variacoes.get(ticker)
-
-        if pd.isna(preco) or pd.isna(variacao):
-             continue
-            
-        dados.append({
-            "Ativo": ticker.replace(".SA", ""),
-            "Preço (R$)": round(preco, 2),
-            "Variação %": round(variacao, 2),
-        })
-            
-    df = pd.DataFrame(dados)
-    return df
-
-# --- FUNÇÃO DE ANÁLISE DE SENTIMENTO (SIMULADA) OTIMIZADA ---
-def analisar_sentimento_noticia(titulo):
-    """Classifica o sentimento do título da notícia com termos mais focados em eventos corporativos."""
-    titulo = titulo.lower()
-    
-    # Palavras-chave Positivas (Score +1)
-    positivas = [
-        'alta', 'cresce', 'lucro', 'recorde', 'expansão', 'melhora', 
-        'ganhos', 'supera', 'dividendos', 'juros sobre capital próprio', 
-        'acordo', 'parceria', 'aprova', 'aquisição', 'receita'
-    ]
-    # Palavras-chave Negativas (Score -1)
-    negativas = [
-        'baixa', 'perdas', 'queda', 'cai', 'recuo', 'prejuízo', 'crise', 
-        'problemas', 'alerta', 'risco', 'investigação', 'multa', 'venda de controle', 
-        'rejeita', 'adiamento', 'dívida'
-    ]
-    
-    score = 0
-    for p in positivas:
-        if p in titulo:
-            score += 1
-    for n in negativas:
-        if n in titulo:
-            score -= 1 
-            
-    return score
-
-@st.cache_data(ttl=600) 
-def buscar_noticias_e_sentimento(termo):
-    """Busca notícias focadas em 'Fato Relevante' e calcula o sentimento médio."""
-    googlenews = GoogleNews(lang='pt', region='BR')
-    
-    query = f'"Fato Relevante" {termo} OR notícias {termo} B3'
-    googlenews.search(query) 
-    
-    results = googlenews.results(sort=True)
-    
-    noticias_detalhadas = []
-    scores = []
-    
-    for noticia in results[:7]:
-        score = analisar_sentimento_noticia(noticia.get('title', ''))
-        scores.append(score)
-        noticias_detalhadas.append({
-            **noticia,
-            "score": score
-        })
+# Linhas de referência do gráfico do IFR (uma tabela de duas linhas para todas as sessões)
+LIMITES_IFR = pd.DataFrame({"limite": ["Sobrecompra (70)", "Sobrevenda (30)"], "valor": [70, 30]})
+
+# --- CARGA CONCORRENTE DA TELA DE DETALHES ---
+# Tempo máximo (s) que a página espera por cada fonte antes de desistir da seção
+TIMEOUTS_DETALHE = {
+    "info": 15,
+    "dividendos": 15,
+    "historico": 20,
+    "noticias": 20,
+}
+
+@st.cache_resource
+def _pool_detalhes():
+    """Pool de threads compartilhado pelas sessões para o I/O da tela de detalhes."""
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="detalhes")
+
+def iniciar_carga_detalhes(ticker, com_info=True):
+    """Dispara ao mesmo tempo todas as cargas independentes do ativo e devolve os futures."""
+    fontes = {
+        "dividendos": carregar_dados_dividendos,
+        "historico": carregar_historico_curto,
+        "noticias": buscar_noticias_e_sentimento,
+    }
+    if com_info:
+        fontes["info"] = carregar_info_ativo
+    pool = _pool_detalhes()
+    return {nome: pool.submit(func, ticker) for nome, func in fontes.items()}
+
+def aguardar_detalhes(futuros, inicio):
+    """Gera (fonte, resultado) na ordem em que cada carga termina; resultado None indica falha ou timeout."""
+    pendentes = {futuro: nome for nome, futuro in futuros.items()}
+    
+    while pendentes:
+        agora = time.monotonic()
+        prazo_mais_proximo = min(inicio + TIMEOUTS_DETALHE[nome] for nome in pendentes.values())
+        prontos, _ = wait(pendentes, timeout=max(prazo_mais_proximo - agora, 0), return_when=FIRST_COMPLETED)
         
-    sentimento_medio = np.mean(scores) if scores else 0
-    
-    # Classificação final
-    if sentimento_medio > 0.3:
-        classificacao = "**Otimista**"
-        emoji = "🟢"
-    elif sentimento_medio < -0.3:
-        classificacao = "**Pessimista**"
-        emoji = "🔴"
-    else:
-        classificacao = "**Neutro**"
-        emoji = "🟡"
-        
-    return noticias_detalhadas, classificacao, emoji
-
-# --- FUNÇÕES PARA DIVIDENDOS E FUNDAMENTOS ---
-@st.cache_data(ttl=3600 * 4) 
-def carregar_dados_dividendos(ticker):
-    try: 
-        ticker_yf = get_yf_ticker(ticker)
-        ativo = yf.Ticker(ticker_yf)
-        
-        preco_atual = ativo.fast_info.get('last_price') 
-        if preco_atual is None:
-            preco_atual = ativo.fast_info.get('regular_market_price', 0)
-        
-        one_year_ago = datetime.now() - pd.DateOffset(years=1)
-        actions_df = ativo.actions
-        if actions_df.empty:
-            total_pago, dy_anual = 0, 0
-        else:
-            # Esta seção estava correta, garantindo que o loc[] funcionasse
-            dividendos_df = actions_df.loc[actions_df.index >= one_year_ago]
-            pagamentos = dividendos_df[dividendos_df['Dividends'] > 0]
-            total_pago = pagamentos['Dividends'].sum()
-            
-            dy_anual = 0
-            if preco_atual and preco_atual != 0:
-                dy_anual = (total_pago / preco_atual) * 100
-                
-        return preco_atual, total_pago, dy_anual 
-        
-    except Exception: 
-        return 0, 0, 0
-        
-@st.cache_data(ttl=3600 * 4) 
-def carregar_fundamentos_essenciais(ticker):
-    try:
-        ticker_yf = get_yf_ticker(ticker)
-        ativo = yf.Ticker(ticker_yf)
-        info = ativo.info
-        
-        pl = info.get('forwardPE') if info.get('forwardPE') is not None else info.get('trailingPE')
-        pvpa = info.get('priceToBook')
-        vpa = info.get('bookValue')
-        
-        return pl, pvpa, vpa
-    except Exception:
-        return None, None, None
-
-# --- FUNÇÕES PARA O INDICADOR MMS 20 (CURTO PRAZO) ---
-@st.cache_data(ttl=3600) 
-def carregar_historico_curto(ticker, dias=30):
-    """Carrega dados para calcular indicadores de curto prazo (MMS 20 e IFR)."""
-    ticker_yf = get_yf_ticker(ticker) 
-    # Usa '6mo' (6 meses) para garantir que temos dados suficientes para IFR (14 dias) e MMS (20 dias)
-    try:
-        # Retorna a série de Fechamento (Close)
-        data = yf.download(ticker_yf, period="6mo", progress=False)['Close']
-        return data.dropna()
-    except Exception:
-        return pd.Series(dtype=float) 
-
-def calcular_sinal_mms20(df_historico):
-    """Calcula e retorna o sinal de tendência com base na Média Móvel Simples de 20 dias."""
-    # 1. Checagem primária
-    if df_historico.empty or len(df_historico) < 20:
-        return "Dados Insuficientes para Análise", "⚪", pd.Series(dtype=float)
-
-    # 2. Cálculo da MMS 20
-    mms_20_series = df_historico.rolling(window=20).mean()
-    
-    # 3. Checagem se o cálculo resultou em algo (o último valor não pode ser NaN)
-    if mms_20_series.empty or pd.isna(mms_20_series.iloc[-1]).item():
-        return "Dados Insuficientes para Análise", "⚪", pd.Series(dtype=float)
-
-    # 4. Extração segura dos valores
-    try:
-        preco_atual = df_historico.iloc[-1].item()
-        mms_20 = mms_20_series.iloc[-1].item()
-    except Exception:
-        # Fallback de segurança se algo der errado na indexação
-        return "Erro de Indexação", "⚪", pd.Series(dtype=float)
-
-    # 5. Análise de Sinal
-    diff = (preco_atual - mms_20) / mms_20 * 100
-
-    if preco_atual > mms_20 * 1.01: 
-        sinal = f"**ALTA Confirmada** (Preço está {diff:.2f}% acima da MMS 20)"
-        emoji = "🟢"
-    elif preco_atual < mms_20 * 0.99: 
-        sinal = f"**QUEDA Confirmada** (Preço está {abs(diff):.2f}% abaixo da MMS 20)"
-        emoji = "🔴"
-    else:
-        sinal = f"**NEUTRO** (Preço está próximo da MMS 20)"
-        emoji = "🟡"
-        
-    return sinal, emoji, mms_20_series
-
-# --- FUNÇÕES PARA O INDICADOR IFR (Índice de Força Relativa) ---
-def calcular_rsi(df_historico, window=14):
-    """Calcula o Índice de Força Relativa (IFR) para uma janela (padrão 14)."""
-    if df_historico.empty or len(df_historico) < window + 1: 
-        return pd.Series(dtype=float), None
-
-    delta = df_historico.diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-
-    avg_gain = gain.ewm(com=window - 1, adjust=False).mean()
-    avg_loss = loss.ewm(com=window - 1, adjust=False).mean()
-
-    rs = avg_gain / avg_loss.replace(0, np.nan) 
-    rsi_series = 100 - (100 / (1 + rs))
-
-    # Tratamento seguro para extrair o valor escalar final
-    if not rsi_series.empty:
-        try:
-            # Garante que o último valor é um escalar (float)
-            rsi_last_value = rsi_series.iloc[-1].item() 
-            if not pd.isna(rsi_last_value):
-                rsi_atual = rsi_last_value
-            else:
-                rsi_atual = None
-        except (ValueError, IndexError, AttributeError): 
-            # Captura se .item() falhar ou se houver erro de indexação
-            rsi_atual = None
-    else:
-        rsi_atual = None
-    
-    return rsi_series, rsi_atual
-
-def calcular_sinal_rsi(rsi_atual):
-    """Interpreta o sinal de sobrecompra/sobrevenda do IFR."""
-    if pd.isna(rsi_atual) or rsi_atual is None:
-        return "Dados Insuficientes para IFR", "⚪"
-
-    if rsi_atual > 70:
-        sinal = f"**SOBRECOMPRA** (IFR = {rsi_atual:.2f}). Risco de correção."
-        emoji = "⚠️"
-    elif rsi_atual < 30:
-        sinal = f"**SOBREVENDA** (IFR = {rsi_atual:.2f}). Potencial de recuperação."
-        emoji = "📈"
-    else:
-        sinal = f"**NEUTRO** (IFR = {rsi_atual:.2f}). Sem sinal extremo de sobrecompra/venda."
-        emoji = "⚪"
+        for futuro in prontos:
+            nome = pendentes.pop(futuro)
+            try:
+                yield nome, futuro.result()
+            except Exception:
+                yield nome, None
         
-    return sinal, emoji
-
+        # Fontes que estouraram o prazo seguem em segundo plano (e aquecem o cache), mas a página não espera mais
+        agora = time.monotonic()
+        for futuro, nome in list(pendentes.items()):
+            if agora >= inicio + TIMEOUTS_DETALHE[nome]:
+                del pendentes[futuro]
+                yield nome, None
+
+# --- PRÉ-AQUECIMENTO DOS CACHES EM SEGUNDO PLANO ---
+GRUPO_B3 = "b3_completa"
+
+@st.cache_resource
+def iniciar_agendador():
+    """Um agendador por processo: mantém quentes o quadro de cotações e os detalhes das Blue Chips.
+
+    A B3 completa (centenas de tickers, .info diário de cada um) só é aquecida enquanto
+    alguma sessão deste processo estiver usando esse universo (grupo GRUPO_B3).
+    """
+    agendador = Agendador()
+    
+    for lista, grupo in ((tickers_monitor, None), (carregar_universo_b3(), GRUPO_B3)):
+        agendador.agendar(carregar_dados_mercado, lista, grupo=grupo)
+        agendador.agendar(carregar_sinais_mercado, lista, grupo=grupo)
+        agendador.agendar(carregar_top_dividend_yield, lista, grupo=grupo)
+        agendador.agendar(atualizar_fundamentos_mercado, lista, grupo=grupo)
+        agendador.agendar(carregar_ranking_sentimento, lista, grupo=grupo)
+    
+    # Mesmo formato de código usado pelo selectbox (sem .SA), para bater com a chave do cache
+    for ticker in tickers_monitor:
+        codigo = ticker.replace(".SA", "")
+        for carregar in (carregar_info_ativo, carregar_dados_dividendos, carregar_historico_curto, buscar_noticias_e_sentimento):
+            agendador.agendar(carregar, codigo)
+    
+    return agendador.iniciar()
+
+# MONITOR_B3_AGENDADOR=0 desliga o pré-aquecimento (ex.: réplicas só de leitura, benchmarks)
+agendador = iniciar_agendador() if os.environ.get("MONITOR_B3_AGENDADOR", "1") != "0" else None
+
+# --- MÉTRICAS (PROMETHEUS EM /metrics E LATÊNCIA POR SESSÃO) ---
+@st.cache_resource
+def iniciar_servidor_metricas(porta):
+    """Um servidor /metrics por processo, na porta de MONITOR_B3_METRICAS_PORTA."""
+    return metricas.iniciar_servidor(porta)
+
+if os.environ.get("MONITOR_B3_METRICAS_PORTA"):
+    iniciar_servidor_metricas(int(os.environ["MONITOR_B3_METRICAS_PORTA"]))
+
+if "desempenho" not in st.session_state:
+    st.session_state["desempenho"] = metricas.RegistroSessao()
+desempenho = st.session_state["desempenho"]
+inicio_pagina = time.perf_counter()
 
 # --- CARREGANDO E EXIBINDO DADOS INICIAIS ---
-with st.spinner('Carregando cotações das Blue Chips...'):
-    df_mercado = carregar_dados_mercado(tickers_monitor)
-
-# Verifica se o DataFrame não está vazio
-if not df_mercado.empty:
-    def color_change(val):
-        color = 'green' if val > 0 else 'red' if val < 0 else 'gray'
-        return f'color: {color}'
-        
-    maiores_altas = df_mercado.sort_values(by="Variação %", ascending=False).head(5)
-    maiores_baixas = df_mercado.sort_values(by="Variação %", ascending=True).head(5)
-
+modo_universo = st.radio(
+    "Universo monitorado:", 
+    ["Blue Chips", "B3 completa (Ações, FIIs e BDRs)"], 
+    horizontal=True, 
+    key="modo_universo"
+)
+
+lista_universo = tickers_monitor if modo_universo == "Blue Chips" else carregar_universo_b3()
+if agendador is not None and modo_universo != "Blue Chips":
+    # Mantém a B3 completa aquecida enquanto houver sessão usando esse universo
+    agendador.solicitar(GRUPO_B3)
+
+with st.spinner('Carregando cotações das Blue Chips...' if modo_universo == "Blue Chips" else 'Carregando cotações de toda a B3...'):
+    with desempenho.medir("quadro/carga"):
+        df_mercado = carregar_dados_mercado(lista_universo)
+        df_sinais = carregar_sinais_mercado(lista_universo)
+
+def color_change(val):
+    color = 'green' if val > 0 else 'red' if val < 0 else 'gray'
+    return f'color: {color}'
+
+def exibir_quadro(maiores_altas, maiores_baixas):
     col1, col2 = st.columns(2)
 
     with col1:
@@ -335,133 +201,171 @@ if not df_mercado.empty:
             })
         st.dataframe(df_baixas_style, use_container_width=True)
 
-st.divider()
-
-# --- SEÇÃO DE PESQUISA E DETALHES ---
-st.header("🕵️‍♂️ Investigar Outros Ativos")
-
-# 1. Campo de Pesquisa para qualquer ativo COM BOTÃO
-col_input, col_btn = st.columns([3, 1])
-
-with col_input:
-    termo_busca = st.text_input("Digite o código do ativo (ex: AZUL4, TOTS3)", "", key="input_busca").strip().upper() 
-
-with col_btn:
-    st.markdown("<br>", unsafe_allow_html=True) 
-    st.button("🔍 Pesquisar", key="btn_pesquisa", use_container_width=True)
-
-# --- DETERMINAÇÃO DO ATIVO PARA ANÁLISE (ESTABILIZADO) ---
-ativo_analise = None 
-
-# 1. Prioridade: Busca Manual (termo_busca)
-if termo_busca:
-    ativo_analise = termo_busca
-        
-# 2. Secundário: Selectbox/Ativo Padrão (só se NADA foi digitado)
-elif not df_mercado.empty:
-    st.subheader("Ou escolha um ativo da lista:")
-    opcoes_select = df_mercado['Ativo'].unique()
+# --- MODO AO VIVO (COTAÇÕES INTRADIÁRIAS) ---
+@st.cache_resource
+def cotacoes_intraday(tickers):
+    """Uma matriz intradiária por universo e por processo: todas as sessões dividem a mesma consulta."""
+    return CotacoesIntraday(tickers)
+
+@st.fragment(run_every=INTERVALO_INTRADAY)
+def quadro_ao_vivo(tickers):
+    """Reexecuta só o quadro a cada intervalo; o yfinance recebe apenas as barras de 1m novas."""
+    cotacoes = cotacoes_intraday(tickers)
+    with desempenho.medir("quadro/ao vivo"):
+        cotacoes.atualizar()
+        maiores_altas, maiores_baixas = cotacoes.extremos(5)
+        # MMS/IFR acompanham a cotação (estado incremental), em vez dos sinais do último fechamento
+        df_sinais = cotacoes.sinais()
+    
+    exibir_quadro(maiores_altas.join(df_sinais, on="Ativo"), maiores_baixas.join(df_sinais, on="Ativo"))
+    
+    if cotacoes.ultima_barra is not None:
+        horario = cotacoes.ultima_barra.tz_convert(FUSO_B3).strftime("%H:%M")
+        st.caption(f"🟢 Ao vivo: última barra às {horario} ({cotacoes.alterados} cotações alteradas na última consulta).")
+    else:
+        st.caption("⚪ Sem negociação intradiária no momento: exibindo o último pregão fechado.")
+
+# --- QUADRO DE ALTAS E BAIXAS (FRAGMENTO) ---
+# Interagir com o restante da página (busca, selectbox, expansores) não reexecuta o quadro
+# nem refaz a estilização das tabelas; o toggle do modo ao vivo só reexecuta o quadro
+@st.fragment
+def secao_quadro(lista_universo, df_mercado, df_sinais):
+    # Universos grandes consultam mais devagar (limite de taxa do Yahoo); o fragmento roda no
+    # intervalo padrão e as execuções intermediárias só redesenham o quadro
+    intervalo = intervalo_minimo(len(lista_universo))
+    modo_ao_vivo = st.toggle(f"⚡ Ao vivo (atualiza a cada {intervalo} s)", key="modo_ao_vivo")
+    
+    # Verifica se o DataFrame não está vazio
+    if df_mercado.empty:
+        return
     
-    if len(opcoes_select) > 0:
+    if modo_ao_vivo:
+        quadro_ao_vivo(tuple(lista_universo))
+    else:
+        with desempenho.medir("quadro/render"):
+            # Os sinais técnicos entram como colunas extras (consulta por ticker)
+            maiores_altas = df_mercado.nlargest(5, "Variação %").join(df_sinais, on="Ativo")
+            maiores_baixas = df_mercado.nsmallest(5, "Variação %").join(df_sinais, on="Ativo")
+            exibir_quadro(maiores_altas, maiores_baixas)
+
+secao_quadro(lista_universo, df_mercado, df_sinais)
+
+# --- RANKINGS E FILTRO (FRAGMENTOS COM EXPANSORES PREGUIÇOSOS) ---
+# Cada expansor só carrega e monta o conteúdo quando está aberto; abrir, fechar ou mexer
+# no filtro reexecuta apenas o próprio fragmento
+
+# --- RANKING DE DIVIDEND YIELD (12 MESES) ---
+@st.fragment
+def secao_dividend_yield(lista_universo):
+    with st.expander("💰 Maiores Dividend Yields (12 meses)", key="expansor_dy", on_change="rerun") as expansor:
+        if not expansor.open:
+            return
         
-        # 1. Define o valor inicial/index para o selectbox
-        if "selectbox_selecionado" not in st.session_state or st.session_state["selectbox_selecionado"] not in opcoes_select:
-             st.session_state["selectbox_selecionado"] = opcoes_select[0] 
-            
-        # Pega o índice do ativo que está atualmente no st.session_state
-        index_selecionado = list(opcoes_select).index(st.session_state["selectbox_selecionado"])
-
-        # 2. Renderiza o selectbox
-        ativo_analise = st.selectbox(
-            "Escolha um ativo para ver detalhes:", 
-            opcoes_select, 
-            index=index_selecionado, 
-            key="selectbox_selecionado"
-        )
-
-# --- BLOCO DE ANÁLISE DETALHADA ---
-ticker_valido = False
-ativo_analise_display = ativo_analise
-
-if ativo_analise:
-    ticker_yf_analise = get_yf_ticker(ativo_analise)
-    
-    try:
-        info_teste = yf.Ticker(ticker_yf_analise).info 
+        with desempenho.medir("quadro/dividend yield"):
+            df_top_dy = carregar_top_dividend_yield(lista_universo)
         
-        if info_teste and len(info_teste) >= 5 and 'regularMarketPrice' in info_teste: 
-            ticker_valido = True
-            
-            if 'longName' in info_teste:
-                 ativo_analise_display = info_teste['longName']
-            
+        if df_top_dy.empty:
+            st.info("Não há proventos registrados para o universo selecionado.")
         else:
-            raise ValueError("Ticker não encontrado ou sem dados suficientes.")
-            
-    except Exception:
-        st.error(f"Não foi possível encontrar o ativo **{ativo_analise}** na base de dados do mercado. Verifique o código.")
-        ticker_valido = False 
+            st.dataframe(
+                df_top_dy.style.format({
+                    "Preço (R$)": "R$ {:.2f}",
+                    "Proventos 12m (R$)": "R$ {:.2f}",
+                    "DY 12m %": "{:.2f}%",
+                }),
+                hide_index=True,
+                use_container_width=True,
+            )
+            st.caption("Proventos com data ex nos últimos 12 meses (dividendos e JCP somados, valores brutos) sobre o último fechamento.")
+
+# --- RANKING DE SENTIMENTO DAS NOTÍCIAS (ARMAZÉM LOCAL) ---
+@st.fragment
+def secao_ranking_sentimento(lista_universo):
+    with st.expander("🗞️ Sentimento das notícias", key="expansor_sentimento", on_change="rerun") as expansor:
+        if not expansor.open:
+            return
         
-if ticker_valido:
-    st.markdown(f"### Detalhes e Fundamentos de **{ativo_analise_display}**")
-    
-    def formatar_valor(valor, formato, eh_pl=False):
-        if eh_pl:
-            if valor is None or np.isinf(valor) or valor <= 0:
-                return "N/A"
-        elif valor is None or np.isinf(valor):
-            return "N/A"
+        with desempenho.medir("quadro/sentimento"):
+            df_ranking_sentimento = carregar_ranking_sentimento(lista_universo)
+        
+        if df_ranking_sentimento.empty:
+            st.info("Ainda não há notícias armazenadas para o universo selecionado.")
+        else:
+            col_otimistas, col_pessimistas = st.columns(2)
+            with col_otimistas:
+                st.markdown("##### Mais otimistas")
+                st.dataframe(df_ranking_sentimento.head(10), hide_index=True, use_container_width=True)
+            with col_pessimistas:
+                st.markdown("##### Mais pessimistas")
+                st.dataframe(df_ranking_sentimento.tail(10).iloc[::-1], hide_index=True, use_container_width=True)
+            st.caption("Score do léxico de sentimento com decaimento exponencial (meia-vida de 3 dias) e médias de 1, 7 e 30 dias, sobre as notícias já coletadas de cada ativo (mínimo de 2 notícias em 30 dias).")
+
+# --- FILTRO DE FUNDAMENTOS (SNAPSHOT LOCAL, SEM CHAMADAS AO YAHOO) ---
+@st.fragment
+def secao_filtro_fundamentos(lista_universo):
+    with st.expander("🔎 Filtrar por fundamentos", key="expansor_filtro", on_change="rerun") as expansor:
+        if not expansor.open:
+            return
+        
+        expressao = st.text_input(
+            "Condições (ex.: P/L < 8 e P/VPA < 1 e DY > 6%)",
+            "P/L < 8 e P/VPA < 1 e DY > 6%",
+            key="filtro_fundamentos",
+        )
+        snapshot = obter_fundamentos()
+        
+        if snapshot.tabela().empty:
+            st.info("O snapshot de fundamentos ainda está sendo montado em segundo plano. Volte em alguns minutos.")
+            return
         
         try:
-            return formato.format(valor).replace(',', 'X').replace('.', ',').replace('X', '.')
-        except (ValueError, TypeError):
-            return "N/A"
-            
-    # --- DADOS DE COTAÇÃO, DIVIDENDOS E FUNDAMENTOS ---
-    preco_actual, total_div, dy_anual = carregar_dados_dividendos(ativo_analise)
-    pl, pvpa, vpa = carregar_fundamentos_essenciais(ativo_analise)
-    
-    # PRIMEIRA LINHA DE MÉTRICAS (Preço e Dividendos)
-    st.subheader("Informações de Preço e Renda")
-    col_p1, col_p2, col_p3 = st.columns(3) 
-    
-    with col_p1:
-        st.metric(label="Preço Atual (R$)", value=formatar_valor(preco_actual, "R$ {:.2f}"))
+            with desempenho.medir("quadro/filtro fundamentos"):
+                df_filtrado = snapshot.filtrar(expressao, tickers=lista_universo)
+        except ValueError as e:
+            st.error(str(e))
+            return
         
-    with col_p2:
-        st.metric(label="Total de Dividendos (12m)", value=formatar_valor(total_div, "R$ {:.2f}"))
+        colunas_filtro = {
+            "nome": "Empresa", "setor": "Setor", "preco": "Preço (R$)", "pl": "P/L",
+            "pvpa": "P/VPA", "dy": "DY 12m %", "roe": "ROE %",
+        }
+        df_filtrado = df_filtrado[list(colunas_filtro)].rename(columns=colunas_filtro)
+        df_filtrado.index = df_filtrado.index.str.replace(".SA", "", regex=False).rename("Ativo")
+        st.dataframe(
+            df_filtrado.style.format(precision=2, na_rep="N/A"),
+            use_container_width=True,
+        )
+        atualizado = pd.to_datetime(snapshot.tabela()["atualizado_em"].max(), unit="s")
+        st.caption(f"{len(df_filtrado)} ativos. Snapshot atualizado em {atualizado:%d/%m/%Y %H:%M} (UTC).")
 
-    with col_p3:
-        st.metric(label="Dividend Yield (DY) Anual", value=formatar_valor(dy_anual, "{:.2f}%"))
-        
-    st.markdown("---") 
+secao_dividend_yield(lista_universo)
+secao_ranking_sentimento(lista_universo)
+secao_filtro_fundamentos(lista_universo)
 
-    # SEGUNDA LINHA DE MÉTRICAS (Fundamentos e Sentimento)
-    st.subheader("Indicadores de Valorização e Sentimento")
-    
-    noticias_detalhe, classificacao_sentimento, emoji_sentimento = buscar_noticias_e_sentimento(ativo_analise)
+st.divider()
 
-    col_f1, col_f2, col_f3, col_s = st.columns(4) 
-    
-    with col_f1:
-        st.metric(label="P/L (Preço/Lucro)", value=formatar_valor(pl, "{:.2f}x", eh_pl=True))
+# --- SEÇÃO DE PESQUISA E DETALHES ---
+st.header("🕵️‍♂️ Investigar Outros Ativos")
 
-    with col_f2:
-        st.metric(label="P/VPA (Preço/Valor Patrimonial)", value=formatar_valor(pvpa, "{:.2f}x"))
-        
-    with col_f3:
-        st.metric(label="VPA (Valor Patrimonial/Ação)", value=formatar_valor(vpa, "R$ {:.2f}"))
-        
-    with col_s:
-        st.metric(label="Análise Sentimento (IA)", value=f"{emoji_sentimento} {classificacao_sentimento}")
-        
-    st.divider()
-    
-    # --- BLOCO DE ANÁLISE DE TENDÊNCIA DE CURTO PRAZO (MMS 20) ---
-    st.subheader(f"📈 Análise Técnica ({ativo_analise})")
-    
-    df_historico_curto = carregar_historico_curto(ativo_analise)
+def formatar_valor(valor, formato, eh_pl=False):
+    if eh_pl:
+        if valor is None or np.isinf(valor) or valor <= 0:
+            return "N/A"
+    elif valor is None or np.isinf(valor):
+        return "N/A"
     
+    try:
+        return formato.format(valor).replace(',', 'X').replace('.', ',').replace('X', '.')
+    except (ValueError, TypeError):
+        return "N/A"
+
+def escolher_sugestao(codigo):
+    st.session_state["input_busca"] = codigo
+
+# --- ANÁLISE TÉCNICA (FRAGMENTO) ---
+# Abrir o gráfico do IFR reexecuta só esta seção, sobre o histórico já carregado
+@st.fragment
+def secao_tecnica(df_historico_curto):
     # 1. MMS 20
     sinal_mms, emoji_mms, mms_20_series = calcular_sinal_mms20(df_historico_curto)
     
@@ -473,18 +377,14 @@ if ticker_valido:
     if not df_historico_curto.empty and len(mms_20_series) > 0 and not mms_20_series.empty:
         st.markdown("##### Visualização da Tendência (MMS 20)")
         
-        # Garante que os arrays sejam 1D para evitar erros de dimensão
+        # Visões (sem cópia) sobre os últimos 60 pregões da série compacta e da MMS
+        recorte = df_historico_curto.cauda(60)
         df_plot = pd.DataFrame({
-            'Preço de Fechamento': df_historico_curto.values.ravel(),
-            'MMS 20 Períodos': mms_20_series.values.ravel()
-        }, index=df_historico_curto.index) 
+            'Preço de Fechamento': recorte.valores,
+            'MMS 20 Períodos': mms_20_series.to_numpy()[-60:],
+        }, index=recorte.datas, copy=False)
         
-        df_plot = df_plot.dropna() # Remove NaNs iniciais da MMS 20
-        
-        if not df_plot.empty:
-            st.line_chart(df_plot.tail(60)) 
-        else:
-             st.info("Não foi possível carregar dados suficientes para plotar o MMS 20.")
+        st.line_chart(df_plot)
 
     else:
          st.info("Não foi possível carregar dados suficientes para calcular e plotar o MMS 20 (Requer 20 dias).")
@@ -501,28 +401,41 @@ if ticker_valido:
     st.markdown(sinal_rsi)
     st.caption("Valores acima de 70 indicam sobrecompra; abaixo de 30, sobrevenda.")
     
-    # Exibição do Gráfico IFR
-    if not rsi_series.empty:
-        st.markdown("##### Visualização do IFR")
-        
-        # CORREÇÃO APLICADA: Usa .values.ravel() para garantir que a Series seja 1D e passa o índice
-        df_rsi_plot = pd.DataFrame({
-            'IFR 14': rsi_series.values.ravel(),
-            'Sobrecompra (70)': np.full(len(rsi_series), 70),
-            'Sobrevenda (30)': np.full(len(rsi_series), 30)
-        }, index=rsi_series.index).tail(60)
-
-        st.line_chart(df_rsi_plot)
-    else:
+    if rsi_series.empty:
         st.info("Não foi possível carregar dados suficientes para calcular e exibir o IFR.")
-        
-    st.divider()
-    
-    # --- NOTÍCIAS (Fatos Relevantes) ---
-    st.subheader(f"📰 Últimas Notícias sobre {ativo_analise_display} (Foco em Fatos Relevantes)")
+        return
     
-    if noticias_detalhe:
-        for noticia in noticias_detalhe:
+    # Exibição do Gráfico IFR (montado só com o expansor aberto)
+    with st.expander("Visualização do IFR", key="expansor_ifr", on_change="rerun") as expansor:
+        if not expansor.open:
+            return
+        
+        # Limites 70/30 como linhas de referência do gráfico, não como colunas constantes
+        df_rsi_plot = pd.DataFrame({
+            'Data': rsi_series.index[-60:],
+            'IFR 14': rsi_series.to_numpy()[-60:],
+        }, copy=False)
+        linha_ifr = alt.Chart(df_rsi_plot).mark_line().encode(
+            x=alt.X('Data:T', title=None),
+            y=alt.Y('IFR 14:Q', scale=alt.Scale(domain=[0, 100])),
+        )
+        limites = alt.Chart(LIMITES_IFR).mark_rule(strokeDash=[4, 4]).encode(
+            y='valor:Q',
+            color=alt.Color('limite:N', title=None, scale=alt.Scale(range=['#d62728', '#2ca02c'])),
+        )
+        st.altair_chart(linha_ifr + limites, use_container_width=True)
+
+# --- NOTÍCIAS (FRAGMENTO) ---
+# Cada manchete e o gráfico de tendência só são montados quando o expansor é aberto
+@st.fragment
+def secao_noticias(ativo, ativo_display, noticias_detalhe):
+    if not noticias_detalhe:
+        st.warning(f"Nenhuma notícia recente focada em Fato Relevante encontrada para {ativo_display}.")
+    
+    for i, noticia in enumerate(noticias_detalhe):
+        with st.expander(f"📰 {noticia['title']}", key=f"noticia_{ativo}_{i}", on_change="rerun") as expansor:
+            if not expansor.open:
+                continue
             
             score = noticia.get("score", 0)
             if score > 0:
@@ -531,20 +444,266 @@ if ticker_valido:
                 score_str = f"| **Sentimento:** Negativo ({score})"
             else:
                 score_str = "| **Sentimento:** Neutro"
-
-            with st.expander(f"📰 {noticia['title']}"):
-                fonte = noticia.get('media', 'Fonte Desconhecida')
-                data = noticia.get('date', 'Data Desconhecida')
+            
+            fonte = noticia.get('media', 'Fonte Desconhecida')
+            data = noticia.get('date', 'Data Desconhecida')
+            
+            st.write(f"**Fonte:** {fonte}")
+            st.write(f"**Data:** {data} {score_str}")
+            st.markdown(f"[Ler notícia completa]({noticia['link']})")
+    
+    # Tendência do sentimento: sai dos agregados diários, sem pontuar as manchetes de novo
+    with st.expander("🗞️ Tendência do Sentimento das Notícias", key="expansor_tendencia_sentimento", on_change="rerun") as expansor:
+        if not expansor.open:
+            return
+        
+        df_tendencia = carregar_serie_sentimento(ativo)
+        if df_tendencia.empty:
+            st.info("Ainda não há notícias armazenadas suficientes para a tendência.")
+            return
+        st.caption("Média diária dos scores com decaimento exponencial (meia-vida de 3 dias) e média móvel de 7 dias.")
+        st.line_chart(df_tendencia)
+
+# --- BUSCA E DETALHES DO ATIVO (FRAGMENTO) ---
+# Trocar o ativo (busca, sugestão ou selectbox) reexecuta só esta seção: o quadro, os
+# rankings e o filtro acima continuam como estão
+@st.fragment
+def secao_detalhes(df_mercado):
+    # 1. Campo de Pesquisa para qualquer ativo COM BOTÃO
+    col_input, col_btn = st.columns([3, 1])
+
+    with col_input:
+        termo_busca = st.text_input("Digite o código do ativo (ex: AZUL4, TOTS3)", "", key="input_busca").strip().upper() 
+        
+        # Autocompletar: códigos (ou nomes) que começam com o que foi digitado, direto do índice local
+        simbolos = obter_simbolos()
+        if termo_busca and termo_busca not in simbolos and not eh_externo(termo_busca):
+            sugestoes = simbolos.buscar(termo_busca)
+            if sugestoes:
+                st.caption("Sugestões:")
+                cols_sugestao = st.columns(4)
+                for i, sugestao in enumerate(sugestoes):
+                    cols_sugestao[i % 4].button(
+                        sugestao["codigo"],
+                        key=f"sugestao_{sugestao['codigo']}",
+                        help=sugestao["nome"],
+                        on_click=escolher_sugestao,
+                        args=(sugestao["codigo"],),
+                        use_container_width=True,
+                    )
+
+    with col_btn:
+        st.markdown("<br>", unsafe_allow_html=True) 
+        st.button("🔍 Pesquisar", key="btn_pesquisa", use_container_width=True)
+
+    # --- DETERMINAÇÃO DO ATIVO PARA ANÁLISE (ESTABILIZADO) ---
+    ativo_analise = None 
+
+    # 1. Prioridade: Busca Manual (termo_busca)
+    if termo_busca:
+        ativo_analise = termo_busca
+            
+    # 2. Secundário: Selectbox/Ativo Padrão (só se NADA foi digitado)
+    elif not df_mercado.empty:
+        st.subheader("Ou escolha um ativo da lista:")
+        opcoes_select = df_mercado['Ativo'].unique()
+        
+        if len(opcoes_select) > 0:
+            
+            # 1. Define o valor inicial/index para o selectbox
+            if "selectbox_selecionado" not in st.session_state or st.session_state["selectbox_selecionado"] not in opcoes_select:
+                 st.session_state["selectbox_selecionado"] = opcoes_select[0] 
                 
-                st.write(f"**Fonte:** {fonte}")
-                st.write(f"**Data:** {data} {score_str}")
-                st.markdown(f"[Ler notícia completa]({noticia['link']})")
-    else:
-        st.warning(f"Nenhuma notícia recente focada em Fato Relevante encontrada para {ativo_analise_display}.")
+            # Pega o índice do ativo que está atualmente no st.session_state
+            index_selecionado = list(opcoes_select).index(st.session_state["selectbox_selecionado"])
+
+            # 2. Renderiza o selectbox
+            ativo_analise = st.selectbox(
+                "Escolha um ativo para ver detalhes:", 
+                opcoes_select, 
+                index=index_selecionado, 
+                key="selectbox_selecionado"
+            )
+
+    # --- BLOCO DE ANÁLISE DETALHADA ---
+    ticker_valido = False
+    ativo_analise_display = ativo_analise
+
+    info_ativo = None
+    fonte_indisponivel = False
+
+    if ativo_analise:
+        inicio_carga = time.monotonic()
+        simbolo = simbolos.resolver(ativo_analise)
+        
+        if simbolo:
+            # Código da B3: validação e nome vêm do índice local, sem nenhuma chamada de rede
+            ticker_valido = True
+            ativo_analise = simbolo["codigo"]
+            ativo_analise_display = simbolo["nome"]
+            
+            # Fundamentos do snapshot quando o ativo já está nele; senão o .info entra na carga concorrente
+            linha_fundamentos = obter_fundamentos().linha(simbolo["ticker_yf"])
+            if linha_fundamentos is not None:
+                info_ativo = {c: None if pd.isna(linha_fundamentos[c]) else float(linha_fundamentos[c]) for c in ("pl", "pvpa", "vpa")}
+            futuros_detalhe = iniciar_carga_detalhes(ativo_analise, com_info=info_ativo is None)
+            desempenho.adicionar("detalhe/validacao", time.monotonic() - inicio_carga)
+        
+        elif eh_externo(ativo_analise) or eh_codigo_b3(ativo_analise):
+            # Outras bolsas e códigos da B3 fora do CSV (ETFs, listagens novas): só o .info
+            # do yfinance sabe se o código existe
+            if eh_codigo_b3(ativo_analise):
+                ativo_analise = normalizar_codigo(ativo_analise)
+            futuro_info = _pool_detalhes().submit(carregar_info_ativo, ativo_analise)
+            try:
+                info_ativo = futuro_info.result(timeout=TIMEOUTS_DETALHE["info"])
+            except (FalhaUpstream, TimeoutError):
+                # Yahoo fora do ar, limitando ou lento demais: não dá para dizer que o código não existe
+                fonte_indisponivel = True
+            except Exception:
+                info_ativo = None
+            desempenho.adicionar("detalhe/validacao", time.monotonic() - inicio_carga)
+            
+            if info_ativo and info_ativo["valido"]:
+                ticker_valido = True
+                ativo_analise_display = info_ativo["nome"]
+                # Só um código confirmado pelo .info dispara as demais cargas (e grava notícias)
+                inicio_carga = time.monotonic()
+                futuros_detalhe = iniciar_carga_detalhes(ativo_analise, com_info=False)
+        
+        if fonte_indisponivel:
+            st.warning(f"A fonte de dados está indisponível no momento; não foi possível validar **{ativo_analise}**. Tente novamente em instantes.")
+        elif not ticker_valido:
+            st.error(f"Não foi possível encontrar o ativo **{ativo_analise}** na base de dados do mercado. Verifique o código.")
+            
+    if not ticker_valido:
+        if df_mercado.empty:
+            st.error("Não foi possível carregar os dados iniciais do mercado. Verifique sua conexão ou tente mais tarde.")
+        else:
+            st.info("Digite um código de ativo ou escolha um da lista para iniciar a análise detalhada.")
+        return
 
-else:
-    if df_mercado.empty:
-        st.error("Não foi possível carregar os dados iniciais do mercado. Verifique sua conexão ou tente mais tarde.")
+    st.markdown(f"### Detalhes e Fundamentos de **{ativo_analise_display}**")
+    
+    # --- ESTRUTURA DA PÁGINA (cada seção é preenchida quando seus dados chegam) ---
+    # PRIMEIRA LINHA DE MÉTRICAS (Preço e Dividendos)
+    st.subheader("Informações de Preço e Renda")
+    area_precos = st.empty()
+    area_precos.info("Carregando cotação e dividendos...")
+        
+    st.markdown("---") 
+
+    # SEGUNDA LINHA DE MÉTRICAS (Fundamentos e Sentimento)
+    st.subheader("Indicadores de Valorização e Sentimento")
+    
+    col_f1, col_f2, col_f3, col_s = st.columns(4) 
+    
+    area_pl = col_f1.empty()
+    area_pvpa = col_f2.empty()
+    area_vpa = col_f3.empty()
+        
+    area_sentimento = col_s.empty()
+    area_sentimento.metric(label="Análise Sentimento (IA)", value="⏳ Carregando...")
+        
+    st.divider()
+    
+    # --- BLOCO DE ANÁLISE DE TENDÊNCIA DE CURTO PRAZO (MMS 20) ---
+    st.subheader(f"📈 Análise Técnica ({ativo_analise})")
+    area_tecnica = st.empty()
+    area_tecnica.info("Carregando histórico de preços...")
+        
+    st.divider()
+    
+    # --- NOTÍCIAS (Fatos Relevantes) ---
+    st.subheader(f"📰 Últimas Notícias sobre {ativo_analise_display} (Foco em Fatos Relevantes)")
+    area_noticias = st.empty()
+    area_noticias.info("Buscando notícias...")
+    
+    # --- RENDERIZAÇÃO DE CADA SEÇÃO ---
+    def exibir_fundamentos(fundamentos):
+        fundamentos = fundamentos or {"pl": None, "pvpa": None, "vpa": None}
+        area_pl.metric(label="P/L (Preço/Lucro)", value=formatar_valor(fundamentos["pl"], "{:.2f}x", eh_pl=True))
+        area_pvpa.metric(label="P/VPA (Preço/Valor Patrimonial)", value=formatar_valor(fundamentos["pvpa"], "{:.2f}x"))
+        area_vpa.metric(label="VPA (Valor Patrimonial/Ação)", value=formatar_valor(fundamentos["vpa"], "R$ {:.2f}"))
+    
+    if info_ativo is not None:
+        exibir_fundamentos(info_ativo)
     else:
-        st.info("Digite um código de ativo ou escolha um da lista para iniciar a análise detalhada.")     
+        area_pl.metric(label="P/L (Preço/Lucro)", value="⏳ Carregando...")
+        area_pvpa.metric(label="P/VPA (Preço/Valor Patrimonial)", value="⏳ Carregando...")
+        area_vpa.metric(label="VPA (Valor Patrimonial/Ação)", value="⏳ Carregando...")
+    
+    def exibir_precos(dados_dividendos):
+        if dados_dividendos is None:
+            area_precos.warning("A cotação demorou demais para responder. Tente novamente em instantes.")
+            return
+        
+        preco_actual, total_div, dy_anual = dados_dividendos
+        
+        with area_precos.container():
+            col_p1, col_p2, col_p3 = st.columns(3) 
+            
+            with col_p1:
+                st.metric(label="Preço Atual (R$)", value=formatar_valor(preco_actual, "R$ {:.2f}"))
+                
+            with col_p2:
+                st.metric(label="Total de Dividendos (12m)", value=formatar_valor(total_div, "R$ {:.2f}"))
 
+            with col_p3:
+                st.metric(label="Dividend Yield (DY) Anual", value=formatar_valor(dy_anual, "{:.2f}%"))
+    
+    def exibir_analise_tecnica(df_historico_curto):
+        if df_historico_curto is None:
+            area_tecnica.warning("O histórico de preços demorou demais para responder. Tente novamente em instantes.")
+            return
+        
+        with area_tecnica.container():
+            secao_tecnica(df_historico_curto)
+    
+    def exibir_noticias(resultado_noticias):
+        if resultado_noticias is None:
+            area_sentimento.metric(label="Análise Sentimento (IA)", value="⚪ Indisponível")
+            area_noticias.warning("A busca de notícias demorou demais para responder. Tente novamente em instantes.")
+            return
+        
+        noticias_detalhe, classificacao_sentimento, emoji_sentimento = resultado_noticias
+        area_sentimento.metric(label="Análise Sentimento (IA)", value=f"{emoji_sentimento} {classificacao_sentimento}")
+        
+        with area_noticias.container():
+            secao_noticias(ativo_analise, ativo_analise_display, noticias_detalhe)
+    
+    exibir_secao = {
+        "info": exibir_fundamentos,
+        "dividendos": exibir_precos,
+        "historico": exibir_analise_tecnica,
+        "noticias": exibir_noticias,
+    }
+    
+    # As seções aparecem na ordem em que chegam (o .info só está aqui se ainda não foi consumido)
+    for fonte, resultado in aguardar_detalhes(futuros_detalhe, inicio_carga):
+        # Espera pela fonte (desde o disparo) e tempo de montar a seção, separados
+        desempenho.adicionar(f"detalhe/{fonte}", time.monotonic() - inicio_carga)
+        with desempenho.medir(f"render/{fonte}"):
+            exibir_secao[fonte](resultado)
+
+secao_detalhes(df_mercado)
+
+desempenho.adicionar("página inteira", time.perf_counter() - inicio_pagina)
+
+# --- PAINEL DE DESEMPENHO (ADMIN) ---
+# Só aparece com MONITOR_B3_ADMIN=1; mostra a latência das seções nesta sessão
+if os.environ.get("MONITOR_B3_ADMIN") == "1":
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("⏱️ Desempenho (admin)"):
+            st.dataframe(
+                desempenho.resumo().style.format(precision=1),
+                hide_index=True,
+                use_container_width=True,
+            )
+            secoes = list(desempenho.amostras)
+            if secoes:
+                secao = st.selectbox("Histograma da seção:", secoes, key="admin_secao")
+                st.bar_chart(desempenho.histograma(secao))
+            st.caption("Métricas do processo (formato Prometheus):")
+            st.code(metricas.exportar_prometheus(), language="text")
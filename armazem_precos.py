@@ -0,0 +1,464 @@
+"""Armazém local de cotações diárias (OHLCV), compartilhado entre processos e réplicas.
+
+Os dados ficam em um arquivo SQLite com uma partição lógica por ticker
+(chave primária ``ticker, data``). As funções de carga do app leem primeiro
+daqui e só buscam no yfinance o intervalo de datas que ainda falta.
+
+Os preços gravados são os ajustados do yfinance. Um provento ou desdobramento novo
+faz o Yahoo reajustar todo o histórico anterior: quando ele aparece nas barras
+novas de um ticker, a janela já coberta desse ticker é rebaixada inteira, para a
+série não ficar com um degrau na data do evento.
+
+Os proventos e desdobramentos que vêm no mesmo download vão para a tabela ``eventos``
+(lida por :mod:`eventos_corporativos`), sem uma segunda consulta ao Yahoo.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFPricesMissingError, YFTzMissingError
+
+from cliente_upstream import FalhaUpstream, obter_cliente
+from indicadores import IndicadoresIncrementais
+from metricas import anotar, somar_bytes
+
+logger = logging.getLogger(__name__)
+
+# Erros do yfinance sobem como exceção (em vez de um DataFrame vazio e uma linha de log), para
+# o cliente do Yahoo tentar de novo ou registrar a falha. A configuração vale para o processo todo.
+yf.config.debug.hide_exceptions = False
+
+CAMINHO_PADRAO = os.environ.get("MONITOR_B3_PRECOS", os.path.join("dados", "precos.sqlite"))
+
+# Tickers por lote de download e requisições simultâneas dentro de cada lote
+TAMANHO_LOTE = 50
+DOWNLOADS_PARALELOS = 8
+
+# Lotes baixados ao mesmo tempo numa sincronização (o ritmo total é o do cliente do Yahoo)
+LOTES_PARALELOS = 4
+
+# Colunas do yfinance -> colunas da tabela
+COLUNAS_OHLCV = {
+    "Open": "abertura",
+    "High": "maxima",
+    "Low": "minima",
+    "Close": "fechamento",
+    "Volume": "volume",
+}
+
+# Colunas de eventos do yfinance -> tipo gravado na tabela de eventos
+TIPOS_EVENTO = {
+    "Dividends": "provento",
+    "Stock Splits": "desdobramento",
+}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS barras (
+    ticker TEXT NOT NULL,
+    data TEXT NOT NULL,
+    abertura REAL,
+    maxima REAL,
+    minima REAL,
+    fechamento REAL,
+    volume REAL,
+    PRIMARY KEY (ticker, data)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS eventos (
+    ticker TEXT NOT NULL,
+    data_ex TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (ticker, data_ex, tipo)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS estado_indicadores (
+    ticker TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    PRIMARY KEY (ticker, chave)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sincronizacao (
+    ticker TEXT PRIMARY KEY,
+    cobertura_inicio TEXT NOT NULL,
+    ultima_data TEXT,
+    atualizado_em REAL NOT NULL
+);
+"""
+
+
+class ArmazemPrecos:
+    """Cache persistente de barras diárias com atualização incremental via yfinance."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        # Tickers sendo baixados agora (por qualquer thread) -> evento liberado ao terminar
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    # --- LEITURA ---
+    def fechamentos(self, tickers, dias, desde=None, dtype=None):
+        """Retorna os fechamentos dos últimos `dias` corridos em formato largo (datas x tickers)."""
+        return self.barras(tickers, dias, coluna="fechamento", desde=desde, dtype=dtype)
+
+    def barras(self, tickers, dias, coluna="fechamento", desde=None, dtype=None):
+        """Retorna uma coluna OHLCV em formato largo (datas x tickers).
+
+        `desde` (data ISO) tem prioridade sobre `dias` e devolve só as barras posteriores a ela.
+        `dtype` (ex.: ``np.float32``) converte a matriz antes de devolvê-la.
+        """
+        if coluna not in COLUNAS_OHLCV.values():
+            raise ValueError(f"Coluna desconhecida: {coluna}")
+
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return pd.DataFrame(dtype=float)
+
+        if desde is not None:
+            inicio = (date.fromisoformat(str(desde)[:10]) + timedelta(days=1)).isoformat()
+        else:
+            inicio = (date.today() - timedelta(days=dias)).isoformat()
+        marcadores = ",".join("?" * len(tickers))
+        consulta = (
+            f"SELECT ticker, data, {coluna} FROM barras "
+            f"WHERE ticker IN ({marcadores}) AND data >= ?"
+        )
+        with self._conectar() as conexao:
+            linhas = pd.read_sql_query(consulta, conexao, params=[*tickers, inicio])
+
+        if linhas.empty:
+            return pd.DataFrame(dtype=float, columns=pd.Index([], name="Ticker"))
+
+        linhas["data"] = pd.to_datetime(linhas["data"])
+        largo = linhas.pivot(index="data", columns="ticker", values=coluna)
+        largo.index.name = "Date"
+        largo.columns.name = "Ticker"
+        # Mantém a ordem pedida pelo chamador
+        largo = largo.reindex(columns=[t for t in tickers if t in largo.columns])
+        return largo.astype(dtype, copy=False) if dtype is not None else largo
+
+    # --- ESTADO DOS INDICADORES INCREMENTAIS ---
+    def indicadores_incrementais(self, tickers, janela_mms=20, janela_ifr=14):
+        """Estado de MMS/IFR de cada ticker, avançado só com as barras novas do armazém.
+
+        O estado fica gravado ao lado do histórico, então após um restart ou numa outra
+        réplica o custo por nova barra continua O(1) em vez de recalcular a série inteira.
+        Cada estado é consolidado até a penúltima barra armazenada (a última pode ser o
+        pregão em andamento; use ``espiar`` com ela). Devolve {ticker: IndicadoresIncrementais}.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        chave = f"mms{janela_mms}_ifr{janela_ifr}"
+        marcadores = ",".join("?" * len(tickers))
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                f"SELECT ticker, estado FROM estado_indicadores WHERE chave = ? AND ticker IN ({marcadores})",
+                [chave, *tickers],
+            ).fetchall()
+        gravados = {ticker: IndicadoresIncrementais.de_dict(json.loads(estado)) for ticker, estado in linhas}
+
+        # Uma leitura por data de partida (quase sempre uma só: todos pararam no mesmo pregão)
+        estados = {}
+        grupos = {}
+        for ticker in tickers:
+            estado = estados[ticker] = gravados.get(ticker) or IndicadoresIncrementais(janela_mms, janela_ifr)
+            desde = estado.ultima_data.date().isoformat() if estado.ultima_data is not None else "0001-01-01"
+            grupos.setdefault(desde, []).append(ticker)
+
+        for desde, grupo in grupos.items():
+            novas = self.fechamentos(grupo, dias=None, desde=desde)
+            for ticker in grupo:
+                if ticker in novas.columns:
+                    estados[ticker].avancar(novas[ticker])
+
+        with self._conectar() as conexao:
+            conexao.executemany(
+                "INSERT OR REPLACE INTO estado_indicadores (ticker, chave, estado) VALUES (?, ?, ?)",
+                [(ticker, chave, json.dumps(estado.para_dict())) for ticker, estado in estados.items()],
+            )
+        return estados
+
+    # --- SINCRONIZAÇÃO INCREMENTAL ---
+    def sincronizar(self, tickers, dias, max_idade=300, tamanho_lote=TAMANHO_LOTE):
+        """Garante `dias` corridos de histórico para cada ticker, baixando só o que falta.
+
+        A última barra armazenada é sempre rebaixada (pode ser o pregão em andamento),
+        a menos que o ticker tenha sido sincronizado há menos de `max_idade` segundos.
+        Os downloads são feitos em lotes de `tamanho_lote` tickers (para limitar o pico de
+        memória), até LOTES_PARALELOS por vez. Tickers que outra thread já está baixando
+        não são pedidos de novo: a chamada só espera por eles no fim.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return
+
+        with self._trava:
+            alheios = [self._em_andamento[t] for t in tickers if t in self._em_andamento]
+            meus = [t for t in tickers if t not in self._em_andamento]
+            for ticker in meus:
+                self._em_andamento[ticker] = threading.Event()
+
+        try:
+            lotes = self._planejar(meus, dias, max_idade, tamanho_lote)
+            if len(lotes) == 1:
+                self._sincronizar_lote(*lotes[0])
+            elif lotes:
+                with ThreadPoolExecutor(max_workers=LOTES_PARALELOS, thread_name_prefix="armazem") as pool:
+                    list(pool.map(lambda argumentos: self._sincronizar_lote(*argumentos), lotes))
+        finally:
+            with self._trava:
+                for ticker in meus:
+                    self._em_andamento.pop(ticker).set()
+
+        for evento in alheios:
+            evento.wait()
+
+    def _planejar(self, tickers, dias, max_idade, tamanho_lote):
+        """Lotes (tickers, início da busca, estado, agora) do que precisa ser baixado."""
+        if not tickers:
+            return []
+        inicio_desejado = date.today() - timedelta(days=dias)
+        agora = time.time()
+        estado = self._estado_sincronizacao(tickers)
+
+        # Agrupa tickers pela data de início da busca para baixar em lote
+        grupos = {}
+        for ticker in tickers:
+            cobertura_inicio, ultima_data, atualizado_em = estado.get(ticker, (None, None, 0.0))
+
+            if cobertura_inicio is None or date.fromisoformat(cobertura_inicio) > inicio_desejado:
+                # Sem dados ou cobertura curta demais: baixa a janela inteira
+                inicio_busca = inicio_desejado
+            elif agora - atualizado_em < max_idade:
+                continue
+            else:
+                inicio_busca = date.fromisoformat(ultima_data) if ultima_data else inicio_desejado
+
+            grupos.setdefault(inicio_busca, []).append(ticker)
+
+        return [
+            (grupo[i:i + tamanho_lote], inicio_busca, estado, agora)
+            for inicio_busca, grupo in grupos.items()
+            for i in range(0, len(grupo), tamanho_lote)
+        ]
+
+    def _sincronizar_lote(self, lote, inicio_busca, estado, agora):
+        try:
+            self._baixar_e_gravar(lote, inicio_busca, estado, agora)
+        except Exception as e:
+            # Mantém o que já está em disco; a próxima chamada tenta de novo
+            logger.warning("Falha ao sincronizar %s a partir de %s: %s", lote, inicio_busca, e)
+            anotar(erro=repr(e))
+
+    def _estado_sincronizacao(self, tickers):
+        marcadores = ",".join("?" * len(tickers))
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                "SELECT ticker, cobertura_inicio, ultima_data, atualizado_em "
+                f"FROM sincronizacao WHERE ticker IN ({marcadores})",
+                tickers,
+            ).fetchall()
+        return {ticker: (inicio, ultima, atualizado) for ticker, inicio, ultima, atualizado in linhas}
+
+    def _baixar_e_gravar(self, tickers, inicio_busca, estado, agora, reescrever=False):
+        df, falhas = baixar_historico(tickers, inicio_busca, eventos=True)
+        somar_bytes("yfinance", df)
+        if falhas:
+            # Ficam sem marcar: a próxima sincronização pede esses tickers de novo
+            logger.warning("Sem resposta do Yahoo para %s a partir de %s", sorted(falhas), inicio_busca)
+            anotar(erro=repr(next(iter(falhas.values()))))
+
+        registros = []
+        eventos = []
+        ultimas = {}
+        reajustados = []
+        for ticker in tickers:
+            barras_ticker = extrair_ticker(df, ticker)
+            if barras_ticker is None:
+                continue
+            ultima_anterior = estado.get(ticker, (None, None, 0.0))[1]
+            if not reescrever and ultima_anterior and _evento_apos(barras_ticker, ultima_anterior):
+                # Provento ou desdobramento novo: o Yahoo reajustou todo o histórico para trás,
+                # e as barras antigas gravadas aqui deixaram de ser comparáveis com as novas
+                reajustados.append(ticker)
+                continue
+            eventos.extend(_registros_eventos(ticker, barras_ticker))
+            barras_ticker = barras_ticker.reindex(columns=list(COLUNAS_OHLCV)).dropna(subset=["Close"])
+            if barras_ticker.empty:
+                continue
+            datas = pd.DatetimeIndex(barras_ticker.index).strftime("%Y-%m-%d")
+            # NaN -> None para o SQLite gravar NULL
+            valores = barras_ticker.astype(object).where(barras_ticker.notna(), None)
+            registros.extend(
+                (ticker, dia, *linha) for dia, linha in zip(datas, valores.itertuples(index=False, name=None))
+            )
+            ultimas[ticker] = datas[-1]
+
+        with self._conectar() as conexao:
+            if reescrever:
+                conexao.executemany("DELETE FROM barras WHERE ticker = ?", [(t,) for t in ultimas])
+                # Proventos anteriores a um desdobramento também voltam reajustados
+                conexao.executemany(
+                    "DELETE FROM eventos WHERE ticker = ? AND data_ex >= ?",
+                    [(t, inicio_busca.isoformat()) for t in ultimas],
+                )
+            # Barras anteriores ao início da cobertura (ou reescritas) invalidam o estado incremental
+            invalidados = [
+                t for t in ultimas
+                if reescrever or not estado.get(t, (None,))[0] or inicio_busca.isoformat() < estado[t][0]
+            ]
+            conexao.executemany("DELETE FROM estado_indicadores WHERE ticker = ?", [(t,) for t in invalidados])
+            conexao.executemany(
+                "INSERT OR REPLACE INTO barras "
+                "(ticker, data, abertura, maxima, minima, fechamento, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                registros,
+            )
+            conexao.executemany(
+                "INSERT OR REPLACE INTO eventos (ticker, data_ex, tipo, valor) VALUES (?, ?, ?, ?)",
+                eventos,
+            )
+            for ticker in tickers:
+                if ticker in falhas or ticker in reajustados:
+                    continue
+                cobertura_anterior, ultima_anterior, _ = estado.get(ticker, (None, None, 0.0))
+                cobertura = min(filter(None, [cobertura_anterior, inicio_busca.isoformat()]))
+                ultima = ultimas.get(ticker, ultima_anterior)
+                conexao.execute(
+                    "INSERT OR REPLACE INTO sincronizacao "
+                    "(ticker, cobertura_inicio, ultima_data, atualizado_em) VALUES (?, ?, ?, ?)",
+                    (ticker, cobertura, ultima, agora),
+                )
+
+        # Rebaixa a janela inteira já coberta dos reajustados, com os preços na base nova
+        for cobertura, grupo in _por_cobertura(reajustados, estado).items():
+            logger.info("Provento/desdobramento novo em %s: rebaixando o histórico desde %s", grupo, cobertura)
+            self._baixar_e_gravar(grupo, date.fromisoformat(cobertura), estado, agora, reescrever=True)
+
+
+def _registros_eventos(ticker, barras_ticker):
+    """Linhas (ticker, data ex, tipo, valor) dos eventos nas barras de um ticker."""
+    registros = []
+    for coluna, tipo in TIPOS_EVENTO.items():
+        if coluna not in barras_ticker.columns:
+            continue
+        valores = barras_ticker[coluna]
+        valores = valores[valores.fillna(0) > 0]
+        datas = pd.DatetimeIndex(valores.index).strftime("%Y-%m-%d")
+        registros.extend((ticker, dia, tipo, float(v)) for dia, v in zip(datas, valores))
+    return registros
+
+
+def _evento_apos(barras_ticker, data_iso):
+    """Se há provento ou desdobramento em alguma barra posterior a `data_iso`."""
+    colunas = [c for c in ("Dividends", "Stock Splits") if c in barras_ticker.columns]
+    if not colunas:
+        return False
+    novas = barras_ticker.loc[pd.DatetimeIndex(barras_ticker.index).strftime("%Y-%m-%d") > data_iso, colunas]
+    return bool((novas.fillna(0) != 0).to_numpy().any())
+
+
+def _por_cobertura(tickers, estado):
+    grupos = {}
+    for ticker in tickers:
+        grupos.setdefault(estado[ticker][0], []).append(ticker)
+    return grupos
+
+
+# --- DOWNLOAD POR TICKER ---
+def baixar_historico(tickers, inicio, intervalo="1d", eventos=False):
+    """Barras de cada ticker desde `inicio`, uma requisição por ticker pelo cliente do Yahoo.
+
+    `inicio` vai ao yfinance como veio: ``date``, ``datetime``/``Timestamp`` (com ou sem
+    fuso) ou texto ``AAAA-MM-DD`` (o yfinance não aceita texto com horário).
+
+    Devolve ``(barras, falhas)``: as barras no formato do ``yf.download`` (colunas
+    Price x Ticker) e ``{ticker: erro}`` dos que não responderam nem depois das novas
+    tentativas. O ``yf.download`` engole esses erros e devolve colunas vazias; aqui cada
+    ticker passa pelo limite de taxa, pelas novas tentativas e pelo disjuntor. Um ticker
+    sem barras no intervalo (feriado, pregão ainda fechado) não aparece em nenhum dos
+    dois. Levanta :class:`~cliente_upstream.FalhaUpstream` se nenhum ticker responder.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    yahoo = obter_cliente("yahoo")
+
+    def baixar(ticker):
+        try:
+            return yahoo.chamar(_historico, ticker, inicio, intervalo, eventos, yahoo.sessao)
+        except FalhaUpstream as e:
+            return e
+
+    # Pool próprio por chamada: o ticker do detalhe não entra na fila de uma sincronização grande
+    with ThreadPoolExecutor(max_workers=min(DOWNLOADS_PARALELOS, len(tickers) or 1)) as pool:
+        respostas = dict(zip(tickers, pool.map(baixar, tickers)))
+
+    falhas = {t: r for t, r in respostas.items() if isinstance(r, FalhaUpstream)}
+    if tickers and len(falhas) == len(tickers):
+        raise FalhaUpstream(f"yahoo: nenhum dos {len(tickers)} tickers respondeu ({falhas[tickers[0]]})")
+
+    quadros = {t: r for t, r in respostas.items() if isinstance(r, pd.DataFrame) and not r.empty}
+    if not quadros:
+        return pd.DataFrame(columns=pd.MultiIndex.from_tuples([], names=["Price", "Ticker"])), falhas
+    barras = pd.concat(quadros, axis=1, names=["Ticker", "Price"]).swaplevel(axis=1)
+    return barras, falhas
+
+
+def _historico(ticker, inicio, intervalo, eventos, sessao):
+    try:
+        barras = yf.Ticker(ticker, session=sessao).history(start=inicio, interval=intervalo, actions=eventos)
+    except (YFPricesMissingError, YFTzMissingError):
+        # Resposta válida, só que sem barras no intervalo pedido (ou ticker fora de negociação,
+        # que o Yahoo devolve sem fuso horário, ex.: VIIA3)
+        return None
+    if intervalo == "1d" and getattr(barras.index, "tz", None) is not None:
+        # Como no yf.download: datas diárias sem fuso
+        barras.index = barras.index.tz_localize(None)
+    return barras
+
+
+def extrair_ticker(df, ticker):
+    """Isola as colunas OHLCV de um ticker no retorno do yf.download (com ou sem MultiIndex)."""
+    if isinstance(df.columns, pd.MultiIndex):
+        if ticker not in df.columns.get_level_values(1):
+            return None
+        return df.xs(ticker, axis=1, level=1)
+    return df
+
+
+_armazem = None
+_trava_armazem = threading.Lock()
+
+
+def obter_armazem():
+    """Instância única do armazém por processo."""
+    global _armazem
+    with _trava_armazem:
+        if _armazem is None:
+            _armazem = ArmazemPrecos()
+        return _armazem
@@ -0,0 +1,204 @@
+"""Backtest histórico dos sinais de MMS 20 e IFR 14 sobre o armazém local de cotações (sem Streamlit).
+
+Exemplos:
+    python backtest.py --anos 10 --saida backtest.csv
+    python backtest.py --tickers minha_lista.txt --horizontes 1 5 20 --sem-sincronizar
+
+Cada pregão recebe o sinal que :func:`nucleo.calcular_sinal_mms20` (banda de ±1% em
+torno da MMS 20) e :func:`nucleo.calcular_sinal_rsi` (IFR 14 acima de 70 / abaixo de 30)
+dariam se ele fosse o último, e o retorno é medido do fechamento desse pregão até
+`h` pregões depois. Os sinais de todas as datas x tickers de um lote saem de uma vez
+das funções vetorizadas de :mod:`indicadores`. Os lotes rodam um depois do outro, cada
+um lendo só os seus fechamentos do SQLite e devolvendo somas parciais por sinal: a
+memória fica limitada a uma matriz de lote, e o tempo é quase todo leitura do disco,
+que um pool de processos não encurta.
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+import indicadores
+from armazem_precos import ArmazemPrecos, CAMINHO_PADRAO
+from nucleo import ARQUIVO_SIMBOLOS, get_yf_ticker
+from screener import gravar, ler_lista_tickers
+
+ANOS_PADRAO = 10
+
+# Pregões entre o sinal e a saída
+HORIZONTES = (1, 5, 20)
+
+# Tickers por lote (cada lote lê e calcula a sua matriz datas x tickers)
+TAMANHO_LOTE = 50
+
+# Direção apostada por cada sinal: +1 alta, -1 queda, 0 sem aposta (neutro)
+DIRECOES = {
+    "mms20": {indicadores.ALTA: 1, indicadores.QUEDA: -1, indicadores.NEUTRO: 0},
+    "ifr14": {indicadores.SOBREVENDA: 1, indicadores.SOBRECOMPRA: -1, indicadores.NEUTRO: 0},
+}
+NOMES_SINAIS = {"mms20": indicadores.NOMES_MMS, "ifr14": indicadores.NOMES_IFR}
+
+# Somas parciais por (horizonte, código do sinal); as de lotes diferentes se juntam por soma
+ESTATISTICAS = ("ocorrencias", "soma", "soma_quadrados", "altas", "baixas")
+_CODIGOS = len(indicadores.NOMES_MMS)
+
+
+def sinais_historicos(precos, janela_mms=20, janela_ifr=14, banda_mms=0.01, sobrecompra=70, sobrevenda=30):
+    """Códigos dos sinais de MMS e IFR em cada pregão, como matrizes datas x tickers (int8).
+
+    Mesmas regras e mesmo histórico mínimo das funções de um ativo só. Cada ticker usa o
+    último fechamento válido nas datas em que não negociou; essas datas não geram sinal
+    (ficam SEM_DADOS).
+    """
+    negociado = precos.notna().to_numpy()
+    observacoes = np.cumsum(negociado, axis=0)
+    precos = precos.ffill()
+
+    medias = indicadores.mms(precos, janela_mms).to_numpy(dtype=float)
+    medias[observacoes < janela_mms] = np.nan
+    valores_ifr = indicadores.ifr(precos, janela_ifr).to_numpy(dtype=float)
+    valores_ifr[observacoes < janela_ifr + 1] = np.nan
+
+    codigo_mms = indicadores.classificar_mms(precos.to_numpy(dtype=float), medias, banda_mms).astype(np.int8)
+    codigo_ifr = indicadores.classificar_ifr(valores_ifr, sobrecompra, sobrevenda).astype(np.int8)
+    codigo_mms[~negociado] = indicadores.SEM_DADOS
+    codigo_ifr[~negociado] = indicadores.SEM_DADOS
+    return codigo_mms, codigo_ifr
+
+
+def retornos_futuros(precos, horizontes=HORIZONTES):
+    """Retorno do fechamento de cada pregão até `h` pregões depois, para cada horizonte.
+
+    Saídas depois do último fechamento do ticker (deslistado ou sem dados) ficam NaN.
+    """
+    negociado = precos.notna().to_numpy()
+    valores = precos.ffill().to_numpy(dtype=float)
+    datas = len(valores)
+    ultimo_valido = datas - 1 - np.argmax(negociado[::-1], axis=0)
+    linhas = np.arange(datas)[:, None]
+
+    retornos = []
+    for horizonte in horizontes:
+        futuro = np.full_like(valores, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            futuro[:-horizonte] = valores[horizonte:] / valores[:-horizonte] - 1
+        futuro[linhas + horizonte > ultimo_valido] = np.nan
+        retornos.append(futuro)
+    return retornos
+
+
+def acumular(codigos, retornos):
+    """Somas parciais (ocorrências, soma, soma dos quadrados, altas, baixas) por horizonte e sinal."""
+    parciais = np.zeros((len(retornos), _CODIGOS, len(ESTATISTICAS)))
+    for i, retorno in enumerate(retornos):
+        validos = ~np.isnan(retorno) & (codigos != indicadores.SEM_DADOS)
+        codigo, valor = codigos[validos], retorno[validos]
+        parciais[i, :, 0] = np.bincount(codigo, minlength=_CODIGOS)
+        parciais[i, :, 1] = np.bincount(codigo, weights=valor, minlength=_CODIGOS)
+        parciais[i, :, 2] = np.bincount(codigo, weights=valor * valor, minlength=_CODIGOS)
+        parciais[i, :, 3] = np.bincount(codigo[valor > 0], minlength=_CODIGOS)
+        parciais[i, :, 4] = np.bincount(codigo[valor < 0], minlength=_CODIGOS)
+    return parciais
+
+
+def backtest_precos(precos, horizontes=HORIZONTES, **parametros):
+    """Somas parciais de cada indicador para uma matriz de fechamentos (datas x tickers)."""
+    codigo_mms, codigo_ifr = sinais_historicos(precos, **parametros)
+    retornos = retornos_futuros(precos, horizontes)
+    return {"mms20": acumular(codigo_mms, retornos), "ifr14": acumular(codigo_ifr, retornos)}
+
+
+def _backtest_lote(armazem, tickers, dias, horizontes, parametros):
+    """Lê só os fechamentos do lote e devolve as somas parciais."""
+    precos = armazem.fechamentos(tickers, dias=dias, dtype=np.float32)
+    if precos.empty:
+        return None
+    return backtest_precos(precos, horizontes, **parametros)
+
+
+def relatorio(parciais, horizontes=HORIZONTES):
+    """Tabela final por indicador, sinal e horizonte (retornos e taxas em %)."""
+    linhas = []
+    for indicador, somas in parciais.items():
+        for i, horizonte in enumerate(horizontes):
+            # Referência: todos os pregões com sinal do indicador nesse horizonte
+            total = somas[i].sum(axis=0)
+            media_geral = total[1] / total[0] if total[0] else np.nan
+
+            for codigo, direcao in DIRECOES[indicador].items():
+                ocorrencias, soma, soma_quadrados, altas, baixas = somas[i, codigo]
+                if not ocorrencias:
+                    continue
+                media = soma / ocorrencias
+                variancia = max(soma_quadrados / ocorrencias - media * media, 0.0)
+                acertos = altas if direcao > 0 else baixas if direcao < 0 else np.nan
+                linhas.append({
+                    "indicador": indicador,
+                    "sinal": NOMES_SINAIS[indicador][codigo],
+                    "horizonte": horizonte,
+                    "ocorrencias": int(ocorrencias),
+                    "retorno_medio_%": media * 100,
+                    "desvio_%": np.sqrt(variancia) * 100,
+                    "excesso_%": (media - media_geral) * 100,
+                    "taxa_alta_%": altas / ocorrencias * 100,
+                    "taxa_acerto_%": acertos / ocorrencias * 100,
+                })
+    return pd.DataFrame(linhas)
+
+
+def executar(codigos, anos=ANOS_PADRAO, horizontes=HORIZONTES, tamanho_lote=TAMANHO_LOTE,
+             sincronizar=True, caminho=CAMINHO_PADRAO, **parametros):
+    """Backtest dos sinais para todos os `codigos` em `anos` de histórico diário."""
+    tickers_yf = [get_yf_ticker(c) for c in codigos]
+    dias = int(anos * 365.25)
+    armazem = ArmazemPrecos(caminho)
+    if sincronizar:
+        # Só o que falta no armazém vai ao yfinance; o resto do backtest é local
+        armazem.sincronizar(tickers_yf, dias=dias, max_idade=3600)
+
+    lotes = (tickers_yf[i:i + tamanho_lote] for i in range(0, len(tickers_yf), tamanho_lote))
+    parciais = _somar(_backtest_lote(armazem, lote, dias, horizontes, parametros) for lote in lotes)
+    return relatorio(parciais, horizontes)
+
+
+def _somar(resultados):
+    parciais = {}
+    for resultado in resultados:
+        for indicador, somas in (resultado or {}).items():
+            parciais[indicador] = parciais[indicador] + somas if indicador in parciais else somas
+    return parciais
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest dos sinais de MMS 20 e IFR 14 do Monitor B3.")
+    parser.add_argument("--tickers", default=ARQUIVO_SIMBOLOS, help="Arquivo .txt ou .csv com os códigos.")
+    parser.add_argument("--anos", type=float, default=ANOS_PADRAO, help="Anos de histórico diário.")
+    parser.add_argument("--horizontes", type=int, nargs="+", default=list(HORIZONTES), help="Pregões até a saída.")
+    parser.add_argument("--sem-sincronizar", action="store_true", help="Usa só o que já está no armazém local.")
+    parser.add_argument("--saida", help="Arquivo de saída (.parquet ou .csv); sem ele, imprime a tabela.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    codigos = ler_lista_tickers(args.tickers)
+    inicio = time.perf_counter()
+    tabela = executar(
+        codigos,
+        anos=args.anos,
+        horizontes=tuple(args.horizontes),
+        sincronizar=not args.sem_sincronizar,
+    )
+    duracao = time.perf_counter() - inicio
+
+    if args.saida:
+        gravar(tabela, args.saida)
+    else:
+        print(tabela.to_string(index=False, float_format="{:.2f}".format))
+    print(f"{len(codigos)} tickers x {args.anos:g} anos em {duracao:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
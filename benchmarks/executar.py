@@ -0,0 +1,427 @@
+"""Benchmarks offline do Monitor B3 (sem rede: yfinance e GoogleNews são substituídos).
+
+Uso:
+    python -m benchmarks.executar --saida resultado.json
+    python -m benchmarks.executar --baseline base.json --tolerancia 0.2
+    python -m benchmarks.executar --apenas mercado sentimento
+
+Grava um JSON com mediana/mínimo/máximo e vazão de cada cenário. Com ``--baseline``,
+compara as medianas com uma execução anterior e termina com código 1 se algum
+cenário ficar mais lento que ``1 + tolerancia`` vezes a referência.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# O armazém e o cache precisam apontar para um diretório descartável antes dos imports
+_DIRETORIO = tempfile.mkdtemp(prefix="bench_monitor_b3_")
+os.environ["MONITOR_B3_PRECOS"] = os.path.join(_DIRETORIO, "precos.sqlite")
+os.environ["MONITOR_B3_FUNDAMENTOS"] = os.path.join(_DIRETORIO, "fundamentos.parquet")
+os.environ["MONITOR_B3_NOTICIAS"] = os.path.join(_DIRETORIO, "noticias.sqlite")
+os.environ["MONITOR_B3_CACHE"] = "memoria"
+os.environ["MONITOR_B3_AGENDADOR"] = "0"
+
+from benchmarks import falsos as modulo_falsos  # noqa: E402
+
+FALSOS = modulo_falsos.instalar()
+
+import pandas as pd  # noqa: E402
+
+import armazem_precos  # noqa: E402
+import backtest  # noqa: E402
+import cache  # noqa: E402
+import eventos_corporativos  # noqa: E402
+import fundamentos  # noqa: E402
+import indicadores  # noqa: E402
+import intraday  # noqa: E402
+import noticias  # noqa: E402
+import nucleo  # noqa: E402
+import sentimento  # noqa: E402
+import sentimento_diario  # noqa: E402
+import simbolos  # noqa: E402
+
+
+def medir(func, repeticoes, itens=1, preparar=None):
+    """Executa `func` `repeticoes` vezes (chamando `preparar` antes de cada uma, fora do tempo)."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    mediana = statistics.median(tempos)
+    return {
+        "mediana_s": mediana,
+        "min_s": min(tempos),
+        "max_s": max(tempos),
+        "repeticoes": repeticoes,
+        "itens": itens,
+        "itens_por_s": itens / mediana if mediana else None,
+    }
+
+
+def universo(quantidade):
+    """Os primeiros `quantidade` tickers do arquivo de símbolos, completados com sintéticos se faltar."""
+    tickers = inspect.unwrap(nucleo.carregar_universo_b3)()
+    extras = [f"SINT{i}3.SA" for i in range(max(quantidade - len(tickers), 0))]
+    return (tickers + extras)[:quantidade]
+
+
+def _armazem_novo():
+    caminho = os.path.join(_DIRETORIO, f"precos_{time.monotonic_ns()}.sqlite")
+    armazem_precos._armazem = armazem_precos.ArmazemPrecos(caminho)
+    # O índice de eventos lê do arquivo do armazém: recriado junto
+    eventos_corporativos._indice = None
+
+
+def _serie_longa(anos=10):
+    fim = pd.Timestamp.today().normalize()
+    return modulo_falsos.serie_precos("PETR4.SA", fim - pd.DateOffset(years=anos), fim).dropna()
+
+
+# --- CENÁRIOS ---
+def bench_mercado(repeticoes):
+    resultados = {}
+    # Sem cache nem instrumentação: mede só a função
+    carregar = inspect.unwrap(nucleo.carregar_dados_mercado)
+    for quantidade in (15, 100, 500):
+        tickers = universo(quantidade)
+        resultados[f"mercado_frio_{quantidade}"] = medir(
+            lambda: carregar(tickers), repeticoes, quantidade, preparar=_armazem_novo
+        )
+        # Armazém já sincronizado: mede a leitura em disco (caminho de uma réplica recém-iniciada)
+        resultados[f"mercado_quente_{quantidade}"] = medir(lambda: carregar(tickers), repeticoes, quantidade)
+        resultados[f"sinais_mercado_{quantidade}"] = medir(
+            lambda: inspect.unwrap(nucleo.carregar_sinais_mercado)(tickers), repeticoes, quantidade
+        )
+        resultados[f"top_dividend_yield_{quantidade}"] = medir(
+            lambda: inspect.unwrap(nucleo.carregar_top_dividend_yield)(tickers), repeticoes, quantidade
+        )
+    return resultados
+
+
+def bench_indicadores(repeticoes):
+    serie = _serie_longa()
+    matriz = pd.concat(
+        {t: modulo_falsos.serie_precos(t, serie.index[0], serie.index[-1]) for t in universo(500)}, axis=1
+    )
+    return {
+        "mms20_10anos": medir(lambda: nucleo.calcular_sinal_mms20(serie), repeticoes * 5, len(serie)),
+        "ifr14_10anos": medir(lambda: nucleo.calcular_rsi(serie), repeticoes * 5, len(serie)),
+        "sinais_matriz_500x10anos": medir(lambda: indicadores.calcular_sinais(matriz), repeticoes, matriz.size),
+        "paridade_incremental_10anos": {
+            **medir(lambda: indicadores.conferir_paridade(serie), 1, len(serie)),
+            "divergencias": indicadores.conferir_paridade(serie),
+        },
+    }
+
+
+def bench_fundamentos(repeticoes):
+    tickers = universo(500)
+
+    def snapshot_novo():
+        caminho = os.path.join(_DIRETORIO, f"fundamentos_{time.monotonic_ns()}.parquet")
+        estado["snapshot"] = fundamentos.SnapshotFundamentos(caminho)
+
+    estado = {}
+    resultados = {
+        "fundamentos_snapshot_500": medir(
+            lambda: estado["snapshot"].atualizar(tickers), repeticoes, len(tickers), preparar=snapshot_novo
+        ),
+    }
+    expressao = "P/L < 8 e P/VPA < 1 e DY > 6%"
+    resultados["fundamentos_filtro_500"] = medir(
+        lambda: estado["snapshot"].filtrar(expressao), repeticoes * 20, len(tickers)
+    )
+
+    # Validação e autocompletar da busca: só o índice local, sem rede
+    indice = simbolos.IndiceSimbolos()
+    codigos = [t.replace(".SA", "") for t in tickers]
+    resultados["simbolos_validacao_500"] = medir(
+        lambda: [indice.resolver(c) for c in codigos], repeticoes * 20, len(codigos)
+    )
+    resultados["simbolos_autocompletar_500"] = medir(
+        lambda: [indice.buscar(c[:2]) for c in codigos], repeticoes * 20, len(codigos)
+    )
+    return resultados
+
+
+def bench_intraday(repeticoes):
+    tickers = universo(500)
+    abertura, _ = modulo_falsos._pregao_atual()
+    estado = {}
+
+    def novo_quadro():
+        # Primeira consulta do dia: pede o pregão inteiro desde a abertura
+        cotacoes = intraday.CotacoesIntraday(tickers)
+        cotacoes._trocar_referencias(*cotacoes._ler_referencias())
+        cotacoes.ultima_barra = abertura.tz_convert("UTC") + intraday.SOBREPOSICAO
+        estado["cotacoes"] = cotacoes
+
+    novo_quadro()
+    return {
+        "intraday_pregao_500": medir(
+            lambda: estado["cotacoes"].atualizar(forcar=True), repeticoes, len(tickers), preparar=novo_quadro
+        ),
+        # Consulta seguinte: só as barras da janela de sobreposição
+        "intraday_incremental_500": medir(
+            lambda: estado["cotacoes"].atualizar(forcar=True), repeticoes, len(tickers)
+        ),
+        "intraday_extremos_500": medir(lambda: estado["cotacoes"].extremos(5), repeticoes * 20, len(tickers)),
+    }
+
+
+def bench_sentimento(repeticoes):
+    titulos = modulo_falsos.manchetes(10_000)
+    return {
+        "sentimento_10k": medir(
+            lambda: [nucleo.analisar_sentimento_noticia(t) for t in titulos], repeticoes, len(titulos)
+        ),
+        "sentimento_lote_10k": medir(lambda: sentimento.pontuar_titulos(titulos), repeticoes, len(titulos)),
+    }
+
+
+def bench_noticias(repeticoes):
+    codigos = [t.replace(".SA", "") for t in universo(100)]
+    estado = {}
+
+    def armazem_novo():
+        caminho = os.path.join(_DIRETORIO, f"noticias_{time.monotonic_ns()}.sqlite")
+        estado["armazem"] = noticias.ArmazemNoticias(caminho)
+
+    def ingerir(max_idade):
+        for codigo in codigos:
+            estado["armazem"].sincronizar(codigo, max_idade=max_idade)
+
+    armazem_novo()
+    resultados = {
+        "noticias_ingestao_100": medir(lambda: ingerir(0), repeticoes, len(codigos), preparar=armazem_novo),
+        # Segunda consulta: tudo já está no armazém (só deduplicação, nada pontuado de novo)
+        "noticias_reingestao_100": medir(lambda: ingerir(0), repeticoes, len(codigos)),
+        "noticias_detalhe_100": medir(
+            lambda: [estado["armazem"].recentes(c) for c in codigos], repeticoes * 5, len(codigos)
+        ),
+    }
+
+    # Agregados diários: a primeira leitura monta as matrizes, as seguintes só releem o que mudou
+    def serie_nova():
+        estado["serie"] = sentimento_diario.SentimentoDiario(estado["armazem"])
+
+    resultados["sentimento_diario_carga_100"] = medir(
+        lambda: estado["serie"].ranking(codigos), repeticoes, len(codigos), preparar=serie_nova
+    )
+    resultados["sentimento_ranking_100"] = medir(
+        lambda: estado["serie"].ranking(codigos), repeticoes * 5, len(codigos)
+    )
+    resultados["sentimento_serie_100"] = medir(
+        lambda: [estado["serie"].serie(c) for c in codigos], repeticoes, len(codigos)
+    )
+    return resultados
+
+
+def bench_detalhe(repeticoes):
+    from streamlit.testing.v1 import AppTest
+
+    def renderizar():
+        app = AppTest.from_file(os.path.join(RAIZ, "app.py"), default_timeout=120)
+        app.session_state["input_busca"] = "PETR4"
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+
+    def limpar_cache():
+        cache.configurar_backend(cache.CacheMemoria())
+
+    return {
+        "render_detalhe_frio": medir(renderizar, repeticoes, preparar=limpar_cache),
+        "render_detalhe_quente": medir(renderizar, repeticoes),
+    }
+
+
+def bench_backtest(repeticoes):
+    tickers = universo(400)
+    codigos = [t.replace(".SA", "") for t in tickers]
+    # Armazém com 10 anos dos 400 tickers (fora do tempo): o backtest só lê do disco
+    caminho = os.path.join(_DIRETORIO, "precos_backtest.sqlite")
+    armazem_precos.ArmazemPrecos(caminho).sincronizar(tickers, dias=int(10 * 365.25))
+
+    def executar():
+        backtest.executar(codigos, anos=10, sincronizar=False, caminho=caminho)
+
+    # Como seria sem o motor vetorizado: as funções de um ativo só reaplicadas a cada pregão
+    serie = _serie_longa(anos=1)
+
+    def laco_por_pregao():
+        for fim in range(1, len(serie) + 1):
+            recorte = serie.iloc[:fim]
+            nucleo.calcular_sinal_mms20(recorte)
+            nucleo.calcular_sinal_rsi(nucleo.calcular_rsi(recorte)[1])
+
+    return {
+        "backtest_400x10anos": medir(executar, repeticoes, len(tickers)),
+        "backtest_laco_legado_1x1ano": medir(laco_por_pregao, 1, len(serie)),
+    }
+
+
+def bench_upstream(repeticoes):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    import cliente_upstream
+    from benchmarks.servidor_falso import ServidorFalso
+
+    requisicoes, threads = 400, 16
+    estado = {}
+
+    def carga(obter):
+        def uma(i):
+            try:
+                obter(f"{servidor.url}/cotacao/T{i % 50}")
+                return True
+            except Exception:
+                return False
+
+        with ThreadPoolExecutor(threads) as pool:
+            estado["sucessos"] = sum(pool.map(uma, range(requisicoes)))
+
+    def direto(url):
+        resposta = requests.get(url, timeout=5)
+        resposta.raise_for_status()
+
+    def novo_cliente(**parametros):
+        return cliente_upstream.ClienteUpstream("falso", espera_base=0.05, espera_maxima=0.5, **parametros)
+
+    resultados = {}
+    # 10% de respostas 429/503 e 10 ms de latência: sem o cliente, cada erro vira falha na tela
+    with ServidorFalso(latencia=0.01, taxa_erros=0.05, taxa_429=0.05, retry_after=0) as servidor:
+        for nome, obter in (
+            ("upstream_sem_cliente_400", direto),
+            ("upstream_cliente_400", novo_cliente(taxa=1000, capacidade=50, tentativas=4, limite_falhas=50).obter),
+        ):
+            servidor.zerar()
+            resultados[nome] = {
+                **medir(lambda: carga(obter), repeticoes, requisicoes),
+                "taxa_sucesso": estado["sucessos"] / requisicoes,
+                "requisicoes_servidor": servidor.contadores["requisicoes"] // repeticoes,
+            }
+
+        # Limite de taxa: 200 req/s em regime, mesmo com 16 threads disputando
+        limitado = novo_cliente(taxa=200, capacidade=20, tentativas=4, limite_falhas=50)
+        servidor.configurar(taxa_erros=0.0, taxa_429=0.0)
+        resultados["upstream_limitado_200rps_400"] = medir(lambda: carga(limitado.obter), repeticoes, requisicoes)
+
+        # Queda da fonte: o disjuntor abre depois de 5 falhas e as chamadas seguintes nem saem
+        servidor.configurar(indisponivel=True)
+        servidor.zerar()
+        resultados["upstream_queda_disjuntor_400"] = {
+            **medir(lambda: carga(novo_cliente(taxa=1000, capacidade=50, tentativas=3).obter), repeticoes, requisicoes),
+            "requisicoes_servidor": servidor.contadores["requisicoes"] // repeticoes,
+        }
+
+        # Cache negativo: com a fonte fora, uma falha por chave e por ttl_falha, nunca gravada como resultado
+        cliente = novo_cliente(taxa=1000, capacidade=50, tentativas=3, limite_falhas=10_000)
+
+        @cache.cacheado(ttl=3600, nome="bench.cotacao_falsa", ttl_falha=60)
+        def cotacao(ticker):
+            return cliente.obter(f"{servidor.url}/cotacao/{ticker}").json()
+
+        def consultar():
+            for i in range(requisicoes):
+                try:
+                    cotacao(f"T{i % 50}")
+                except cliente_upstream.FalhaUpstream:
+                    pass
+
+        servidor.zerar()
+        resultados["upstream_cache_negativo_400"] = {
+            **medir(consultar, repeticoes, requisicoes, preparar=cotacao.clear),
+            "requisicoes_servidor": servidor.contadores["requisicoes"] // repeticoes,
+        }
+    return resultados
+
+
+CENARIOS = {
+    "mercado": bench_mercado,
+    "indicadores": bench_indicadores,
+    "intraday": bench_intraday,
+    "fundamentos": bench_fundamentos,
+    "sentimento": bench_sentimento,
+    "noticias": bench_noticias,
+    "detalhe": bench_detalhe,
+    "backtest": bench_backtest,
+    "upstream": bench_upstream,
+}
+
+
+def comparar(resultados, baseline, tolerancia):
+    """Razão mediana atual / mediana de referência por cenário; marca as regressões."""
+    comparacao = {}
+    for nome, atual in resultados.items():
+        base = baseline.get("resultados", {}).get(nome)
+        if not base:
+            continue
+        razao = atual["mediana_s"] / base["mediana_s"] if base["mediana_s"] else None
+        comparacao[nome] = {
+            "mediana_base_s": base["mediana_s"],
+            "mediana_atual_s": atual["mediana_s"],
+            "razao": razao,
+            "regressao": razao is not None and razao > 1 + tolerancia,
+        }
+    return comparacao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks offline do Monitor B3.")
+    parser.add_argument("--apenas", nargs="*", choices=sorted(CENARIOS), help="Roda só estes grupos.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout).")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação.")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Folga antes de acusar regressão (0.2 = 20%%).")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for nome in args.apenas or CENARIOS:
+        resultados.update(CENARIOS[nome](args.repeticoes))
+
+    relatorio = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+        },
+        "chamadas_upstream": FALSOS.chamadas,
+        "resultados": resultados,
+    }
+
+    regressoes = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            relatorio["comparacao"] = comparar(resultados, json.load(arquivo), args.tolerancia)
+        regressoes = [nome for nome, c in relatorio["comparacao"].items() if c["regressao"]]
+        relatorio["regressoes"] = regressoes
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,277 @@
+"""Substitutos locais e determinísticos do yfinance e do GoogleNews para os benchmarks.
+
+Os dados são gerados a partir de uma semente fixa por ticker, então duas execuções
+produzem exatamente as mesmas séries, dividendos e manchetes. A latência de rede
+pode ser simulada com ``instalar(latencia=...)``, e o limite de taxa do Yahoo
+colocando tickers em ``Falsos.limitados`` (o histórico deles levanta YFRateLimitError).
+"""
+import time
+import zlib
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from yfinance._http import HTTPError
+from yfinance.config import YfConfig
+from yfinance.exceptions import YFPricesMissingError, YFRateLimitError, YFTzMissingError
+from yfinance.utils import _parse_user_dt
+
+TERMOS_MANCHETES = [
+    "registra lucro recorde no trimestre", "anuncia dividendos e juros sobre capital próprio",
+    "ações caem após prejuízo", "tem alta com expansão da receita", "enfrenta investigação e multa",
+    "fecha parceria estratégica", "adia divulgação de balanço", "Caixa eleva recomendação",
+    "recua com crise no setor", "aprova aquisição de concorrente", "apresenta resultado altamente volátil",
+]
+
+
+def _semente(texto):
+    return zlib.crc32(str(texto).encode())
+
+
+def _dias_uteis(inicio, fim):
+    # pd.bdate_range é lento demais para milhares de chamadas; dias de semana via numpy
+    dias = np.arange(np.datetime64(inicio, "D"), np.datetime64(fim, "D") + 1)
+    return pd.DatetimeIndex(dias[np.is_busday(dias)], name="Date")
+
+
+@lru_cache(maxsize=1024)
+def _serie_completa(ticker, fim):
+    # Gera sempre a partir de uma data fixa para que intervalos diferentes sejam consistentes
+    todas = _dias_uteis("2000-01-03", fim)
+    rng = np.random.default_rng(_semente(ticker))
+    retornos = rng.normal(0.0003, 0.02, len(todas))
+    return pd.Series(20 * np.exp(np.cumsum(retornos)), index=todas)
+
+
+def serie_precos(ticker, inicio, fim):
+    """Fechamentos diários sintéticos (passeio aleatório) de `ticker` entre duas datas."""
+    inicio, fim = pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize()
+    return _serie_completa(ticker, fim.date()).reindex(_dias_uteis(inicio.date(), fim.date()))
+
+
+FUSO_B3 = "America/Sao_Paulo"
+
+
+def _pregao_atual():
+    """Último dia útil até hoje e o horário de negociação (10h-17h) em Brasília."""
+    agora = pd.Timestamp.now(tz=FUSO_B3)
+    dia = agora.normalize()
+    while dia.dayofweek >= 5:
+        dia -= pd.Timedelta(days=1)
+    abertura, fechamento = dia + pd.Timedelta(hours=10), dia + pd.Timedelta(hours=17)
+    return abertura, min(fechamento, agora) if dia == agora.normalize() else fechamento
+
+
+@lru_cache(maxsize=1024)
+def _sessao_minutos(ticker, abertura):
+    fechamento = abertura + pd.Timedelta(hours=7)
+    minutos = pd.date_range(abertura, fechamento, freq="min", name="Datetime")
+    rng = np.random.default_rng(_semente(f"{ticker}{abertura.date()}"))
+    base = float(serie_precos(ticker, abertura.date() - pd.Timedelta(days=10), abertura.date()).dropna().iloc[-1])
+    # A sessão termina exatamente no fechamento diário sintético do dia
+    passos = np.cumsum(rng.normal(0, 0.0008, len(minutos)))
+    return pd.Series(base * np.exp(passos - passos[-1]), index=minutos)
+
+
+def barras_minuto(ticker, inicio=None):
+    """Barras de 1 minuto sintéticas do pregão corrente (ou do último, fora do horário)."""
+    abertura, fim = _pregao_atual()
+    sessao = _sessao_minutos(ticker, abertura)
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio)
+        inicio = inicio.tz_localize(FUSO_B3) if inicio.tzinfo is None else inicio
+        sessao = sessao[sessao.index >= inicio]
+    return sessao[sessao.index <= fim]
+
+
+def proventos(ticker):
+    """Proventos sintéticos trimestrais dos últimos 5 anos (data ex em dia útil)."""
+    rng = np.random.default_rng(_semente(f"proventos{ticker}"))
+    fim = pd.Timestamp.today().normalize()
+    datas = pd.date_range(end=fim - pd.Timedelta(days=int(rng.integers(0, 91))), periods=20, freq="91D")
+    datas = datas - pd.to_timedelta(np.maximum(datas.dayofweek - 4, 0), unit="D")
+    return pd.Series(rng.uniform(0.1, 1.0, len(datas)), index=datas)
+
+
+def ultimo_preco(ticker):
+    """Último fechamento sintético (fins de semana caem no último dia útil)."""
+    fim = date.today()
+    return float(serie_precos(ticker, fim - pd.Timedelta(days=10), fim).dropna().iloc[-1])
+
+
+class Falsos:
+    """Conjunto de substitutos com contadores de chamadas e latência opcional."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.limitados = set()
+        # Tickers fora de negociação: o Yahoo não devolve nem o fuso horário (YFTzMissingError)
+        self.delistados = set()
+        self.chamadas = {"download": 0, "history": 0, "info": 0, "fast_info": 0, "actions": 0, "noticias": 0}
+
+    def _rede(self, tipo):
+        self.chamadas[tipo] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    # --- yfinance.download ---
+    def download(self, tickers, start=None, period=None, progress=False, **kwargs):
+        self._rede("download")
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        quadros = {ticker: self._barras(ticker, start, kwargs.get("interval", "1d"), kwargs.get("actions")) for ticker in tickers}
+        df = pd.concat(quadros, axis=1, names=["Ticker", "Price"]).swaplevel(axis=1)
+        return df
+
+    @staticmethod
+    def _barras(ticker, start, interval, actions):
+        """OHLCV sintético de um ticker (com Dividends/Stock Splits se `actions`)."""
+        fim = pd.Timestamp(date.today())
+        if str(interval).endswith("m"):
+            fechamento = barras_minuto(ticker, start)
+        else:
+            inicio = pd.Timestamp(start).tz_localize(None) if start else fim - pd.Timedelta(days=183)
+            fechamento = serie_precos(ticker, inicio, fim)
+        colunas = {
+            "Open": fechamento * 0.995,
+            "High": fechamento * 1.01,
+            "Low": fechamento * 0.99,
+            "Close": fechamento,
+            "Volume": pd.Series(1_000_000.0, index=fechamento.index),
+        }
+        if actions:
+            colunas["Dividends"] = proventos(ticker).reindex(fechamento.index, fill_value=0.0)
+            colunas["Stock Splits"] = pd.Series(0.0, index=fechamento.index)
+        return pd.DataFrame(colunas)
+
+    # --- yfinance.Ticker ---
+    def Ticker(self, ticker, session=None):
+        return _TickerFalso(self, ticker)
+
+    # --- GoogleNews ---
+    def GoogleNews(self, lang=None, region=None, **kwargs):
+        return _GoogleNewsFalso(self)
+
+
+class _Resposta404:
+    status_code = 404
+
+
+class _TickerFalso:
+    def __init__(self, falsos, ticker):
+        self._falsos = falsos
+        self.ticker = ticker
+        self._rng = np.random.default_rng(_semente(ticker))
+
+    @property
+    def info(self):
+        self._falsos._rede("info")
+        if self.ticker.startswith("INVALIDO"):
+            # O quoteSummary responde 404 para códigos que o Yahoo não conhece
+            if not YfConfig.debug.hide_exceptions:
+                raise HTTPError(f"HTTP Error 404 for {self.ticker}", response=_Resposta404())
+            return {"trailingPegRatio": None}
+        preco = ultimo_preco(self.ticker)
+        return {
+            "regularMarketPrice": preco,
+            "longName": f"Empresa {self.ticker.split('.')[0]} S.A.",
+            "forwardPE": float(self._rng.uniform(3, 25)),
+            "trailingPE": float(self._rng.uniform(3, 25)),
+            "priceToBook": float(self._rng.uniform(0.5, 4)),
+            "bookValue": float(self._rng.uniform(5, 40)),
+            "marketCap": float(self._rng.uniform(1e9, 5e11)),
+            "sector": "Energy",
+            "industry": "Oil & Gas",
+        }
+
+    def history(self, start=None, interval="1d", actions=True, **kwargs):
+        self._falsos._rede("history")
+        if self.ticker in self._falsos.limitados:
+            raise YFRateLimitError()
+        # Como no yfinance: sem barras, exceção só com yf.config.debug.hide_exceptions desligado
+        if self.ticker in self._falsos.delistados:
+            if not YfConfig.debug.hide_exceptions:
+                raise YFTzMissingError(self.ticker)
+            return pd.DataFrame()
+        if start is not None:
+            # Mesma conversão do yfinance (texto só no formato AAAA-MM-DD)
+            start = _parse_user_dt(start, FUSO_B3)
+        barras = self._falsos._barras(self.ticker, start, interval, actions).dropna(subset=["Close"])
+        if barras.empty and not YfConfig.debug.hide_exceptions:
+            raise YFPricesMissingError(self.ticker, f"({interval} start={start})")
+        return barras
+
+    @property
+    def fast_info(self):
+        self._falsos._rede("fast_info")
+        return {"last_price": ultimo_preco(self.ticker)}
+
+    @property
+    def actions(self):
+        self._falsos._rede("actions")
+        eventos = proventos(self.ticker)
+        return pd.DataFrame({"Dividends": eventos, "Stock Splits": 0.0}, index=eventos.index)
+
+
+class _GoogleNewsFalso:
+    def __init__(self, falsos):
+        self._falsos = falsos
+        self._resultados = []
+        self.periodo = ""
+
+    def search(self, query):
+        self._falsos._rede("noticias")
+        rng = np.random.default_rng(_semente(query))
+        agora = pd.Timestamp.now().floor("min")
+        self._resultados = [
+            {
+                "title": f"Empresa {rng.choice(TERMOS_MANCHETES)}",
+                "media": "Fonte Teste",
+                "date": f"há {i + 1} horas",
+                "datetime": agora - pd.Timedelta(hours=i + 1),
+                "desc": "",
+                "link": f"https://exemplo.invalid/noticia/{_semente(query)}/{i}",
+            }
+            for i in range(10)
+        ]
+
+    def set_period(self, period):
+        self.periodo = period
+
+    def enableException(self, enable=True):
+        pass
+
+    def results(self, sort=False):
+        return self._resultados
+
+    def clear(self):
+        self._resultados = []
+
+
+def manchetes(quantidade, semente=0):
+    """Lista determinística de títulos para medir o sentimento em volume."""
+    rng = np.random.default_rng(semente)
+    return [f"Empresa {rng.choice(TERMOS_MANCHETES)} {i}" for i in range(quantidade)]
+
+
+def instalar(latencia=0.0):
+    """Substitui yfinance e GoogleNews (também nos módulos que já os importaram)."""
+    import yfinance
+    import GoogleNews as modulo_googlenews
+
+    falsos = Falsos(latencia)
+    yfinance.download = falsos.download
+    yfinance.Ticker = falsos.Ticker
+    modulo_googlenews.GoogleNews = falsos.GoogleNews
+
+    import noticias
+
+    noticias.GoogleNews = falsos.GoogleNews
+
+    # Sem rede de verdade: o limite de taxa dos clientes não pode ditar o tempo medido
+    import cliente_upstream
+
+    for fonte in cliente_upstream.FONTES:
+        cliente_upstream.configurar_fonte(fonte, taxa=1e6, capacidade=1e6)
+    return falsos
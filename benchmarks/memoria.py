@@ -0,0 +1,145 @@
+"""Orçamento de memória por ticker em cache: representação antiga x compacta (sem rede).
+
+Uso:
+    python -m benchmarks.memoria --tickers 500
+    python -m benchmarks.memoria --saida memoria.json
+
+Compara, por ticker, o histórico de 6 meses como o app guardava antes (``yf.download(...)
+['Close']``: DataFrame float64 com índice próprio) e como guarda agora (:class:`SeriePrecos`:
+float32 com índice de datas compartilhado), em memória e serializado (o que vai para o
+cache sqlite/redis). Também mede os quadros montados a cada renderização dos gráficos
+de MMS 20/IFR e as amostras de latência guardadas na sessão.
+"""
+import argparse
+import inspect
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.executar import universo  # noqa: F401 (prepara o ambiente e os falsos)
+
+import cache  # noqa: E402
+import metricas  # noqa: E402
+import nucleo  # noqa: E402
+import yfinance as yf  # noqa: E402
+
+SECOES_SESSAO = 20
+
+
+def bytes_dataframe(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def bytes_novos(df, fontes):
+    """Bytes das colunas do quadro que não são visões de nenhum dos arrays em `fontes`."""
+    total = 0
+    for coluna in df.columns:
+        valores = df[coluna].to_numpy()
+        if not any(np.shares_memory(valores, fonte) for fonte in fontes):
+            total += valores.nbytes
+    return total
+
+
+def medir_historicos(tickers):
+    carregar = inspect.unwrap(nucleo.carregar_historico_curto)
+    antes = {"memoria": 0, "serializado": 0}
+    depois = {"memoria": 0, "serializado": 0}
+    calendarios = {}
+
+    for ticker in tickers:
+        # Como era: DataFrame de uma coluna, float64, com índice de datas próprio
+        legado = yf.download(ticker, period="6mo", progress=False)["Close"].dropna()
+        antes["memoria"] += bytes_dataframe(legado)
+        antes["serializado"] += len(cache.serializar(legado))
+
+        compacta = carregar(ticker.replace(".SA", ""))
+        depois["memoria"] += compacta.nbytes
+        depois["serializado"] += len(cache.serializar(compacta))
+        calendarios[id(compacta.datas)] = compacta.datas.nbytes
+
+    # Os índices internados são contados uma vez só e rateados entre os tickers
+    depois["memoria"] += sum(calendarios.values())
+    quantidade = len(tickers)
+    return {
+        "historico_memoria": _por_ticker(antes["memoria"], depois["memoria"], quantidade),
+        "historico_serializado": _por_ticker(antes["serializado"], depois["serializado"], quantidade),
+        "calendarios_distintos": len(calendarios),
+    }
+
+
+def medir_graficos(ticker):
+    historico = inspect.unwrap(nucleo.carregar_historico_curto)(ticker.replace(".SA", ""))
+    serie = historico.serie()
+    _, _, mms = nucleo.calcular_sinal_mms20(historico)
+    ifr, _ = nucleo.calcular_rsi(historico)
+
+    # Como era: cópias float64 de tudo e duas colunas constantes só para as linhas 70/30
+    legado_mms = pd.DataFrame({
+        "Preço de Fechamento": serie.astype(float).values.ravel(),
+        "MMS 20 Períodos": mms.astype(float).values.ravel(),
+    }, index=serie.index).dropna().tail(60)
+    legado_ifr = pd.DataFrame({
+        "IFR 14": ifr.astype(float).values.ravel(),
+        "Sobrecompra (70)": np.full(len(ifr), 70),
+        "Sobrevenda (30)": np.full(len(ifr), 30),
+    }, index=ifr.index).tail(60)
+    antes = bytes_novos(legado_mms, []) + bytes_novos(legado_ifr, [])
+
+    # Como é: visões dos últimos 60 pregões (mesma montagem do app)
+    recorte = historico.cauda(60)
+    atual_mms = pd.DataFrame({
+        "Preço de Fechamento": recorte.valores,
+        "MMS 20 Períodos": mms.to_numpy()[-60:],
+    }, index=recorte.datas, copy=False)
+    atual_ifr = pd.DataFrame({"Data": ifr.index[-60:], "IFR 14": ifr.to_numpy()[-60:]}, copy=False)
+    fontes = [historico.valores, mms.to_numpy(), ifr.to_numpy(), ifr.index.asi8]
+    depois = bytes_novos(atual_mms, fontes) + bytes_novos(atual_ifr, fontes)
+    return {"graficos_por_renderizacao": {"antes": antes, "depois": depois, "reducao": _reducao(antes, depois)}}
+
+
+def medir_sessao(max_amostras=500):
+    # Como era: lista de floats do Python por seção; como é: array float32
+    lista = [0.123] * max_amostras
+    antes = SECOES_SESSAO * (sys.getsizeof(lista) + max_amostras * sys.getsizeof(0.123))
+    desempenho = metricas.RegistroSessao(max_amostras)
+    for secao in range(SECOES_SESSAO):
+        for _ in range(max_amostras):
+            desempenho.adicionar(str(secao), 0.123)
+    depois = sum(sys.getsizeof(valores) for valores in desempenho.amostras.values())
+    return {"sessao_latencias": {"antes": antes, "depois": depois, "reducao": _reducao(antes, depois)}}
+
+
+def _por_ticker(antes, depois, quantidade):
+    antes, depois = antes / quantidade, depois / quantidade
+    return {"antes": round(antes), "depois": round(depois), "reducao": _reducao(antes, depois)}
+
+
+def _reducao(antes, depois):
+    return round(1 - depois / antes, 3) if antes else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Orçamento de memória por ticker em cache.")
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout).")
+    args = parser.parse_args(argv)
+
+    tickers = universo(args.tickers)
+    relatorio = {"tickers": len(tickers), "bytes": {}}
+    relatorio["bytes"].update(medir_historicos(tickers))
+    relatorio["bytes"].update(medir_graficos(tickers[0]))
+    relatorio["bytes"].update(medir_sessao())
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""Servidor HTTP local que imita uma fonte externa instável (latência, 429 e 5xx).
+
+Usado pelos benchmarks do :mod:`cliente_upstream`: as respostas são JSON pequenos
+(``/cotacao/<ticker>``) e cada requisição pode sofrer atraso e erro conforme os
+parâmetros, que podem ser trocados com o servidor no ar (ex.: simular uma queda
+com ``servidor.configurar(indisponivel=True)``).
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorFalso:
+    """Fonte falsa em 127.0.0.1 (porta livre), com contadores das requisições recebidas."""
+
+    def __init__(self, latencia=0.0, taxa_erros=0.0, taxa_429=0.0, retry_after=1, semente=0):
+        self.latencia = latencia
+        self.taxa_erros = taxa_erros
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.indisponivel = False
+        self.contadores = {"requisicoes": 0, "200": 0, "429": 0, "503": 0}
+        self._rng = random.Random(semente)
+        self._trava = threading.Lock()
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), self._manipulador())
+        self._http.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def configurar(self, **parametros):
+        with self._trava:
+            for nome, valor in parametros.items():
+                setattr(self, nome, valor)
+
+    def zerar(self):
+        with self._trava:
+            self.contadores = dict.fromkeys(self.contadores, 0)
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excecao):
+        self.parar()
+
+    def _sortear(self):
+        """Status da próxima resposta, conforme a configuração atual."""
+        with self._trava:
+            self.contadores["requisicoes"] += 1
+            if self.indisponivel:
+                status = 503
+            else:
+                sorteio = self._rng.random()
+                status = 429 if sorteio < self.taxa_429 else 503 if sorteio < self.taxa_429 + self.taxa_erros else 200
+            self.contadores[str(status)] += 1
+            return status, self.latencia
+
+    def _manipulador(self):
+        servidor = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, latencia = servidor._sortear()
+                if latencia:
+                    time.sleep(latencia)
+                ticker = self.path.rstrip("/").rsplit("/", 1)[-1]
+                corpo = json.dumps({"ticker": ticker, "preco": 10.0} if status == 200 else {"erro": status}).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", str(servidor.retry_after))
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, formato, *args):
+                pass
+
+        return Manipulador
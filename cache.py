@@ -0,0 +1,470 @@
+"""Cache das funções de carga, independente do Streamlit.
+
+Cada função decorada com :func:`cacheado` guarda o resultado por `ttl` segundos.
+Chamadas concorrentes que erram a mesma chave compartilham uma única busca
+(single-flight), e o :mod:`agendador` usa ``recarregar``/``idade`` para
+renovar as entradas em segundo plano antes que expirem.
+
+Com ``ttl_falha``, uma :class:`~cliente_upstream.FalhaUpstream` levantada pela função
+também fica em cache, por pouco tempo e numa chave à parte: as chamadas seguintes
+levantam a mesma falha sem voltar à fonte, e o último resultado válido nunca é
+substituído por ela.
+
+O backend é escolhido pela variável de ambiente ``MONITOR_B3_CACHE``:
+
+- ``memoria`` (padrão): dicionário LRU no próprio processo;
+- ``sqlite`` ou ``sqlite:///caminho/cache.sqlite``: arquivo local compartilhado
+  pelos processos da mesma máquina;
+- ``redis://host:porta/db``: servidor Redis (ou compatível) compartilhado pelas réplicas.
+
+Os valores são serializados com pickle protocolo 5 (DataFrames incluídos). Se o
+Redis cair, o cache se comporta como vazio (a função é chamada) em vez de propagar o
+erro para as cargas.
+"""
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import metricas
+from cliente_upstream import FalhaUpstream
+
+logger = logging.getLogger(__name__)
+
+PROTOCOLO_PICKLE = 5
+
+# Sufixo da chave onde fica a falha em cache (separada da chave do resultado)
+SUFIXO_FALHA = ":falha"
+
+# Tempo máximo (s) de conexão e de resposta do Redis antes de seguir sem cache
+TIMEOUT_REDIS = 2.0
+
+# Precisão (s) do horário de último acesso do CacheSQLite, usado só na ordem de despejo (LRU)
+RESOLUCAO_ACESSO = 60
+
+
+def serializar(valor):
+    return pickle.dumps(valor, protocol=PROTOCOLO_PICKLE)
+
+
+def desserializar(dados):
+    return pickle.loads(dados)
+
+
+class _Estatisticas:
+    """Contadores de acertos/erros/gravações/despejos do backend (por processo)."""
+
+    def __init__(self):
+        self._contadores = {"acertos": 0, "erros": 0, "gravacoes": 0, "despejos": 0}
+        self._trava_contadores = threading.Lock()
+
+    def _contar(self, nome, quantidade=1):
+        with self._trava_contadores:
+            self._contadores[nome] += quantidade
+
+    def estatisticas(self):
+        with self._trava_contadores:
+            return dict(self._contadores)
+
+
+class CacheMemoria(_Estatisticas):
+    """Entradas com TTL guardadas em memória no processo, limitadas a `max_entradas` (LRU)."""
+
+    def __init__(self, max_entradas=512):
+        super().__init__()
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._trava = threading.Lock()
+
+    def ler(self, chave, contar=True):
+        """Retorna ``(valor,)`` se a entrada existe e não expirou, senão None.
+
+        Com ``contar=False`` (consultas internas, como a da falha em cache) a leitura
+        não entra nos acertos/erros.
+        """
+        with self._trava:
+            entrada = self._dados.get(chave)
+            if entrada is not None:
+                self._dados.move_to_end(chave)
+        if entrada is None or time.time() >= entrada[2]:
+            if contar:
+                self._contar("erros")
+            return None
+        if contar:
+            self._contar("acertos")
+        return (entrada[0],)
+
+    def gravar(self, chave, valor, ttl):
+        agora = time.time()
+        with self._trava:
+            self._dados[chave] = (valor, agora, agora + ttl)
+            self._dados.move_to_end(chave)
+            despejos = 0
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+                despejos += 1
+        self._contar("gravacoes")
+        if despejos:
+            self._contar("despejos", despejos)
+
+    def idade(self, chave):
+        """Segundos desde a última gravação da chave (None se nunca gravada)."""
+        with self._trava:
+            entrada = self._dados.get(chave)
+        return None if entrada is None else time.time() - entrada[1]
+
+    def travar(self, chave, segundos):
+        """Num processo só, o single-flight já basta: a trava sempre é concedida."""
+        return True
+
+    def limpar(self, prefixo=""):
+        with self._trava:
+            for chave in [c for c in self._dados if c.startswith(prefixo)]:
+                del self._dados[chave]
+
+
+class CacheSQLite(_Estatisticas):
+    """Cache em arquivo SQLite, compartilhado pelos processos da máquina, limitado a `max_bytes` (LRU)."""
+
+    def __init__(self, caminho=os.path.join("dados", "cache.sqlite"), max_bytes=256 * 1024 * 1024):
+        super().__init__()
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            # O modo WAL fica gravado no arquivo: basta ligá-lo uma vez
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    chave TEXT PRIMARY KEY,
+                    valor BLOB NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    gravado_em REAL NOT NULL,
+                    expira_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS cache_acesso ON cache (acessado_em);
+                CREATE TABLE IF NOT EXISTS travas (
+                    chave TEXT PRIMARY KEY,
+                    expira_em REAL NOT NULL
+                );
+            """)
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def ler(self, chave, contar=True):
+        agora = time.time()
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT valor, acessado_em FROM cache WHERE chave = ? AND expira_em > ?", (chave, agora)
+            ).fetchone()
+            # Acerto só vira escrita se o último acesso gravado já passou de RESOLUCAO_ACESSO
+            if linha is not None and agora - linha[1] >= RESOLUCAO_ACESSO:
+                conexao.execute("UPDATE cache SET acessado_em = ? WHERE chave = ?", (agora, chave))
+        if linha is None:
+            if contar:
+                self._contar("erros")
+            return None
+        if contar:
+            self._contar("acertos")
+        return (desserializar(linha[0]),)
+
+    def gravar(self, chave, valor, ttl):
+        dados = serializar(valor)
+        agora = time.time()
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT OR REPLACE INTO cache (chave, valor, tamanho, gravado_em, expira_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, dados, len(dados), agora, agora + ttl, agora),
+            )
+            despejos = self._despejar(conexao, agora)
+        self._contar("gravacoes")
+        if despejos:
+            self._contar("despejos", despejos)
+
+    def _despejar(self, conexao, agora):
+        """Remove as entradas expiradas e, se ainda passar de `max_bytes`, as menos acessadas."""
+        despejos = conexao.execute("DELETE FROM cache WHERE expira_em <= ?", (agora,)).rowcount
+        total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return despejos
+        for chave, tamanho in conexao.execute(
+            "SELECT chave, tamanho FROM cache ORDER BY acessado_em"
+        ).fetchall():
+            conexao.execute("DELETE FROM cache WHERE chave = ?", (chave,))
+            despejos += 1
+            total -= tamanho
+            if total <= self.max_bytes:
+                break
+        return despejos
+
+    def idade(self, chave):
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT gravado_em FROM cache WHERE chave = ?", (chave,)).fetchone()
+        return None if linha is None else time.time() - linha[0]
+
+    def travar(self, chave, segundos):
+        """Trava entre processos: só um deles recarrega a chave por vez."""
+        agora = time.time()
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM travas WHERE chave = ? AND expira_em <= ?", (chave, agora))
+            cursor = conexao.execute(
+                "INSERT OR IGNORE INTO travas (chave, expira_em) VALUES (?, ?)", (chave, agora + segundos)
+            )
+            return cursor.rowcount == 1
+
+    def limpar(self, prefixo=""):
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM cache WHERE substr(chave, 1, ?) = ?", (len(prefixo), prefixo))
+
+
+class CacheRedis(_Estatisticas):
+    """Cache num servidor Redis (ou compatível) compartilhado por todas as réplicas.
+
+    O TTL é aplicado pelo próprio servidor (``EX``). O limite de tamanho/LRU é o
+    ``maxmemory`` do servidor com ``maxmemory-policy allkeys-lru``; os despejos
+    contados são os ``evicted_keys`` do ``INFO stats`` desde a criação do backend
+    (do servidor todo, não só deste processo).
+
+    Com o servidor fora do ar, as leituras erram, as gravações são descartadas e a
+    trava é concedida (cada réplica recarrega por conta própria): o erro só vai ao log.
+    """
+
+    def __init__(self, url, prefixo="monitor_b3:"):
+        super().__init__()
+        import redis  # dependência opcional, só necessária com este backend
+
+        self.prefixo = prefixo
+        self._erro_redis = redis.RedisError
+        self._cliente = redis.Redis.from_url(
+            url, socket_connect_timeout=TIMEOUT_REDIS, socket_timeout=TIMEOUT_REDIS,
+        )
+        self._despejos_iniciais = self._despejos_servidor()
+
+    def _despejos_servidor(self):
+        """Chaves despejadas pelo servidor (``INFO stats``); None se o servidor não informar."""
+        try:
+            return int(self._cliente.info("stats")["evicted_keys"])
+        except (self._erro_redis, KeyError, ValueError):
+            return None
+
+    def estatisticas(self):
+        estatisticas = super().estatisticas()
+        despejos = self._despejos_servidor()
+        if despejos is not None:
+            if self._despejos_iniciais is None:
+                self._despejos_iniciais = despejos
+            estatisticas["despejos"] = despejos - self._despejos_iniciais
+        return estatisticas
+
+    def _indisponivel(self, operacao, erro):
+        logger.warning("Redis indisponível (%s): %s; seguindo sem cache", operacao, erro)
+        metricas.anotar(erro=repr(erro))
+
+    def ler(self, chave, contar=True):
+        try:
+            dados = self._cliente.get(self.prefixo + chave)
+        except self._erro_redis as e:
+            self._indisponivel("ler", e)
+            dados = None
+        if dados is None:
+            if contar:
+                self._contar("erros")
+            return None
+        if contar:
+            self._contar("acertos")
+        return (desserializar(dados),)
+
+    def gravar(self, chave, valor, ttl):
+        segundos = max(int(ttl), 1)
+        try:
+            with self._cliente.pipeline() as pipe:
+                pipe.set(self.prefixo + chave, serializar(valor), ex=segundos)
+                pipe.set(self.prefixo + "gravado_em:" + chave, repr(time.time()), ex=segundos)
+                pipe.execute()
+        except self._erro_redis as e:
+            self._indisponivel("gravar", e)
+            return
+        self._contar("gravacoes")
+
+    def idade(self, chave):
+        try:
+            gravado_em = self._cliente.get(self.prefixo + "gravado_em:" + chave)
+        except self._erro_redis as e:
+            self._indisponivel("idade", e)
+            return None
+        return None if gravado_em is None else time.time() - float(gravado_em)
+
+    def travar(self, chave, segundos):
+        """Trava entre réplicas via ``SET NX``: só uma delas recarrega a chave por vez."""
+        try:
+            return bool(self._cliente.set(self.prefixo + "trava:" + chave, b"1", nx=True, ex=max(int(segundos), 1)))
+        except self._erro_redis as e:
+            self._indisponivel("travar", e)
+            return True
+
+    def limpar(self, prefixo=""):
+        try:
+            for padrao in (self.prefixo + prefixo + "*", self.prefixo + "gravado_em:" + prefixo + "*"):
+                chaves = list(self._cliente.scan_iter(match=padrao, count=500))
+                if chaves:
+                    self._cliente.delete(*chaves)
+        except self._erro_redis as e:
+            self._indisponivel("limpar", e)
+
+
+def backend_da_url(url):
+    """Cria o backend a partir da configuração (ver docstring do módulo)."""
+    if not url or url == "memoria":
+        return CacheMemoria()
+    if url == "sqlite":
+        return CacheSQLite()
+    if url.startswith("sqlite:///"):
+        return CacheSQLite(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return CacheRedis(url)
+    raise ValueError(f"Backend de cache desconhecido: {url}")
+
+
+class SingleFlight:
+    """Garante uma única execução em andamento por chave; os demais chamadores esperam o resultado."""
+
+    def __init__(self):
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+
+    def executar(self, chave, func):
+        with self._trava:
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_andamento[chave] = {"evento": threading.Event()}
+
+        if not lider:
+            chamada["evento"].wait()
+            if "erro" in chamada:
+                raise chamada["erro"]
+            return chamada["valor"]
+
+        try:
+            chamada["valor"] = func()
+            return chamada["valor"]
+        except Exception as e:
+            chamada["erro"] = e
+            raise
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
+            chamada["evento"].set()
+
+
+_backend = backend_da_url(os.environ.get("MONITOR_B3_CACHE", "memoria"))
+_voo_unico = SingleFlight()
+
+
+def configurar_backend(backend):
+    """Troca o backend do processo (ex.: ``configurar_backend(CacheSQLite("/tmp/c.sqlite"))``)."""
+    global _backend
+    _backend = backend
+
+
+def estatisticas():
+    """Contadores de acerto/erro do backend atual."""
+    return _backend.estatisticas()
+
+
+def _chave(prefixo, args, kwargs):
+    conteudo = pickle.dumps((args, sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+    return f"{prefixo}:{hashlib.sha1(conteudo).hexdigest()}"
+
+
+def cacheado(ttl, nome=None, ttl_falha=None):
+    """Decorador de cache com TTL e single-flight, usável dentro e fora do Streamlit.
+
+    `ttl_falha` (s) liga o cache negativo das falhas do upstream (desligado se None).
+    """
+
+    def decorador(func):
+        prefixo = nome or f"{func.__module__}.{func.__qualname__}"
+
+        def buscar(chave, args, kwargs):
+            def carregar():
+                try:
+                    valor = func(*args, **kwargs)
+                except FalhaUpstream as e:
+                    if ttl_falha:
+                        _backend.gravar(chave + SUFIXO_FALHA, str(e), ttl_falha)
+                    raise
+                _backend.gravar(chave, valor, ttl)
+                return valor
+
+            return _voo_unico.executar(chave, carregar)
+
+        @functools.wraps(func)
+        def envoltorio(*args, **kwargs):
+            chave = _chave(prefixo, args, kwargs)
+            achado = _backend.ler(chave)
+            if achado is not None:
+                metricas.anotar(cache="acerto")
+                return achado[0]
+            if ttl_falha:
+                falha = _backend.ler(chave + SUFIXO_FALHA, contar=False)
+                if falha is not None:
+                    metricas.anotar(cache="falha")
+                    raise FalhaUpstream(falha[0])
+            metricas.anotar(cache="falta")
+            return buscar(chave, args, kwargs)
+
+        def recarregar(*args, **kwargs):
+            """Busca de novo e substitui a entrada, mesmo que ainda válida.
+
+            Não vai à fonte (retorna None) enquanto houver uma falha em cache para a chave.
+            Com backend compartilhado, só a réplica que obtiver a trava busca; as demais
+            retornam None e passam a ler a entrada renovada por ela.
+            """
+            chave = _chave(prefixo, args, kwargs)
+            # Falha recente em cache: a fonte só é consultada de novo depois de `ttl_falha`
+            if _falha_em_cache(chave) or not _backend.travar(chave, ttl * 0.1):
+                return None
+            return buscar(chave, args, kwargs)
+
+        def idade(*args, **kwargs):
+            return _backend.idade(_chave(prefixo, args, kwargs))
+
+        def em_falha(*args, **kwargs):
+            """True se a última busca destes argumentos falhou há menos de `ttl_falha` segundos."""
+            return _falha_em_cache(_chave(prefixo, args, kwargs))
+
+        def _falha_em_cache(chave):
+            # Consulta interna: não conta como erro nas estatísticas do cache
+            return bool(ttl_falha) and _backend.ler(chave + SUFIXO_FALHA, contar=False) is not None
+
+        def clear():
+            _backend.limpar(prefixo + ":")
+
+        envoltorio.ttl = ttl
+        envoltorio.ttl_falha = ttl_falha
+        envoltorio.recarregar = recarregar
+        envoltorio.idade = idade
+        envoltorio.em_falha = em_falha
+        envoltorio.clear = clear
+        return envoltorio
+
+    return decorador
@@ -0,0 +1,277 @@
+"""Cliente único para as fontes externas (Yahoo Finance e Google Notícias).
+
+Cada fonte tem um :class:`ClienteUpstream` por processo, com:
+
+- sessão HTTP compartilhada (pool de conexões reaproveitadas entre as chamadas);
+- limite de taxa por balde de fichas (:class:`BaldeFichas`): rajadas curtas passam
+  direto, e o ritmo médio fica em ``taxa`` requisições por segundo;
+- novas tentativas com espera exponencial e jitter completo para as falhas
+  transitórias (429, 5xx, timeout, conexão recusada), respeitando o ``Retry-After``;
+- disjuntor (:class:`Disjuntor`): depois de ``limite_falhas`` falhas transitórias
+  seguidas a fonte fica ``tempo_aberto`` segundos sem receber chamadas, e uma única
+  chamada de teste decide se ele fecha de novo.
+
+Quando a fonte não responde, :meth:`ClienteUpstream.chamar` levanta
+:class:`FalhaUpstream` em vez de devolver um valor vazio: o :mod:`cache` guarda a
+falha por pouco tempo, numa chave separada, e nunca a grava como resultado.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+# Conexões mantidas abertas por host na sessão compartilhada
+TAMANHO_POOL = 32
+
+# Espera (s) antes da 2ª tentativa; dobra a cada nova tentativa, até ESPERA_MAXIMA
+ESPERA_BASE = 0.5
+ESPERA_MAXIMA = 8.0
+
+STATUS_TRANSITORIOS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Exceções de bibliotecas de terceiros (yfinance, curl_cffi) reconhecidas pelo nome, sem importá-las aqui
+# (YFDataException: o Yahoo respondeu com a página de manutenção em vez dos dados)
+_NOMES_TRANSITORIOS = frozenset({
+    "YFRateLimitError", "YFDataException", "ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout",
+})
+
+
+class FalhaUpstream(Exception):
+    """A fonte externa não respondeu (mesmo depois das novas tentativas) ou está com o disjuntor aberto."""
+
+
+class CircuitoAberto(FalhaUpstream):
+    """O disjuntor da fonte está aberto: a chamada nem chegou a ser feita."""
+
+
+class RespostaTransitoria(Exception):
+    """Resposta HTTP com status transitório (429, 5xx), com o ``Retry-After`` quando houver."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        try:
+            self.retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            self.retry_after = None
+
+
+def transitoria(erro):
+    """Se vale a pena tentar de novo: limite de taxa, erro 5xx, timeout ou falha de conexão."""
+    if isinstance(erro, (RespostaTransitoria, TimeoutError, ConnectionError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if any(classe.__name__ in _NOMES_TRANSITORIOS for classe in type(erro).__mro__):
+        return True
+    resposta = getattr(erro, "response", None)
+    status = getattr(resposta, "status_code", None) or getattr(erro, "code", None)
+    return status in STATUS_TRANSITORIOS
+
+
+class BaldeFichas:
+    """Limite de taxa: até `capacidade` chamadas em rajada, repostas a `taxa` fichas por segundo."""
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._fichas = float(capacidade)
+        self._atualizado_em = time.monotonic()
+        self._trava = threading.Lock()
+
+    def reservar(self):
+        """Reserva uma ficha e devolve quantos segundos esperar até ela estar disponível.
+
+        O saldo pode ficar negativo: cada chamada já sai com a sua vez na fila, e as
+        threads esperam em paralelo sem disputar a trava.
+        """
+        with self._trava:
+            agora = time.monotonic()
+            self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado_em) * self.taxa)
+            self._atualizado_em = agora
+            self._fichas -= 1
+            return max(0.0, -self._fichas / self.taxa)
+
+    def consumir(self):
+        espera = self.reservar()
+        if espera:
+            time.sleep(espera)
+        return espera
+
+
+class Disjuntor:
+    """Disjuntor fechado -> aberto (após `limite_falhas` falhas seguidas) -> meio aberto (uma chamada de teste)."""
+
+    FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+    def __init__(self, limite_falhas=5, tempo_aberto=30.0):
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self.estado = self.FECHADO
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._em_teste = False
+        self._trava = threading.Lock()
+
+    def permitir(self):
+        """Se a chamada pode seguir; com o disjuntor meio aberto, só uma por vez (a de teste)."""
+        with self._trava:
+            if self.estado == self.ABERTO:
+                if time.monotonic() < self._aberto_ate:
+                    return False
+                self.estado = self.MEIO_ABERTO
+            if self.estado == self.MEIO_ABERTO:
+                if self._em_teste:
+                    return False
+                self._em_teste = True
+            return True
+
+    def sucesso(self):
+        with self._trava:
+            self.estado = self.FECHADO
+            self._falhas = 0
+            self._em_teste = False
+
+    def falha(self):
+        """Registra uma falha transitória; devolve True se o disjuntor abriu agora."""
+        with self._trava:
+            self._falhas += 1
+            self._em_teste = False
+            if self.estado == self.MEIO_ABERTO or self._falhas >= self.limite_falhas:
+                abriu = self.estado != self.ABERTO
+                self.estado = self.ABERTO
+                self._aberto_ate = time.monotonic() + self.tempo_aberto
+                return abriu
+            return False
+
+
+def nova_sessao(tamanho_pool=TAMANHO_POOL):
+    """Sessão ``requests`` com pool de conexões e sem novas tentativas próprias (quem tenta de novo é o cliente)."""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=0)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+
+def _sessao_yahoo():
+    # O Yahoo recusa clientes sem a impressão TLS de um navegador: mesma sessão curl_cffi que o
+    # yfinance criaria (um handle de conexão por thread), mas uma só para todas as chamadas
+    from curl_cffi import requests as curl_requests  # dependência do yfinance
+    return curl_requests.Session(impersonate="chrome")
+
+
+class ClienteUpstream:
+    """Chamadas a uma fonte externa com limite de taxa, novas tentativas e disjuntor."""
+
+    def __init__(self, nome, taxa=5.0, capacidade=10, tentativas=3, limite_falhas=5, tempo_aberto=30.0,
+                 espera_base=ESPERA_BASE, espera_maxima=ESPERA_MAXIMA, fabrica_sessao=nova_sessao):
+        self.nome = nome
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.balde = BaldeFichas(taxa, capacidade)
+        self.disjuntor = Disjuntor(limite_falhas, tempo_aberto)
+        self._fabrica_sessao = fabrica_sessao
+        self._sessao = None
+        self._trava_sessao = threading.Lock()
+
+    @property
+    def sessao(self):
+        """Sessão HTTP compartilhada (criada na primeira chamada que precisar dela)."""
+        with self._trava_sessao:
+            if self._sessao is None:
+                self._sessao = self._fabrica_sessao()
+            return self._sessao
+
+    def chamar(self, func, *args, **kwargs):
+        """Executa `func(*args, **kwargs)` contra a fonte; levanta :class:`FalhaUpstream` se ela não responder."""
+        ultimo_erro = None
+        for tentativa in range(self.tentativas):
+            if not self.disjuntor.permitir():
+                self._contar("circuito_aberto")
+                raise CircuitoAberto(f"{self.nome}: disjuntor aberto") from ultimo_erro
+
+            self.balde.consumir()
+            try:
+                resultado = func(*args, **kwargs)
+            except FalhaUpstream:
+                # Chamada aninhada a outro cliente, que já tentou de novo e contou a falha
+                self.disjuntor.sucesso()
+                raise
+            except Exception as e:
+                if not transitoria(e):
+                    # A fonte respondeu (com algo inesperado): não conta contra o disjuntor
+                    self.disjuntor.sucesso()
+                    self._contar("erro")
+                    raise FalhaUpstream(f"{self.nome}: {e!r}") from e
+
+                ultimo_erro = e
+                self._contar("transitoria")
+                if self.disjuntor.falha():
+                    self._contar("disjuntor_abriu")
+                if tentativa + 1 < self.tentativas:
+                    time.sleep(self._espera(tentativa, e))
+                continue
+
+            self.disjuntor.sucesso()
+            self._contar("sucesso")
+            return resultado
+
+        raise FalhaUpstream(f"{self.nome}: {ultimo_erro!r} após {self.tentativas} tentativas") from ultimo_erro
+
+    def obter(self, url, timeout=10, **kwargs):
+        """GET pela sessão compartilhada; status 429/5xx contam como falha transitória."""
+        def requisitar():
+            resposta = self.sessao.get(url, timeout=timeout, **kwargs)
+            if resposta.status_code in STATUS_TRANSITORIOS:
+                raise RespostaTransitoria(resposta.status_code, resposta.headers.get("Retry-After"))
+            resposta.raise_for_status()
+            return resposta
+
+        return self.chamar(requisitar)
+
+    def _espera(self, tentativa, erro):
+        # Jitter completo: sorteio entre 0 e o teto exponencial, para as réplicas não voltarem juntas
+        teto = min(self.espera_maxima, self.espera_base * 2 ** tentativa)
+        espera = random.uniform(0, teto)
+        retry_after = getattr(erro, "retry_after", None)
+        if retry_after:
+            espera = max(espera, min(retry_after, self.espera_maxima))
+        return espera
+
+    def _contar(self, resultado):
+        metricas.registro.contar("upstream_chamadas_total", fonte=self.nome, resultado=resultado)
+
+
+# --- CLIENTES POR FONTE (UM POR PROCESSO) ---
+FONTES = {
+    # Uma ficha por requisição HTTP (um ticker por chamada de histórico)
+    "yahoo": {"taxa": 20.0, "capacidade": 50, "tentativas": 4, "limite_falhas": 5, "tempo_aberto": 30.0},
+    "googlenews": {"taxa": 1.0, "capacidade": 5, "tentativas": 3, "limite_falhas": 3, "tempo_aberto": 120.0},
+}
+
+SESSOES = {"yahoo": _sessao_yahoo}
+
+_clientes = {}
+_trava_clientes = threading.Lock()
+
+
+def obter_cliente(nome):
+    """Instância única do cliente da fonte `nome` (``yahoo`` ou ``googlenews``) por processo."""
+    with _trava_clientes:
+        cliente = _clientes.get(nome)
+        if cliente is None:
+            cliente = _clientes[nome] = ClienteUpstream(
+                nome, fabrica_sessao=SESSOES.get(nome, nova_sessao), **FONTES[nome]
+            )
+        return cliente
+
+
+def configurar_fonte(nome, **parametros):
+    """Altera os parâmetros da fonte `nome` no processo (ex.: ``configurar_fonte("yahoo", taxa=40)``)."""
+    with _trava_clientes:
+        FONTES[nome] = {**FONTES.get(nome, {}), **parametros}
+        _clientes.pop(nome, None)
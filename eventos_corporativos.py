@@ -0,0 +1,145 @@
+"""Índice local de eventos corporativos (proventos e desdobramentos) por ticker e data ex.
+
+Os eventos ficam na tabela ``eventos`` do armazém de cotações, gravados pelo próprio
+download de barras (que já vem com proventos e desdobramentos): sincronizar o índice
+é garantir ao armazém a janela de :data:`ANOS_HISTORICO` anos. Para as consultas, os
+proventos são mantidos em memória ordenados por (ticker, data ex) com a soma
+acumulada ao lado: o total de qualquer janela (ex.: 12 meses) sai de duas buscas
+binárias por ticker, para todos os tickers de uma vez.
+
+O Yahoo não separa dividendos de JCP: os dois chegam somados na coluna
+``Dividends`` (valor bruto por ação, já ajustado por desdobramentos).
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from armazem_precos import CAMINHO_PADRAO, TAMANHO_LOTE, ArmazemPrecos, obter_armazem
+
+# Histórico garantido na primeira sincronização de cada ticker
+ANOS_HISTORICO = 5
+
+
+class IndiceEventos:
+    """Proventos e desdobramentos por (ticker, data ex), com somas acumuladas em memória."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO, armazem=None):
+        # Quem baixa (e grava os eventos) é o armazém: o índice lê do arquivo dele
+        self._armazem = armazem or ArmazemPrecos(caminho)
+        self.caminho = self._armazem.caminho
+        self._trava = threading.Lock()
+        # Proventos ordenados por (ticker, data): índice dos tickers, chave composta e
+        # soma acumulada, trocados juntos (as consultas leem sem trava)
+        self._somas = ({}, np.empty(0, dtype=np.int64), np.zeros(1))
+        self._versao = None
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    # --- SINCRONIZAÇÃO INCREMENTAL ---
+    def sincronizar(self, tickers, max_idade=3600 * 12, tamanho_lote=TAMANHO_LOTE):
+        """Garante os eventos dos últimos ANOS_HISTORICO anos de cada ticker.
+
+        Delega ao armazém: o que a sincronização de cotações já trouxe há menos de
+        `max_idade` segundos não volta à fonte, e tickers que outra thread está
+        baixando só são esperados (não bloqueiam os demais nem as consultas).
+        """
+        self._armazem.sincronizar(
+            tickers, dias=365 * ANOS_HISTORICO, max_idade=max_idade, tamanho_lote=tamanho_lote,
+        )
+
+    # --- SOMAS ACUMULADAS ---
+    def _acumulados(self):
+        """Somas atuais, remontadas se os proventos mudaram em disco (por este ou outro processo)."""
+        versao = self._versao_em_disco()
+        if versao != self._versao:
+            # Só a remontagem é serializada; as consultas usam o conjunto anterior enquanto isso
+            with self._trava:
+                versao = self._versao_em_disco()
+                if versao != self._versao:
+                    self._somas = self._carregar_acumulados()
+                    self._versao = versao
+        return self._somas
+
+    def _versao_em_disco(self):
+        with self._conectar() as conexao:
+            return conexao.execute(
+                "SELECT COUNT(*), TOTAL(valor) FROM eventos WHERE tipo = 'provento'"
+            ).fetchone()
+
+    def _carregar_acumulados(self):
+        """Lê todos os proventos ordenados e monta chaves (ticker, dia) e a soma acumulada."""
+        with self._conectar() as conexao:
+            linhas = pd.read_sql_query(
+                "SELECT ticker, data_ex, valor FROM eventos WHERE tipo = 'provento' ORDER BY ticker, data_ex",
+                conexao,
+            )
+
+        codigos, tickers = pd.factorize(linhas["ticker"], sort=True)
+        dias = pd.to_datetime(linhas["data_ex"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+        indices = {ticker: i for i, ticker in enumerate(tickers)}
+        # acumulado[k] = soma dos k primeiros proventos (acumulado[0] = 0)
+        acumulado = np.concatenate([[0.0], np.cumsum(linhas["valor"].to_numpy(dtype=float))])
+        return indices, _chave(codigos, dias), acumulado
+
+    def total_periodo(self, tickers, inicio, fim):
+        """Soma dos proventos com data ex entre `inicio` e `fim` (inclusive) para cada ticker, de uma vez."""
+        indices, chaves, acumulado = self._acumulados()
+
+        tickers = list(tickers)
+        codigos = np.array([indices.get(t, -1) for t in tickers], dtype=np.int64)
+        inicio = np.datetime64(pd.Timestamp(inicio).date(), "D").astype(np.int64)
+        fim = np.datetime64(pd.Timestamp(fim).date(), "D").astype(np.int64)
+
+        ate_fim = np.searchsorted(chaves, _chave(codigos, fim), side="right")
+        antes_inicio = np.searchsorted(chaves, _chave(codigos, inicio), side="left")
+        totais = acumulado[ate_fim] - acumulado[antes_inicio]
+        totais[codigos < 0] = 0.0
+        return pd.Series(totais, index=pd.Index(tickers, name="Ticker"), name="proventos")
+
+    def total_12m(self, tickers, referencia=None):
+        """Proventos pagos nos 12 meses até `referencia` (padrão: hoje)."""
+        fim = pd.Timestamp(referencia or date.today())
+        return self.total_periodo(tickers, fim - pd.DateOffset(years=1), fim)
+
+    # --- CONSULTAS POR TICKER ---
+    def eventos(self, ticker, tipo=None, desde=None):
+        """Eventos de um ticker (data ex, tipo, valor), do mais antigo ao mais recente."""
+        consulta = "SELECT data_ex, tipo, valor FROM eventos WHERE ticker = ? AND data_ex >= ?"
+        params = [ticker, str(desde or "0001-01-01")[:10]]
+        if tipo:
+            consulta += " AND tipo = ?"
+            params.append(tipo)
+        with self._conectar() as conexao:
+            df = pd.read_sql_query(consulta + " ORDER BY data_ex", conexao, params=params)
+        df["data_ex"] = pd.to_datetime(df["data_ex"])
+        return df
+
+
+def _chave(codigos, dias):
+    # Ordena por ticker e, dentro dele, por dia (dias desde 1970 cabem folgados em 2**32)
+    return np.asarray(codigos, dtype=np.int64) * (1 << 32) + np.asarray(dias, dtype=np.int64)
+
+
+_indice = None
+_trava_indice = threading.Lock()
+
+
+def obter_indice_eventos():
+    """Instância única do índice por processo."""
+    global _indice
+    with _trava_indice:
+        if _indice is None:
+            _indice = IndiceEventos(armazem=obter_armazem())
+        return _indice
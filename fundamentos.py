@@ -0,0 +1,282 @@
+"""Snapshot de fundamentos do universo inteiro, em tabela colunar tipada e com filtro rápido.
+
+Os campos usados pelo app (P/L, P/VPA, VPA, valor de mercado, setor...) são extraídos
+uma vez do ``yf.Ticker.info`` de cada ativo e guardados numa tabela com tipos fixos
+(float32/categoria), persistida em Parquet. A atualização é lenta e em segundo plano
+(só as linhas mais velhas que ``max_idade``); as consultas e o :meth:`~SnapshotFundamentos.filtrar`
+rodam em memória, sem nenhuma chamada ao Yahoo.
+
+Exemplo de filtro::
+
+    obter_fundamentos().filtrar("P/L < 8 e P/VPA < 1 e DY > 6%")
+"""
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from armazem_precos import obter_armazem
+from cliente_upstream import obter_cliente
+from eventos_corporativos import obter_indice_eventos
+from metricas import anotar, somar_bytes
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = os.environ.get("MONITOR_B3_FUNDAMENTOS", os.path.join("dados", "fundamentos.parquet"))
+
+# Coluna -> tipo na tabela (float32 basta para múltiplos e percentuais)
+COLUNAS = {
+    "nome": "string",
+    "setor": "category",
+    "industria": "category",
+    "preco": "float32",
+    "pl": "float32",
+    "pvpa": "float32",
+    "vpa": "float32",
+    "lpa": "float32",
+    "roe": "float32",
+    "margem_liquida": "float32",
+    "divida_patrimonio": "float32",
+    "valor_mercado": "float64",
+    "dy": "float32",
+    "atualizado_em": "float64",
+}
+
+# Nomes aceitos no filtro (sem espaços, minúsculas) -> coluna
+APELIDOS = {
+    "p/l": "pl",
+    "p/vpa": "pvpa",
+    "p/vp": "pvpa",
+    "lpa": "lpa",
+    "vpa": "vpa",
+    "dy": "dy",
+    "roe": "roe",
+    "margem": "margem_liquida",
+    "margemliquida": "margem_liquida",
+    "dívida/patrimônio": "divida_patrimonio",
+    "divida/patrimonio": "divida_patrimonio",
+    "valordemercado": "valor_mercado",
+    "preço": "preco",
+}
+
+PARALELO = 8
+
+_OPERADORES = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "=": np.equal,
+    "!=": np.not_equal,
+}
+_CLAUSULA = re.compile(
+    r"^\s*(?P<campo>[^<>=!]+?)\s*(?P<op><=|>=|==|!=|<|>|=)\s*"
+    r"(?:(?P<numero>-?\d+(?:[.,]\d+)?)\s*%?|'(?P<texto1>[^']*)'|\"(?P<texto2>[^\"]*)\")\s*$"
+)
+_SEPARADOR = re.compile(r"\s+(?:and|e)\s+|\s*&&?\s*", re.IGNORECASE)
+
+
+def _numero(valor):
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+    return valor if np.isfinite(valor) else np.nan
+
+
+def extrair_campos(info):
+    """Campos tipados do snapshot a partir do dicionário .info (percentuais em %)."""
+    info = info or {}
+    pl = info.get("forwardPE") if info.get("forwardPE") is not None else info.get("trailingPE")
+    roe = _numero(info.get("returnOnEquity"))
+    margem = _numero(info.get("profitMargins"))
+    return {
+        "nome": info.get("longName") or info.get("shortName"),
+        "setor": info.get("sector"),
+        "industria": info.get("industry"),
+        "preco": _numero(info.get("regularMarketPrice") or info.get("currentPrice")),
+        "pl": _numero(pl),
+        "pvpa": _numero(info.get("priceToBook")),
+        "vpa": _numero(info.get("bookValue")),
+        "lpa": _numero(info.get("trailingEps")),
+        "roe": roe * 100,
+        "margem_liquida": margem * 100,
+        "divida_patrimonio": _numero(info.get("debtToEquity")),
+        "valor_mercado": _numero(info.get("marketCap")),
+    }
+
+
+def tabela_vazia():
+    return _tipar(pd.DataFrame(columns=list(COLUNAS), index=pd.Index([], name="ticker", dtype="string")))
+
+
+def _tipar(df):
+    return df.reindex(columns=list(COLUNAS)).astype(COLUNAS)
+
+
+class SnapshotFundamentos:
+    """Tabela de fundamentos (um ticker por linha) persistida em Parquet e consultada em memória."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self._tabela = tabela_vazia()
+        self._lido_em = None
+
+    # --- LEITURA ---
+    def tabela(self):
+        """A tabela atual (recarregada do disco se outro processo a regravou)."""
+        with self._trava:
+            self._recarregar_se_mudou()
+            return self._tabela
+
+    def _recarregar_se_mudou(self):
+        try:
+            modificado = os.stat(self.caminho).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if modificado != self._lido_em:
+            self._tabela = _tipar(pd.read_parquet(self.caminho))
+            self._lido_em = modificado
+
+    def linha(self, ticker):
+        """Fundamentos de um ticker (dict) ou None se ainda não estiver no snapshot."""
+        tabela = self.tabela()
+        if ticker not in tabela.index:
+            return None
+        return tabela.loc[ticker].to_dict()
+
+    # --- ATUALIZAÇÃO (LENTA, EM SEGUNDO PLANO) ---
+    def atualizar(self, tickers, max_idade=3600 * 24, paralelo=PARALELO):
+        """Rebaixa o .info só dos tickers ausentes ou mais velhos que `max_idade`; devolve quantos."""
+        tickers = list(dict.fromkeys(tickers))
+        agora = time.time()
+        atual = self.tabela()
+        idade = agora - atual["atualizado_em"].reindex(tickers).fillna(0).to_numpy()
+        vencidos = [t for t, i in zip(tickers, idade) if i >= max_idade]
+        if not vencidos:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix="fundamentos") as pool:
+            linhas = dict(zip(vencidos, pool.map(self._buscar, vencidos)))
+        linhas = {ticker: campos for ticker, campos in linhas.items() if campos is not None}
+        if not linhas:
+            return 0
+
+        novas = pd.DataFrame.from_dict(linhas, orient="index")
+        novas["atualizado_em"] = agora
+        novas["dy"] = self._dividend_yield(novas.index, novas["preco"])
+
+        with self._trava:
+            self._recarregar_se_mudou()
+            base = self._tabela.drop(index=novas.index, errors="ignore")
+            tabela = _tipar(pd.concat([base, _tipar(novas)]) if len(base) else novas)
+            tabela.index = tabela.index.astype("string").rename("ticker")
+            self._gravar(tabela)
+            self._tabela = tabela
+        return len(linhas)
+
+    @staticmethod
+    def _buscar(ticker):
+        yahoo = obter_cliente("yahoo")
+        try:
+            info = yahoo.chamar(lambda: yf.Ticker(ticker, session=yahoo.sessao).info)
+        except Exception as e:
+            logger.warning("Falha ao buscar fundamentos de %s: %s", ticker, e)
+            anotar(erro=repr(e))
+            return None
+        somar_bytes("yfinance", info)
+        return extrair_campos(info)
+
+    @staticmethod
+    def _dividend_yield(tickers, precos):
+        """DY de 12 meses (%) pelo índice local de proventos; sem preço no .info usa o último fechamento."""
+        tickers = list(tickers)
+        indice = obter_indice_eventos()
+        indice.sincronizar(tickers)
+        proventos = indice.total_12m(tickers).to_numpy()
+
+        precos = precos.to_numpy(dtype=float)
+        if np.isnan(precos).any():
+            fechamentos = obter_armazem().fechamentos(tickers, dias=10).ffill()
+            if len(fechamentos):
+                ultimos = fechamentos.iloc[-1].reindex(tickers).to_numpy(dtype=float)
+                precos = np.where(np.isnan(precos), ultimos, precos)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(precos > 0, proventos / precos * 100, np.nan)
+
+    def _gravar(self, tabela):
+        # Grava num temporário e troca de uma vez: leitores nunca veem um arquivo pela metade
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        tabela.to_parquet(temporario)
+        os.replace(temporario, self.caminho)
+        self._lido_em = os.stat(self.caminho).st_mtime_ns
+
+    # --- FILTRO ---
+    def filtrar(self, expressao, tickers=None):
+        """Linhas que atendem a todas as condições (ex.: ``"P/L < 8 e P/VPA < 1 e DY > 6%"``).
+
+        Cada condição é ``campo operador valor``, unidas por ``e``/``and``/``&``. Textos
+        (setor, industria, nome) aceitam só ``==``/``!=`` com valor entre aspas. Condições
+        sobre campos sem dado (NaN) são falsas.
+        """
+        tabela = self.tabela()
+        if tickers is not None:
+            tabela = tabela[tabela.index.isin(list(tickers))]
+
+        mascara = np.ones(len(tabela), dtype=bool)
+        for clausula in _SEPARADOR.split(expressao.strip()):
+            campo, operador, valor = _interpretar(clausula)
+            coluna = tabela[campo]
+            if isinstance(valor, str):
+                iguais = (coluna.astype("string").str.lower() == valor.lower()).fillna(False).to_numpy(dtype=bool)
+                mascara &= iguais if operador in ("==", "=") else ~iguais
+            else:
+                with np.errstate(invalid="ignore"):
+                    mascara &= _OPERADORES[operador](coluna.to_numpy(dtype=float), valor)
+        return tabela[mascara]
+
+
+def _interpretar(clausula):
+    achado = _CLAUSULA.match(clausula)
+    if not achado:
+        raise ValueError(f"Condição inválida: '{clausula.strip()}' (use, por exemplo, P/L < 8)")
+
+    nome = achado["campo"].strip().lower().replace(" ", "")
+    campo = APELIDOS.get(nome, nome)
+    if campo not in COLUNAS or campo == "atualizado_em":
+        raise ValueError(f"Campo desconhecido: '{achado['campo'].strip()}'")
+
+    operador = achado["op"]
+    if achado["numero"] is not None:
+        if COLUNAS[campo] in ("string", "category"):
+            raise ValueError(f"O campo '{campo}' é texto: compare com um valor entre aspas")
+        return campo, operador, float(achado["numero"].replace(",", "."))
+
+    if COLUNAS[campo] not in ("string", "category") or operador not in ("==", "=", "!="):
+        raise ValueError(f"Comparação de texto inválida em '{clausula.strip()}'")
+    texto = achado["texto1"] if achado["texto1"] is not None else achado["texto2"]
+    return campo, operador, texto
+
+
+_snapshot = None
+_trava_snapshot = threading.Lock()
+
+
+def obter_fundamentos():
+    """Instância única do snapshot por processo."""
+    global _snapshot
+    with _trava_snapshot:
+        if _snapshot is None:
+            _snapshot = SnapshotFundamentos()
+        return _snapshot
@@ -0,0 +1,345 @@
+"""Motor vetorizado de indicadores técnicos (MMS e IFR) sobre matrizes datas x tickers.
+
+Todas as funções aceitam tanto uma Series (um ticker) quanto um DataFrame
+(uma coluna por ticker) e calculam todos os tickers de uma vez.
+"""
+import copy
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from metricas import instrumentado
+
+# Códigos de sinal usados nas classificações vetorizadas
+SEM_DADOS, ALTA, QUEDA, NEUTRO = 0, 1, 2, 3
+SOBRECOMPRA, SOBREVENDA = 1, 2
+
+# Tabelas de consulta: código do sinal -> rótulo exibido
+ROTULOS_MMS = np.array(["⚪ Sem dados", "🟢 Alta", "🔴 Queda", "🟡 Neutro"], dtype=object)
+ROTULOS_IFR = np.array(["⚪ Sem dados", "⚠️ Sobrecompra", "📈 Sobrevenda", "⚪ Neutro"], dtype=object)
+
+# Mesmos sinais em texto puro, para CSV/Parquet e logs
+NOMES_MMS = np.array(["SEM_DADOS", "ALTA", "QUEDA", "NEUTRO"], dtype=object)
+NOMES_IFR = np.array(["SEM_DADOS", "SOBRECOMPRA", "SOBREVENDA", "NEUTRO"], dtype=object)
+
+
+def mms(precos, janela=20):
+    """Média Móvel Simples de `janela` períodos para cada coluna."""
+    return _mesmo_tipo(precos.rolling(window=janela).mean(), precos)
+
+
+def ifr(precos, janela=14):
+    """Índice de Força Relativa (suavização de Wilder) para cada coluna."""
+    delta = precos.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+
+    avg_gain = gain.ewm(com=janela - 1, adjust=False).mean()
+    avg_loss = loss.ewm(com=janela - 1, adjust=False).mean()
+
+    rs = avg_gain / avg_loss.replace(0, np.nan)
+    return _mesmo_tipo(100 - (100 / (1 + rs)), precos)
+
+
+def _mesmo_tipo(resultado, precos):
+    """rolling/ewm sempre devolvem float64: preços em float32 continuam float32."""
+    tipos = [precos.dtype] if isinstance(precos, pd.Series) else list(precos.dtypes)
+    if tipos and all(t == np.float32 for t in tipos):
+        return resultado.astype(np.float32)
+    return resultado
+
+
+def classificar_mms(preco, media, banda=0.01):
+    """Classifica preço x MMS em ALTA/QUEDA/NEUTRO (banda de ±`banda`) para arrays inteiros."""
+    preco = np.asarray(preco, dtype=float)
+    media = np.asarray(media, dtype=float)
+    invalido = np.isnan(preco) | np.isnan(media)
+    return np.select(
+        [invalido, preco > media * (1 + banda), preco < media * (1 - banda)],
+        [SEM_DADOS, ALTA, QUEDA],
+        default=NEUTRO,
+    )
+
+
+def classificar_ifr(valor_ifr, sobrecompra=70, sobrevenda=30):
+    """Classifica o IFR em SOBRECOMPRA/SOBREVENDA/NEUTRO para arrays inteiros."""
+    valor_ifr = np.asarray(valor_ifr, dtype=float)
+    return np.select(
+        [np.isnan(valor_ifr), valor_ifr > sobrecompra, valor_ifr < sobrevenda],
+        [SEM_DADOS, SOBRECOMPRA, SOBREVENDA],
+        default=NEUTRO,
+    )
+
+
+@instrumentado()
+def calcular_sinais(precos, janela_mms=20, janela_ifr=14, banda_mms=0.01, sobrecompra=70, sobrevenda=30):
+    """Calcula MMS, IFR e os sinais do último pregão para todos os tickers de uma vez.
+
+    `precos` é um DataFrame de fechamentos (datas x tickers). Retorna um DataFrame
+    indexado por ticker com os valores e os códigos/rótulos dos sinais.
+    """
+    if precos.empty:
+        return pd.DataFrame(
+            columns=["preco", "mms", "ifr", "codigo_mms", "codigo_ifr", "sinal_mms", "sinal_ifr"]
+        )
+
+    # Cada ticker só com os pregões em que negociou (listagens e feriados diferentes), como a
+    # série que as funções de um ativo só recebem: os fechamentos válidos de cada coluna
+    # descem para o fim, na ordem, e as datas vazias ficam antes deles (MMS e IFR só
+    # olham para trás, então o último valor é o da série sem lacunas)
+    valores = precos.to_numpy()
+    negociado = ~np.isnan(valores)
+    observacoes = negociado.sum(axis=0)
+    if not negociado.all():
+        ordem = np.argsort(negociado, axis=0, kind="stable")
+        precos = pd.DataFrame(np.take_along_axis(valores, ordem, axis=0), columns=precos.columns)
+    medias = mms(precos, janela_mms)
+    valores_ifr = ifr(precos, janela_ifr)
+
+    # Exige histórico mínimo por ticker, como as funções de um ativo só
+    ultimo_preco = precos.iloc[-1].to_numpy(dtype=float)
+    ultima_mms = np.where(observacoes >= janela_mms, medias.iloc[-1], np.nan)
+    ultimo_ifr = np.where(observacoes >= janela_ifr + 1, valores_ifr.iloc[-1], np.nan)
+
+    codigo_mms = classificar_mms(ultimo_preco, ultima_mms, banda_mms)
+    codigo_ifr = classificar_ifr(ultimo_ifr, sobrecompra, sobrevenda)
+
+    return pd.DataFrame(
+        {
+            "preco": ultimo_preco,
+            "mms": ultima_mms,
+            "ifr": ultimo_ifr,
+            "codigo_mms": codigo_mms,
+            "codigo_ifr": codigo_ifr,
+            "sinal_mms": ROTULOS_MMS[codigo_mms],
+            "sinal_ifr": ROTULOS_IFR[codigo_ifr],
+        },
+        index=precos.columns,
+    )
+
+
+# --- INDICADORES INCREMENTAIS (O(1) POR NOVA BARRA) ---
+class MMSIncremental:
+    """Média móvel simples com buffer circular.
+
+    Reproduz a soma compensada (Kahan) do ``rolling().mean()`` do pandas,
+    de modo que o valor é idêntico ao do cálculo em lote sobre a mesma série.
+    """
+
+    def __init__(self, janela=20):
+        self.janela = janela
+        self.buffer = deque(maxlen=janela)
+        self.soma = 0.0
+        self.comp_soma = 0.0
+        self.comp_subtracao = 0.0
+        self.negativos = 0
+        self.repetidos = 0
+        self.anterior = np.nan
+
+    @property
+    def valor(self):
+        n = len(self.buffer)
+        if n < self.janela:
+            return np.nan
+        # Mesmas salvaguardas do pandas contra resíduos de ponto flutuante
+        if self.repetidos >= n:
+            return self.anterior
+        resultado = self.soma / n
+        if self.negativos == 0 and resultado < 0:
+            return 0.0
+        if self.negativos == n and resultado > 0:
+            return 0.0
+        return resultado
+
+    def atualizar(self, preco):
+        """Consolida um novo fechamento e devolve a MMS atualizada."""
+        preco = float(preco)
+        if len(self.buffer) == self.janela:
+            self._remover(self.buffer[0])
+        self._adicionar(preco)
+        self.buffer.append(preco)
+        return self.valor
+
+    def espiar(self, preco):
+        """MMS que resultaria de `preco` sem alterar o estado (barra em formação)."""
+        return copy.deepcopy(self).atualizar(preco)
+
+    def _adicionar(self, valor):
+        y = valor - self.comp_soma
+        t = self.soma + y
+        self.comp_soma = t - self.soma - y
+        self.soma = t
+        if math.copysign(1.0, valor) < 0:
+            self.negativos += 1
+        self.repetidos = self.repetidos + 1 if valor == self.anterior else 1
+        self.anterior = valor
+
+    def _remover(self, valor):
+        y = -valor - self.comp_subtracao
+        t = self.soma + y
+        self.comp_subtracao = t - self.soma - y
+        self.soma = t
+        if math.copysign(1.0, valor) < 0:
+            self.negativos -= 1
+
+    def para_dict(self):
+        return {
+            "janela": self.janela,
+            "buffer": list(self.buffer),
+            "soma": self.soma,
+            "comp_soma": self.comp_soma,
+            "comp_subtracao": self.comp_subtracao,
+            "negativos": self.negativos,
+            "repetidos": self.repetidos,
+            "anterior": None if np.isnan(self.anterior) else self.anterior,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        obj = cls(dados["janela"])
+        obj.buffer.extend(dados["buffer"])
+        obj.soma = dados["soma"]
+        obj.comp_soma = dados["comp_soma"]
+        obj.comp_subtracao = dados["comp_subtracao"]
+        obj.negativos = dados["negativos"]
+        obj.repetidos = dados["repetidos"]
+        obj.anterior = np.nan if dados["anterior"] is None else dados["anterior"]
+        return obj
+
+
+class IFRIncremental:
+    """IFR de Wilder mantendo apenas avg_gain/avg_loss e o último fechamento.
+
+    Segue a mesma recorrência do ``ewm(com=janela - 1, adjust=False)`` do pandas,
+    resultando no mesmo valor que :func:`ifr` sobre a mesma série.
+    """
+
+    def __init__(self, janela=14):
+        self.janela = janela
+        self.alpha = 1.0 / janela
+        self.media_ganho = None
+        self.media_perda = None
+        self.ultimo_preco = None
+        self.observacoes = 0
+
+    @property
+    def valor(self):
+        # Como no cálculo em lote, não há período mínimo: quem consome confere `observacoes`
+        if self.media_perda is None or self.media_perda == 0:
+            return np.nan
+        rs = self.media_ganho / self.media_perda
+        return 100 - (100 / (1 + rs))
+
+    def atualizar(self, preco):
+        """Consolida um novo fechamento e devolve o IFR atualizado."""
+        preco = float(preco)
+        if self.ultimo_preco is None:
+            # Primeira barra: delta indefinido, ganho e perda entram como zero
+            ganho = perda = 0.0
+        else:
+            delta = preco - self.ultimo_preco
+            ganho = delta if delta > 0 else 0.0
+            perda = -delta if delta < 0 else 0.0
+
+        self.media_ganho = self._suavizar(self.media_ganho, ganho)
+        self.media_perda = self._suavizar(self.media_perda, perda)
+        self.ultimo_preco = preco
+        self.observacoes += 1
+        return self.valor
+
+    def espiar(self, preco):
+        """IFR que resultaria de `preco` sem alterar o estado (barra em formação)."""
+        return copy.copy(self).atualizar(preco)
+
+    def _suavizar(self, media, valor):
+        if media is None:
+            return valor
+        if media == valor:
+            return media
+        peso_antigo = 1.0 - self.alpha
+        return (peso_antigo * media + self.alpha * valor) / (peso_antigo + self.alpha)
+
+    def para_dict(self):
+        return {
+            "janela": self.janela,
+            "media_ganho": self.media_ganho,
+            "media_perda": self.media_perda,
+            "ultimo_preco": self.ultimo_preco,
+            "observacoes": self.observacoes,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        obj = cls(dados["janela"])
+        obj.media_ganho = dados["media_ganho"]
+        obj.media_perda = dados["media_perda"]
+        obj.ultimo_preco = dados["ultimo_preco"]
+        obj.observacoes = dados["observacoes"]
+        return obj
+
+
+class IndicadoresIncrementais:
+    """MMS e IFR de um ticker, consolidados barra a barra até `ultima_data`."""
+
+    def __init__(self, janela_mms=20, janela_ifr=14):
+        self.mms = MMSIncremental(janela_mms)
+        self.ifr = IFRIncremental(janela_ifr)
+        self.ultima_data = None
+
+    def avancar(self, serie):
+        """Consolida as barras novas de `serie` e devolve (mms, ifr) incluindo a última barra.
+
+        A última barra da série pode ser o pregão em andamento: ela entra no resultado,
+        mas só é consolidada no estado quando uma barra mais nova aparecer.
+        """
+        serie = serie.dropna()
+        if self.ultima_data is not None:
+            serie = serie[serie.index > self.ultima_data]
+        if serie.empty:
+            return self.mms.valor, self.ifr.valor
+
+        for data, preco in serie.iloc[:-1].items():
+            self.mms.atualizar(preco)
+            self.ifr.atualizar(preco)
+            self.ultima_data = pd.Timestamp(data)
+
+        ultimo = serie.iloc[-1]
+        return self.mms.espiar(ultimo), self.ifr.espiar(ultimo)
+
+    def para_dict(self):
+        return {
+            "mms": self.mms.para_dict(),
+            "ifr": self.ifr.para_dict(),
+            "ultima_data": None if self.ultima_data is None else self.ultima_data.isoformat(),
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        obj = cls()
+        obj.mms = MMSIncremental.de_dict(dados["mms"])
+        obj.ifr = IFRIncremental.de_dict(dados["ifr"])
+        obj.ultima_data = None if dados["ultima_data"] is None else pd.Timestamp(dados["ultima_data"])
+        return obj
+
+
+def conferir_paridade(serie, janela_mms=20, janela_ifr=14):
+    """Confere, barra a barra, se os indicadores incrementais batem exatamente com o cálculo em lote.
+
+    Devolve a quantidade de barras divergentes (0 significa paridade total).
+    """
+    serie = serie.dropna()
+    lote_mms = mms(serie, janela_mms).to_numpy()
+    lote_ifr = ifr(serie, janela_ifr).to_numpy()
+
+    inc_mms = MMSIncremental(janela_mms)
+    inc_ifr = IFRIncremental(janela_ifr)
+    divergentes = 0
+    for i, preco in enumerate(serie.to_numpy()):
+        valores = (inc_mms.atualizar(preco), inc_ifr.atualizar(preco))
+        for incremental, lote in zip(valores, (lote_mms[i], lote_ifr[i])):
+            if not (incremental == lote or (np.isnan(incremental) and np.isnan(lote))):
+                divergentes += 1
+                break
+    return divergentes
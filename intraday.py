@@ -0,0 +1,299 @@
+"""Modo ao vivo do quadro de altas e baixas: cotações intradiárias consultadas em lote.
+
+Cada :class:`CotacoesIntraday` guarda em memória um vetor por ticker com o fechamento
+de referência (lido uma vez por dia do armazém local), o último preço e o horário da
+última barra de 1 minuto vista. A cada :meth:`~CotacoesIntraday.atualizar` só são
+pedidas ao yfinance as barras de 1m posteriores à consulta anterior, e variação e
+ranking são recalculados apenas para os tickers cuja cotação mudou.
+
+A consulta à rede roda fora da trava das leituras (só uma por vez; quem chega durante
+uma em andamento não espera por ela), e as cotações novas entram de uma vez no fim:
+``quadro``/``sinais``/``extremos`` nunca esperam o download.
+
+Os sinais de MMS 20 e IFR 14 do quadro ao vivo seguem a cotação: o estado incremental
+de cada ticker (:meth:`armazem_precos.ArmazemPrecos.indicadores_incrementais`) é lido
+uma vez por dia, e cada preço novo é aplicado a ele como barra em formação, em O(1).
+"""
+import copy
+import logging
+import math
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import indicadores
+from armazem_precos import TAMANHO_LOTE, baixar_historico, obter_armazem
+from cliente_upstream import obter_cliente
+from metricas import instrumentado, anotar, somar_bytes
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo (s) entre duas consultas ao yfinance, qualquer que seja o número de sessões
+# (universos grandes esperam mais: ver intervalo_minimo)
+INTERVALO_PADRAO = 15
+
+FUSO_B3 = "America/Sao_Paulo"
+
+# Histórico diário garantido no armazém (o mesmo de nucleo.carregar_sinais_mercado)
+DIAS_HISTORICO = 183
+
+# Sobreposição da janela de consulta: a barra do minuto corrente ainda pode mudar
+SOBREPOSICAO = pd.Timedelta(minutes=2)
+
+
+def intervalo_minimo(quantidade):
+    """Intervalo (s) entre consultas de `quantidade` tickers sem passar do ritmo do cliente do Yahoo.
+
+    Cada ticker é uma requisição de histórico: abaixo disso as consultas se acumulariam
+    atrás do limite de taxa (ex.: a B3 completa, ~470 tickers a 20/s, leva ~24 s).
+    """
+    return max(INTERVALO_PADRAO, math.ceil(quantidade / obter_cliente("yahoo").balde.taxa))
+
+
+class CotacoesIntraday:
+    """Matriz em memória (tickers x anterior/atual/variação) alimentada por barras de 1 minuto."""
+
+    def __init__(self, tickers, intervalo=None, tamanho_lote=TAMANHO_LOTE, janela_mms=20, janela_ifr=14):
+        self.tickers = list(dict.fromkeys(tickers))
+        self.intervalo = intervalo if intervalo is not None else intervalo_minimo(len(self.tickers))
+        self.tamanho_lote = tamanho_lote
+        self.janela_mms = janela_mms
+        self.janela_ifr = janela_ifr
+        self._posicao = {ticker: i for i, ticker in enumerate(self.tickers)}
+        # _trava protege as matrizes (leituras e aplicação); _trava_consulta, a ida à rede
+        self._trava = threading.Lock()
+        self._trava_consulta = threading.Lock()
+
+        quantidade = len(self.tickers)
+        self.anterior = np.full(quantidade, np.nan)
+        self.atual = np.full(quantidade, np.nan)
+        self.variacao = np.full(quantidade, np.nan)
+        # Horário (ns desde a época, UTC) da última barra aplicada a cada ticker
+        self.instante = np.zeros(quantidade, dtype=np.int64)
+        # MMS e IFR com a cotação atual como barra do dia
+        self.mms = np.full(quantidade, np.nan)
+        self.ifr = np.full(quantidade, np.nan)
+
+        self.consultado_em = 0.0
+        self.ultima_barra = None
+        self.alterados = 0
+        self.sessao = None
+        self._ultimo = np.full(quantidade, np.nan)
+        self._penultimo = np.full(quantidade, np.nan)
+        # Estados incrementais por ticker: consolidado até o penúltimo fechamento armazenado
+        # (a cotação substitui o último) e até o último (a cotação é de um pregão novo)
+        self._estados_sessao = [None] * quantidade
+        self._estados_novo = [None] * quantidade
+        self._dia_referencia = None
+
+    # --- FECHAMENTOS DE REFERÊNCIA (UMA VEZ POR DIA) ---
+    def _ler_referencias(self):
+        """Lê do armazém os dois últimos fechamentos diários e os estados dos indicadores.
+
+        Devolve None se as referências de hoje já estão carregadas.
+        """
+        hoje = date.today()
+        if self._dia_referencia == hoje:
+            return None
+        armazem = obter_armazem()
+        # Mesma janela dos sinais do quadro, para os indicadores terem histórico suficiente
+        armazem.sincronizar(self.tickers, dias=DIAS_HISTORICO, max_idade=3600)
+        fechamentos = armazem.fechamentos(self.tickers, dias=10).ffill().tail(2)
+        fechamentos = fechamentos.reindex(columns=self.tickers)
+
+        vazio = np.full(len(self.tickers), np.nan)
+        ultimo = fechamentos.iloc[-1].to_numpy(dtype=float) if len(fechamentos) else vazio
+        penultimo = fechamentos.iloc[0].to_numpy(dtype=float) if len(fechamentos) == 2 else vazio.copy()
+        sessao = fechamentos.index[-1].date() if len(fechamentos) else None
+
+        estados = armazem.indicadores_incrementais(self.tickers, self.janela_mms, self.janela_ifr)
+        estados_sessao = [estados.get(ticker) for ticker in self.tickers]
+        estados_novo = [_consolidar(estado, preco) for estado, preco in zip(estados_sessao, ultimo)]
+        return hoje, ultimo, penultimo, sessao, estados_sessao, estados_novo
+
+    def _trocar_referencias(self, hoje, ultimo, penultimo, sessao, estados_sessao, estados_novo):
+        """Zera o estado do dia com as referências lidas (chamado com a trava)."""
+        self._ultimo, self._penultimo, self.sessao = ultimo, penultimo, sessao
+        self._estados_sessao, self._estados_novo = estados_sessao, estados_novo
+
+        # Até chegar a primeira barra de 1m, o quadro mostra o último pregão fechado
+        self.anterior = self._penultimo.copy()
+        self.atual = self._ultimo.copy()
+        self.variacao = (self.atual / self.anterior - 1) * 100
+        self._atualizar_indicadores(np.arange(len(self.tickers)), self.atual, np.zeros(len(self.tickers), dtype=bool))
+        self.instante[:] = 0
+        self.ultima_barra = None
+        self._dia_referencia = hoje
+
+    # --- CONSULTA INCREMENTAL ---
+    @instrumentado("intraday_atualizar")
+    def atualizar(self, forcar=False):
+        """Busca só as barras de 1m novas e aplica as cotações alteradas; devolve quantas mudaram.
+
+        Chamadas dentro de `intervalo` segundos da anterior (de qualquer sessão), ou
+        enquanto outra consulta está em andamento, não vão à rede e devolvem 0.
+        """
+        if not self._trava_consulta.acquire(blocking=False):
+            anotar(cache="acerto")
+            return 0
+        try:
+            if not forcar and time.time() - self.consultado_em < self.intervalo:
+                anotar(cache="acerto")
+                return 0
+            anotar(cache="falta")
+            referencias = self._ler_referencias()
+
+            if referencias is None and self.ultima_barra is not None:
+                inicio = self.ultima_barra - SOBREPOSICAO
+            else:
+                inicio = pd.Timestamp(date.today())
+            respostas = []
+            for i in range(0, len(self.tickers), self.tamanho_lote):
+                lote = self.tickers[i:i + self.tamanho_lote]
+                try:
+                    barras, falhas = baixar_historico(lote, inicio, intervalo="1m")
+                except Exception as e:
+                    logger.warning("Falha na consulta intradiária de %s: %s", lote, e)
+                    anotar(erro=repr(e))
+                    continue
+                if falhas:
+                    # Esses tickers mantêm a última cotação até a próxima consulta
+                    logger.warning("Sem cotação intradiária de %s", sorted(falhas))
+                somar_bytes("yfinance", barras)
+                respostas.append((barras, lote))
+
+            # Só a aplicação (em memória) segura as leituras
+            with self._trava:
+                if referencias is not None:
+                    self._trocar_referencias(*referencias)
+                alterados = sum(self._aplicar(barras, lote) for barras, lote in respostas)
+                self.consultado_em = time.time()
+                self.alterados = alterados
+            return alterados
+        finally:
+            self._trava_consulta.release()
+
+    def _aplicar(self, barras, lote):
+        """Aplica a última barra de cada ticker do lote; só os tickers alterados são recalculados."""
+        if barras is None or barras.empty:
+            return 0
+
+        fechamentos = barras["Close"]
+        if isinstance(fechamentos, pd.Series):
+            fechamentos = fechamentos.to_frame(lote[0])
+        fechamentos = fechamentos.reindex(columns=[t for t in lote if t in fechamentos.columns])
+
+        # Última barra com negócio de cada ticker, de uma vez sobre a matriz minutos x tickers
+        valores = fechamentos.to_numpy(dtype=float)
+        com_negocio = ~np.isnan(valores)
+        tem_barra = com_negocio.any(axis=0)
+        if not tem_barra.any():
+            return 0
+        linha = len(valores) - 1 - np.argmax(com_negocio[::-1], axis=0)
+
+        indice = pd.DatetimeIndex(fechamentos.index)
+        indice = indice.tz_localize("UTC") if indice.tz is None else indice.tz_convert("UTC")
+        colunas = np.flatnonzero(tem_barra)
+        posicoes = np.array([self._posicao[t] for t in fechamentos.columns[colunas]])
+        precos = valores[linha[colunas], colunas]
+        instantes = indice.asi8[linha[colunas]]
+
+        # Barra mais nova, ou a mesma barra com preço diferente (minuto ainda em formação)
+        mudou = (instantes > self.instante[posicoes]) | (
+            (instantes == self.instante[posicoes]) & (precos != self.atual[posicoes])
+        )
+        posicoes, precos, instantes = posicoes[mudou], precos[mudou], instantes[mudou]
+
+        # Barra de um pregão posterior ao último fechamento armazenado: a base passa a ser esse fechamento
+        pregao_novo = np.zeros(len(posicoes), dtype=bool)
+        if self.sessao is not None:
+            dias = pd.to_datetime(instantes, utc=True).tz_convert(FUSO_B3).date
+            pregao_novo = np.asarray(dias) > self.sessao
+            self.anterior[posicoes] = np.where(pregao_novo, self._ultimo[posicoes], self._penultimo[posicoes])
+
+        self.atual[posicoes] = precos
+        self.instante[posicoes] = instantes
+        self.variacao[posicoes] = (precos / self.anterior[posicoes] - 1) * 100
+        self._atualizar_indicadores(posicoes, precos, pregao_novo)
+
+        if len(instantes):
+            mais_recente = pd.Timestamp(instantes.max(), tz="UTC")
+            if self.ultima_barra is None or mais_recente > self.ultima_barra:
+                self.ultima_barra = mais_recente
+        return len(posicoes)
+
+    def _atualizar_indicadores(self, posicoes, precos, pregao_novo):
+        """MMS/IFR dos tickers alterados com a cotação como barra em formação (O(1) por ticker)."""
+        for posicao, preco, novo in zip(posicoes, precos, pregao_novo):
+            estado = (self._estados_novo if novo else self._estados_sessao)[posicao]
+            if estado is None or np.isnan(preco):
+                self.mms[posicao] = self.ifr[posicao] = np.nan
+                continue
+            self.mms[posicao] = estado.mms.espiar(preco)
+            # Mesmo histórico mínimo do cálculo em lote: janela + 1 fechamentos
+            suficiente = estado.ifr.observacoes + 1 >= self.janela_ifr + 1
+            self.ifr[posicao] = estado.ifr.espiar(preco) if suficiente else np.nan
+
+    # --- QUADRO ---
+    def quadro(self):
+        """Mesmo formato de ``nucleo.carregar_dados_mercado`` (Ativo, Preço, Variação %)."""
+        with self._trava:
+            df = pd.DataFrame({
+                "Ativo": [t.replace(".SA", "") for t in self.tickers],
+                "Preço (R$)": np.round(self.atual, 2),
+                "Variação %": np.round(self.variacao, 2),
+            })
+        return df.dropna().reset_index(drop=True)
+
+    def sinais(self):
+        """Sinais de MMS/IFR com a cotação atual, no formato de ``nucleo.carregar_sinais_mercado``."""
+        with self._trava:
+            codigo_mms = indicadores.classificar_mms(self.atual, self.mms)
+            codigo_ifr = indicadores.classificar_ifr(self.ifr)
+        return pd.DataFrame(
+            {
+                f"MMS {self.janela_mms}": indicadores.ROTULOS_MMS[codigo_mms],
+                f"IFR {self.janela_ifr}": indicadores.ROTULOS_IFR[codigo_ifr],
+            },
+            index=pd.Index([t.replace(".SA", "") for t in self.tickers], name="Ativo"),
+        )
+
+    def extremos(self, quantidade=5):
+        """(maiores altas, maiores baixas) sem ordenar o universo inteiro (argpartition)."""
+        with self._trava:
+            variacao = self.variacao.copy()
+            atual = self.atual.copy()
+
+        validos = np.flatnonzero(~np.isnan(variacao))
+        k = min(quantidade, len(validos))
+        if k == 0:
+            vazio = pd.DataFrame(columns=["Ativo", "Preço (R$)", "Variação %"])
+            return vazio, vazio
+
+        def montar(indices, decrescente):
+            indices = indices[np.argsort(variacao[indices])]
+            if decrescente:
+                indices = indices[::-1]
+            return pd.DataFrame({
+                "Ativo": [self.tickers[i].replace(".SA", "") for i in indices],
+                "Preço (R$)": np.round(atual[indices], 2),
+                "Variação %": np.round(variacao[indices], 2),
+            })
+
+        valores = variacao[validos]
+        altas = validos[np.argpartition(-valores, k - 1)[:k]]
+        baixas = validos[np.argpartition(valores, k - 1)[:k]]
+        return montar(altas, True), montar(baixas, False)
+
+
+def _consolidar(estado, preco):
+    """Cópia de `estado` com `preco` consolidado como barra fechada (None se não houver estado)."""
+    if estado is None or np.isnan(preco):
+        return estado
+    novo = copy.deepcopy(estado)
+    novo.mms.atualizar(preco)
+    novo.ifr.atualizar(preco)
+    return novo
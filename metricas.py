@@ -0,0 +1,290 @@
+"""Instrumentação das funções de carga e de cálculo (tempo, cache, bytes e erros).
+
+Cada função decorada com :func:`instrumentado` alimenta contadores e histogramas
+do processo, exportados no formato texto do Prometheus por :func:`exportar_prometheus`
+(ou pelo servidor HTTP de :func:`iniciar_servidor`), e gera uma linha de log JSON
+por chamada no logger ``metricas`` (nível DEBUG, para não inundar os logs INFO
+dos jobs; ative com ``logging.getLogger("metricas").setLevel(logging.DEBUG)``).
+
+Dentro da chamada, o :mod:`cache` e as funções de carga completam o registro com
+:func:`anotar` (acerto/falta no cache, erro tratado) e :func:`somar_bytes` (tamanho
+dos dados recebidos do yfinance/GoogleNews).
+"""
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import pickle
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "monitor_b3"
+
+# Limites (s) dos baldes de latência: de leituras de cache a buscas lentas na rede
+BALDES = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Registro da chamada instrumentada em andamento (None fora de uma chamada)
+_chamada_atual = contextvars.ContextVar("chamada_atual", default=None)
+
+
+class Histograma:
+    """Contagens por balde (não acumuladas), soma e total de observações."""
+
+    def __init__(self, baldes=BALDES):
+        self.baldes = tuple(baldes)
+        self.contagens = [0] * (len(self.baldes) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.baldes, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def acumulado(self):
+        """Contagens acumuladas por limite (``le``), incluindo ``+Inf``, como no Prometheus."""
+        limites = [*(f"{b:g}" for b in self.baldes), "+Inf"]
+        total = 0
+        acumuladas = []
+        for limite, contagem in zip(limites, self.contagens):
+            total += contagem
+            acumuladas.append((limite, total))
+        return acumuladas
+
+
+class Registro:
+    """Contadores e histogramas rotulados do processo (seguros entre threads)."""
+
+    def __init__(self):
+        self._contadores = {}
+        self._histogramas = {}
+        self._trava = threading.Lock()
+
+    def contar(self, nome, quantidade=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self._contadores[chave] = self._contadores.get(chave, 0) + quantidade
+
+    def observar(self, nome, valor, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._trava:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(valor)
+
+    def contadores(self):
+        with self._trava:
+            return dict(self._contadores)
+
+    def limpar(self):
+        with self._trava:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+    def exportar_prometheus(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        with self._trava:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted(self._histogramas.items())
+            histogramas = [(chave, h.acumulado(), h.soma, h.total) for chave, h in histogramas]
+
+        linhas = []
+        declarados = set()
+        for (nome, rotulos), valor in contadores:
+            if nome not in declarados:
+                linhas.append(f"# TYPE {PREFIXO}_{nome} counter")
+                declarados.add(nome)
+            linhas.append(f"{PREFIXO}_{nome}{_rotulos(rotulos)} {valor}")
+
+        for (nome, rotulos), acumuladas, soma, total in histogramas:
+            if nome not in declarados:
+                linhas.append(f"# TYPE {PREFIXO}_{nome} histogram")
+                declarados.add(nome)
+            for limite, contagem in acumuladas:
+                linhas.append(f"{PREFIXO}_{nome}_bucket{_rotulos(rotulos + (('le', limite),))} {contagem}")
+            linhas.append(f"{PREFIXO}_{nome}_sum{_rotulos(rotulos)} {soma}")
+            linhas.append(f"{PREFIXO}_{nome}_count{_rotulos(rotulos)} {total}")
+        return "\n".join(linhas) + "\n"
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ""
+    pares = []
+    for nome, valor in rotulos:
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pares.append(f'{nome}="{valor}"')
+    return "{" + ",".join(pares) + "}"
+
+
+registro = Registro()
+
+
+def exportar_prometheus():
+    """Métricas do processo no formato texto do Prometheus."""
+    return registro.exportar_prometheus()
+
+
+# --- ANOTAÇÕES DENTRO DA CHAMADA ---
+def anotar(**campos):
+    """Acrescenta campos ao registro da chamada instrumentada atual (sem efeito fora de uma)."""
+    chamada = _chamada_atual.get()
+    if chamada is not None:
+        chamada.update(campos)
+
+
+def tamanho(dados):
+    """Tamanho aproximado em bytes do que veio da rede (DataFrame, Series, dict, lista...)."""
+    if dados is None:
+        return 0
+    if isinstance(dados, pd.DataFrame):
+        # memory_usage percorre coluna a coluna (lento com milhares de colunas do yf.download)
+        if all(getattr(tipo, "kind", "O") in "biufcmM" for tipo in dados.dtypes):
+            return len(dados) * sum(tipo.itemsize for tipo in dados.dtypes)
+        return int(dados.memory_usage(deep=True).sum())
+    if isinstance(dados, pd.Series):
+        return int(dados.memory_usage(deep=True))
+    if isinstance(dados, (bytes, str)):
+        return len(dados)
+    try:
+        return len(pickle.dumps(dados, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+def somar_bytes(fonte, dados):
+    """Contabiliza os bytes recebidos de `fonte` (yfinance, googlenews) no processo e na chamada atual."""
+    quantidade = tamanho(dados)
+    registro.contar("upstream_bytes_total", quantidade, fonte=fonte)
+    chamada = _chamada_atual.get()
+    if chamada is not None:
+        chamada["bytes"] = chamada.get("bytes", 0) + quantidade
+    return quantidade
+
+
+# --- DECORADOR ---
+def instrumentado(nome=None):
+    """Mede tempo de parede, erros, resultado do cache e bytes baixados de cada chamada."""
+
+    def decorador(func):
+        funcao = nome or func.__name__
+
+        @functools.wraps(func)
+        def envoltorio(*args, **kwargs):
+            chamada = {}
+            token = _chamada_atual.set(chamada)
+            inicio = time.perf_counter()
+            excecao = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                excecao = e
+                raise
+            finally:
+                duracao = time.perf_counter() - inicio
+                _chamada_atual.reset(token)
+                _registrar(funcao, duracao, chamada, excecao)
+
+        return envoltorio
+
+    return decorador
+
+
+def _registrar(funcao, duracao, chamada, excecao):
+    registro.contar("chamadas_total", funcao=funcao)
+    registro.observar("duracao_segundos", duracao, funcao=funcao)
+
+    # Erros tratados pela própria função (que devolve um valor vazio) também contam
+    erro = repr(excecao) if excecao is not None else chamada.get("erro")
+    if erro:
+        registro.contar("erros_total", funcao=funcao)
+    if "cache" in chamada:
+        registro.contar("cache_total", funcao=funcao, resultado=chamada["cache"])
+
+    # O json.dumps custa mais que a própria contagem: só monta a linha se o DEBUG estiver ligado
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    evento = {"funcao": funcao, "duracao_s": round(duracao, 6), **chamada}
+    if erro:
+        evento["erro"] = erro
+    logger.debug(json.dumps(evento, ensure_ascii=False, default=str))
+
+
+# --- LATÊNCIA POR SESSÃO ---
+class RegistroSessao:
+    """Tempos por seção da página numa sessão do app (para o painel de administração)."""
+
+    def __init__(self, max_amostras=500):
+        self.max_amostras = max_amostras
+        # array float32 por seção (4 bytes por amostra, em vez de um float do Python numa lista)
+        self.amostras = {}
+
+    def adicionar(self, secao, duracao):
+        valores = self.amostras.setdefault(secao, array("f"))
+        valores.append(duracao)
+        if len(valores) > self.max_amostras:
+            del valores[0]
+
+    @contextmanager
+    def medir(self, secao):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.adicionar(secao, time.perf_counter() - inicio)
+
+    def resumo(self):
+        """Uma linha por seção: quantidade, mediana, p95 e máximo (em ms)."""
+        linhas = []
+        for secao, valores in self.amostras.items():
+            serie = pd.Series(np.frombuffer(valores, dtype=np.float32), dtype=float) * 1000
+            linhas.append({
+                "Seção": secao,
+                "Amostras": len(serie),
+                "p50 (ms)": serie.median(),
+                "p95 (ms)": serie.quantile(0.95),
+                "Máx (ms)": serie.max(),
+            })
+        return pd.DataFrame(linhas, columns=["Seção", "Amostras", "p50 (ms)", "p95 (ms)", "Máx (ms)"])
+
+    def histograma(self, secao, baldes=BALDES):
+        """Contagem de amostras por balde de latência (rótulos em ms)."""
+        histograma = Histograma(baldes)
+        for valor in self.amostras.get(secao, []):
+            histograma.observar(valor)
+        rotulos = [f"≤{b * 1000:g}" for b in baldes] + [f">{baldes[-1] * 1000:g}"]
+        return pd.Series(histograma.contagens, index=pd.Index(rotulos, name="ms"), name="amostras")
+
+
+# --- EXPOSIÇÃO HTTP (/metrics) ---
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = exportar_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(formato, *args)
+
+
+def iniciar_servidor(porta, endereco="0.0.0.0"):
+    """Serve ``/metrics`` numa thread em segundo plano (uma vez por processo)."""
+    servidor = ThreadingHTTPServer((endereco, porta), _ManipuladorMetricas)
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
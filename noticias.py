@@ -0,0 +1,305 @@
+"""Armazém local de notícias por ticker, com deduplicação e sentimento calculado na ingestão.
+
+Cada notícia é gravada uma vez só no SQLite, com chave no hash da URL normalizada
+(ou do título, quando não há link), e já com o score do léxico de sentimento. A
+cada :meth:`~ArmazemNoticias.sincronizar` o GoogleNews só é consultado se a última
+consulta do ticker passou de ``max_idade``, restrito ao período desde a notícia mais
+recente já vista; o que já está no armazém é descartado antes de pontuar. A tela de
+detalhes é uma consulta indexada local, e um gatilho mantém a soma diária dos scores
+por ticker (tabela ``sentimento_diario``, lida por :mod:`sentimento_diario`).
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import pandas as pd
+from GoogleNews import GoogleNews
+
+from cliente_upstream import obter_cliente
+from metricas import anotar, somar_bytes
+from sentimento import normalizar, pontuar_titulos
+from simbolos import normalizar_codigo
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = os.environ.get("MONITOR_B3_NOTICIAS", os.path.join("dados", "noticias.sqlite"))
+
+# Intervalo mínimo (s) entre duas consultas ao GoogleNews para o mesmo ticker
+MAX_IDADE = 600
+
+# Fuso da B3 (UTC-3, sem horário de verão desde 2019): define o dia de cada notícia nos agregados
+DESLOCAMENTO_B3 = -3 * 3600
+
+# Parâmetros de rastreamento que não mudam a notícia (removidos antes do hash da URL)
+_PARAMETROS_RASTREIO = re.compile(r"^(utm_\w+|ved|usg|sa|ei|gclid|fbclid|ocid|cmpid)$", re.IGNORECASE)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS noticias (
+    ticker TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    titulo TEXT NOT NULL,
+    fonte TEXT,
+    link TEXT,
+    publicado_em REAL NOT NULL,
+    score REAL NOT NULL,
+    ingerido_em REAL NOT NULL,
+    PRIMARY KEY (ticker, chave)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS noticias_por_ticker ON noticias (ticker, publicado_em);
+
+CREATE TABLE IF NOT EXISTS noticias_sincronizacao (
+    ticker TEXT PRIMARY KEY,
+    ultima_publicacao REAL,
+    consultado_em REAL NOT NULL
+);
+
+-- Soma e quantidade de scores por ticker e dia (dias desde 1970 no fuso da B3)
+CREATE TABLE IF NOT EXISTS sentimento_diario (
+    ticker TEXT NOT NULL,
+    dia INTEGER NOT NULL,
+    soma REAL NOT NULL,
+    quantidade INTEGER NOT NULL,
+    atualizado_em REAL NOT NULL,
+    PRIMARY KEY (ticker, dia)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS sentimento_diario_por_atualizacao ON sentimento_diario (atualizado_em);
+"""
+
+# Cada notícia nova (de qualquer processo) soma no agregado do seu dia; as ignoradas por duplicidade não
+_GATILHO = f"""
+CREATE TRIGGER IF NOT EXISTS noticias_agregar_dia AFTER INSERT ON noticias
+BEGIN
+    INSERT INTO sentimento_diario (ticker, dia, soma, quantidade, atualizado_em)
+    VALUES (NEW.ticker, CAST((NEW.publicado_em + {DESLOCAMENTO_B3}) / 86400 AS INTEGER), NEW.score, 1, NEW.ingerido_em)
+    ON CONFLICT (ticker, dia) DO UPDATE SET
+        soma = soma + excluded.soma,
+        quantidade = quantidade + 1,
+        atualizado_em = excluded.atualizado_em;
+END;
+"""
+
+
+def dia_b3(instante):
+    """Dia (inteiro, desde 1970) de um horário em segundos desde a época, no fuso da B3."""
+    return int((instante + DESLOCAMENTO_B3) // 86400)
+
+
+def normalizar_url(link):
+    """URL sem esquema, ``www.``, fragmento, barra final e parâmetros de rastreamento."""
+    partes = urlsplit(str(link).strip())
+    host = partes.netloc.lower().removeprefix("www.")
+    parametros = [(k, v) for k, v in parse_qsl(partes.query) if not _PARAMETROS_RASTREIO.match(k)]
+    return urlunsplit(("", host, partes.path.rstrip("/"), urlencode(sorted(parametros)), ""))
+
+
+def chave_noticia(link, titulo):
+    """Hash estável da notícia: URL normalizada ou, sem link, o título normalizado."""
+    if link:
+        base = normalizar_url(link)
+    else:
+        base = " ".join(normalizar(titulo).split())
+    return hashlib.sha1(base.encode()).hexdigest()
+
+
+def _erro_original(erro):
+    """Erro da requisição por trás do ``Exception`` genérico do GoogleNews, para o cliente saber se tenta de novo.
+
+    O HTTPError leva o status (429, 5xx); falha de rede sem resposta vira ConnectionError.
+    """
+    original = erro.__context__ or erro
+    if isinstance(original, HTTPError):
+        return original
+    if isinstance(original, URLError):
+        return ConnectionError(f"googlenews: {original.reason}")
+    return original
+
+
+def _instante(valor, padrao):
+    """Horário de publicação (s desde a época) do campo ``datetime`` do GoogleNews."""
+    try:
+        instante = pd.Timestamp(valor)
+    except (TypeError, ValueError):
+        return padrao
+    if pd.isna(instante):
+        return padrao
+    if instante.tzinfo is None:
+        instante = instante.tz_localize(datetime.now().astimezone().tzinfo)
+    return instante.timestamp()
+
+
+class ArmazemNoticias:
+    """Notícias deduplicadas por (ticker, chave), já pontuadas, em SQLite."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.executescript(_ESQUEMA)
+            # Armazém anterior aos agregados: monta os dias a partir das notícias já gravadas
+            if conexao.execute("SELECT NOT EXISTS (SELECT 1 FROM sentimento_diario)").fetchone()[0]:
+                conexao.execute(
+                    "INSERT INTO sentimento_diario (ticker, dia, soma, quantidade, atualizado_em) "
+                    f"SELECT ticker, CAST((publicado_em + {DESLOCAMENTO_B3}) / 86400 AS INTEGER) AS dia, "
+                    "SUM(score), COUNT(*), MAX(ingerido_em) FROM noticias GROUP BY ticker, dia"
+                )
+            conexao.executescript(_GATILHO)
+
+    @contextmanager
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    # --- INGESTÃO INCREMENTAL ---
+    def sincronizar(self, termo, max_idade=MAX_IDADE):
+        """Busca no GoogleNews só as notícias novas do ticker; devolve quantas foram gravadas."""
+        ticker = normalizar_codigo(termo)
+        agora = time.time()
+
+        with self._conectar() as conexao:
+            estado = conexao.execute(
+                "SELECT ultima_publicacao, consultado_em FROM noticias_sincronizacao WHERE ticker = ?", (ticker,)
+            ).fetchone()
+        ultima_publicacao, consultado_em = estado or (None, 0.0)
+        if agora - consultado_em < max_idade:
+            return 0
+
+        def buscar():
+            # Objeto novo a cada tentativa: o GoogleNews acumula os resultados das buscas anteriores
+            googlenews = GoogleNews(lang='pt', region='BR')
+            # Sem isso o GoogleNews só imprime o erro da requisição e devolve a lista vazia
+            googlenews.enableException(True)
+            if ultima_publicacao is not None:
+                # Período em dias desde a notícia mais recente já vista (o Google não aceita horário exato)
+                dias = max(1, math.ceil((agora - ultima_publicacao) / 86400))
+                googlenews.set_period(f"{dias}d")
+            try:
+                googlenews.search(f'"Fato Relevante" {ticker} OR notícias {ticker} B3')
+            except Exception as e:
+                raise _erro_original(e) from e
+            return googlenews.results(sort=True)
+
+        try:
+            resultados = obter_cliente("googlenews").chamar(buscar)
+        except Exception as e:
+            # Sem marcar a consulta: a próxima chamada tenta de novo e a página mostra o que já está gravado
+            logger.warning("Falha ao buscar notícias de %s: %s", ticker, e)
+            anotar(erro=repr(e))
+            return 0
+        somar_bytes("googlenews", resultados)
+
+        novas = {}
+        for resultado in resultados:
+            titulo = (resultado.get('title') or "").strip()
+            if not titulo:
+                continue
+            publicado_em = _instante(resultado.get('datetime'), None)
+            if publicado_em is not None and ultima_publicacao is not None and publicado_em < ultima_publicacao:
+                continue
+            chave = chave_noticia(resultado.get('link'), titulo)
+            novas.setdefault(chave, (titulo, resultado.get('media'), resultado.get('link'), publicado_em))
+
+        with self._trava, self._conectar() as conexao:
+            if novas:
+                marcadores = ",".join("?" * len(novas))
+                existentes = {
+                    chave for (chave,) in conexao.execute(
+                        f"SELECT chave FROM noticias WHERE ticker = ? AND chave IN ({marcadores})",
+                        [ticker, *novas],
+                    )
+                }
+                novas = {chave: dados for chave, dados in novas.items() if chave not in existentes}
+
+            # O sentimento é calculado uma vez só, na ingestão
+            registros = []
+            if novas:
+                scores = pontuar_titulos([titulo for titulo, *_ in novas.values()])
+                # Sem data de publicação, vale o horário da ingestão
+                registros = [
+                    (ticker, chave, titulo, fonte, link, agora if publicado_em is None else publicado_em, float(score), agora)
+                    for (chave, (titulo, fonte, link, publicado_em)), score in zip(novas.items(), scores)
+                ]
+                conexao.executemany(
+                    "INSERT OR IGNORE INTO noticias "
+                    "(ticker, chave, titulo, fonte, link, publicado_em, score, ingerido_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    registros,
+                )
+
+            # Só datas reais de publicação avançam o marcador (a data de ingestão não)
+            datas = [dados[3] for dados in novas.values() if dados[3] is not None]
+            if ultima_publicacao is not None:
+                datas.append(ultima_publicacao)
+            mais_recente = max(datas, default=None)
+            conexao.execute(
+                "INSERT OR REPLACE INTO noticias_sincronizacao (ticker, ultima_publicacao, consultado_em) "
+                "VALUES (?, ?, ?)",
+                (ticker, mais_recente, agora),
+            )
+        return len(registros)
+
+    # --- CONSULTAS ---
+    def recentes(self, termo, limite=7):
+        """As `limite` notícias mais recentes do ticker, no formato do GoogleNews (com ``score``)."""
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                "SELECT titulo, fonte, link, publicado_em, score FROM noticias "
+                "WHERE ticker = ? ORDER BY publicado_em DESC LIMIT ?",
+                (normalizar_codigo(termo), limite),
+            ).fetchall()
+
+        noticias = []
+        for titulo, fonte, link, publicado_em, score in linhas:
+            publicado = datetime.fromtimestamp(publicado_em)
+            noticias.append({
+                "title": titulo,
+                "media": fonte,
+                "link": link,
+                "datetime": publicado,
+                "date": publicado.strftime("%d/%m/%Y %H:%M"),
+                "score": int(score) if float(score).is_integer() else score,
+            })
+        return noticias
+
+    # --- AGREGADOS DIÁRIOS ---
+    def agregados_alterados(self, desde_dia, atualizado_apos=0.0):
+        """Soma e quantidade de scores por (ticker, dia) a partir de `desde_dia`, alterados depois de `atualizado_apos`."""
+        with self._conectar() as conexao:
+            return pd.read_sql_query(
+                "SELECT ticker, dia, soma, quantidade, atualizado_em FROM sentimento_diario "
+                "WHERE atualizado_em > ? AND dia >= ?",
+                conexao,
+                params=[atualizado_apos, desde_dia],
+            )
+
+
+_armazem = None
+_trava_armazem = threading.Lock()
+
+
+def obter_noticias():
+    """Instância única do armazém de notícias por processo."""
+    global _armazem
+    with _trava_armazem:
+        if _armazem is None:
+            _armazem = ArmazemNoticias()
+        return _armazem
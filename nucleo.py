@@ -0,0 +1,396 @@
+"""Núcleo de dados e análises do Monitor B3, sem dependência do Streamlit.
+
+Importável por qualquer processo (app, screener, jobs agendados): carrega cotações,
+dividendos, fundamentos e notícias e calcula os indicadores técnicos e o sentimento.
+"""
+import logging
+
+import yfinance as yf
+import pandas as pd
+import numpy as np
+
+from armazem_precos import obter_armazem
+from eventos_corporativos import obter_indice_eventos
+from fundamentos import obter_fundamentos
+from noticias import obter_noticias
+from sentimento_diario import obter_sentimento_diario
+import indicadores
+from sentimento import obter_lexico
+from serie_precos import SeriePrecos, como_serie
+from simbolos import ARQUIVO_SIMBOLOS
+from cache import cacheado
+from cliente_upstream import FalhaUpstream, obter_cliente
+from metricas import instrumentado, anotar, somar_bytes
+
+logger = logging.getLogger(__name__)
+
+# Falhas do Yahoo ficam em cache só por 1 minuto (e à parte dos resultados válidos)
+TTL_FALHA = 60
+
+# --- HELPER: GARANTE O SUFIXO .SA ---
+def get_yf_ticker(ticker):
+    """Garante o sufixo .SA para B3, mas respeita tickers internacionais (ex: AAPL)."""
+    ticker = str(ticker).upper() 
+    
+    # Se o ticker já contiver um ponto (ex: AAPL, .SA), retorna como está
+    if '.' in ticker:
+        return ticker
+    
+    # Adiciona .SA por padrão (para tickers B3)
+    return f"{ticker}.SA"
+
+# --- LISTA DE AÇÕES PARA MONITORAR ---
+tickers_monitor = [
+    'PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'BBAS3.SA',
+    'MGLU3.SA', 'VIIA3.SA', 'HAPV3.SA', 'WEGE3.SA', 'RENT3.SA',
+    'PRIO3.SA', 'SUZB3.SA', 'GGBR4.SA', 'CSNA3.SA', 'ELET3.SA'
+]
+
+# --- UNIVERSO COMPLETO (AÇÕES, FIIs E BDRs LISTADOS NA B3) ---
+
+@instrumentado()
+@cacheado(ttl=3600 * 24) 
+def carregar_universo_b3(classes=("acao", "fii", "bdr")):
+    """Lê a lista local de símbolos da B3 e devolve os tickers no formato do yfinance."""
+    simbolos = pd.read_csv(ARQUIVO_SIMBOLOS, dtype=str)
+    simbolos = simbolos[simbolos['classe'].isin(classes)]
+    return [get_yf_ticker(t) for t in simbolos['ticker']]
+
+# --- FUNÇÃO OTIMIZADA PARA PEGAR DADOS DE COTAÇÃO (Calculo de variação com Pandas) ---
+@instrumentado()
+@cacheado(ttl=300) 
+def carregar_dados_mercado(lista_tickers):
+    try:
+        # Lê do armazém local; o yfinance só é chamado (em lotes) para o intervalo que falta
+        armazem = obter_armazem()
+        # max_idade abaixo do TTL: cada recarga do agendador traz dados novos, não a mesma cópia em disco
+        armazem.sincronizar(lista_tickers, dias=7, max_idade=300 * 0.8)
+        df_historico = armazem.fechamentos(lista_tickers, dias=7, dtype=np.float32).tail(2)
+        df_historico = df_historico.dropna(axis=1, how='all')
+    except Exception as e:
+        logger.error("Erro ao carregar dados do yfinance: %s", e)
+        anotar(erro=repr(e))
+        return pd.DataFrame()
+    
+    if len(df_historico) >= 2:
+        variacoes = (df_historico.iloc[-1] / df_historico.iloc[-2] - 1) * 100 
+        precos_atuais = df_historico.iloc[-1]
+    elif len(df_historico) == 1:
+        variacoes = pd.Series(0.0, index=df_historico.columns, dtype=np.float32)
+        precos_atuais = df_historico.iloc[-1]
+    else:
+        return pd.DataFrame() 
+    
+    # Uma linha por ticker, montada de uma vez a partir da matriz de preços
+    df = pd.DataFrame({
+        "Ativo": df_historico.columns.str.replace(".SA", "", regex=False),
+        "Preço (R$)": precos_atuais.round(2).to_numpy(),
+        "Variação %": variacoes.round(2).to_numpy(),
+    })
+    return df.dropna().reset_index(drop=True)
+
+# --- SINAIS TÉCNICOS (MMS 20 E IFR 14) PARA TODO O QUADRO DE UMA VEZ ---
+@instrumentado()
+@cacheado(ttl=3600) 
+def carregar_sinais_mercado(lista_tickers, janela_mms=20, janela_ifr=14):
+    """Calcula os sinais de MMS e IFR de todos os tickers numa única passada sobre a matriz de preços."""
+    try:
+        armazem = obter_armazem()
+        armazem.sincronizar(lista_tickers, dias=183, max_idade=3600 * 0.8)
+        matriz = armazem.fechamentos(lista_tickers, dias=183, dtype=np.float32)
+    except Exception as e:
+        anotar(erro=repr(e))
+        return pd.DataFrame(columns=["MMS 20", "IFR 14"])
+    
+    sinais = indicadores.calcular_sinais(matriz, janela_mms=janela_mms, janela_ifr=janela_ifr)
+    sinais.index = sinais.index.str.replace(".SA", "", regex=False)
+    return sinais[["sinal_mms", "sinal_ifr"]].rename(
+        columns={"sinal_mms": f"MMS {janela_mms}", "sinal_ifr": f"IFR {janela_ifr}"}
+    )
+
+# --- FUNÇÃO DE ANÁLISE DE SENTIMENTO (SIMULADA) OTIMIZADA ---
+def analisar_sentimento_noticia(titulo):
+    """Classifica o sentimento do título da notícia com termos mais focados em eventos corporativos."""
+    # Léxico ponderado (lexico_sentimento.csv) compilado num único matcher, sem acentos e por palavra inteira
+    return obter_lexico().pontuar(titulo)
+
+@instrumentado()
+@cacheado(ttl=600) 
+def buscar_noticias_e_sentimento(termo):
+    """Busca notícias focadas em 'Fato Relevante' e calcula o sentimento médio."""
+    # Só as notícias novas vão ao GoogleNews; a lista e os scores vêm do armazém local
+    armazem = obter_noticias()
+    armazem.sincronizar(termo)
+    noticias_detalhadas = armazem.recentes(termo, limite=7)
+    
+    # Média com decaimento sobre todo o histórico do ativo (notícias recentes pesam mais)
+    sentimento_medio = obter_sentimento_diario().decaido([termo]).iloc[0]
+    classificacao, emoji = classificar_sentimento(0 if pd.isna(sentimento_medio) else sentimento_medio)
+        
+    return noticias_detalhadas, classificacao, emoji
+
+def classificar_sentimento(sentimento_medio):
+    """Classificação (rótulo, emoji) de um score médio de notícias."""
+    if sentimento_medio > 0.3:
+        return "**Otimista**", "🟢"
+    elif sentimento_medio < -0.3:
+        return "**Pessimista**", "🔴"
+    return "**Neutro**", "🟡"
+
+@instrumentado()
+@cacheado(ttl=600)
+def carregar_ranking_sentimento(lista_tickers):
+    """Ranking do sentimento (com decaimento e por janela) das notícias já armazenadas dos tickers."""
+    try:
+        ranking = obter_sentimento_diario().ranking(lista_tickers)
+    except Exception as e:
+        anotar(erro=repr(e))
+        return pd.DataFrame(columns=["Ativo", "Notícias (30d)", "Sentimento", "1 dia", "7 dias", "30 dias", "Classificação"])
+    
+    return pd.DataFrame({
+        "Ativo": ranking.index,
+        "Notícias (30d)": ranking["noticias_30d"].to_numpy(),
+        "Sentimento": ranking["decaido"].round(2).to_numpy(),
+        "1 dia": ranking["1d"].round(2).to_numpy(),
+        "7 dias": ranking["7d"].round(2).to_numpy(),
+        "30 dias": ranking["30d"].round(2).to_numpy(),
+        "Classificação": [f"{emoji} {rotulo.strip('*')}" for rotulo, emoji in map(classificar_sentimento, ranking["decaido"])],
+    })
+
+@instrumentado()
+@cacheado(ttl=600)
+def carregar_serie_sentimento(ticker, dias=60):
+    """Tendência diária do sentimento do ativo (dos agregados já pontuados, sem releitura das notícias)."""
+    try:
+        serie = obter_sentimento_diario().serie(ticker, dias=dias)
+    except Exception as e:
+        anotar(erro=repr(e))
+        return pd.DataFrame(columns=["Sentimento (decaimento)", "Média 7 dias"])
+    
+    return serie[["decaido", "media_7d"]].rename(
+        columns={"decaido": "Sentimento (decaimento)", "media_7d": "Média 7 dias"}
+    ).dropna(how="all")
+
+# --- FUNÇÕES PARA DIVIDENDOS E FUNDAMENTOS ---
+def _dividendos_do_ativo(ativo):
+    """Extrai preço atual, dividendos pagos em 12 meses e DY de um yf.Ticker já criado."""
+    # O fast_info é preguiçoso: a requisição sai no primeiro get, dentro do cliente do Yahoo
+    preco_atual = obter_cliente("yahoo").chamar(
+        lambda: ativo.fast_info.get('last_price') or ativo.fast_info.get('regular_market_price')
+    )
+    if not preco_atual:
+        # Sem cotação, a resposta não serve (e zeros não podem ir para o cache)
+        raise FalhaUpstream(f"yahoo: sem cotação para {ativo.ticker}")
+    
+    # Proventos de 12 meses vêm do índice local de eventos (só o intervalo novo é baixado)
+    indice = obter_indice_eventos()
+    indice.sincronizar([ativo.ticker])
+    total_pago = float(indice.total_12m([ativo.ticker]).iloc[0])
+    
+    dy_anual = 0
+    if preco_atual and preco_atual != 0:
+        dy_anual = (total_pago / preco_atual) * 100
+            
+    return preco_atual, total_pago, dy_anual
+
+def _fundamentos_do_info(info):
+    """Extrai P/L, P/VPA e VPA do dicionário .info do yfinance."""
+    pl = info.get('forwardPE') if info.get('forwardPE') is not None else info.get('trailingPE')
+    pvpa = info.get('priceToBook')
+    vpa = info.get('bookValue')
+    
+    return pl, pvpa, vpa
+
+def _info_yahoo(ticker_yf, sessao):
+    """.info do ativo; um código que o Yahoo não conhece (HTTP 404) volta vazio, como inválido."""
+    try:
+        return yf.Ticker(ticker_yf, session=sessao).info
+    except Exception as e:
+        if getattr(getattr(e, "response", None), "status_code", None) == 404:
+            return {}
+        raise
+
+def _info_valido(info):
+    """O yfinance devolve um .info quase vazio para códigos inexistentes."""
+    return bool(info) and len(info) >= 5 and 'regularMarketPrice' in info
+
+@instrumentado()
+@cacheado(ttl=3600 * 4, ttl_falha=TTL_FALHA) 
+def carregar_dados_dividendos(ticker):
+    """Preço atual, dividendos de 12 meses e DY; levanta FalhaUpstream se o Yahoo não responder."""
+    ticker_yf = get_yf_ticker(ticker)
+    ativo = yf.Ticker(ticker_yf, session=obter_cliente("yahoo").sessao)
+    return _dividendos_do_ativo(ativo)
+        
+# --- RANKING DE DIVIDEND YIELD (MERCADO INTEIRO, NUMA PASSADA) ---
+@instrumentado()
+@cacheado(ttl=3600) 
+def carregar_top_dividend_yield(lista_tickers, quantidade=10):
+    """Maiores DY de 12 meses: proventos do índice local contra o último fechamento do armazém."""
+    try:
+        indice = obter_indice_eventos()
+        indice.sincronizar(lista_tickers)
+        armazem = obter_armazem()
+        # Mesmos parâmetros do quadro de cotações: normalmente já está sincronizado
+        armazem.sincronizar(lista_tickers, dias=7, max_idade=300 * 0.8)
+        precos = armazem.fechamentos(lista_tickers, dias=7).ffill().iloc[-1].dropna()
+    except Exception as e:
+        logger.error("Erro ao montar o ranking de dividend yield: %s", e)
+        anotar(erro=repr(e))
+        return pd.DataFrame()
+    
+    proventos = indice.total_12m(precos.index)
+    df = pd.DataFrame({
+        "Ativo": precos.index.str.replace(".SA", "", regex=False),
+        "Preço (R$)": precos.round(2).to_numpy(),
+        "Proventos 12m (R$)": proventos.round(2).to_numpy(),
+        "DY 12m %": (proventos / precos * 100).round(2).to_numpy(),
+    })
+    df = df[df["DY 12m %"] > 0]
+    return df.nlargest(quantidade, "DY 12m %").reset_index(drop=True)
+
+# --- SNAPSHOT DE FUNDAMENTOS DO UNIVERSO (RENOVADO PELO AGENDADOR) ---
+@instrumentado()
+@cacheado(ttl=3600 * 24) 
+def atualizar_fundamentos_mercado(lista_tickers):
+    """Renova só as linhas vencidas do snapshot de fundamentos; devolve quantas foram rebaixadas."""
+    return obter_fundamentos().atualizar(lista_tickers, max_idade=3600 * 24 * 0.8)
+
+@instrumentado()
+@cacheado(ttl=3600 * 4, ttl_falha=TTL_FALHA) 
+def carregar_fundamentos_essenciais(ticker):
+    """P/L, P/VPA e VPA; levanta FalhaUpstream se o ativo não está no snapshot e o Yahoo não responder."""
+    # O snapshot em memória evita um .info por ativo; só cai no .info se o ticker não estiver nele
+    linha = obter_fundamentos().linha(get_yf_ticker(ticker))
+    if linha is not None:
+        return tuple(None if pd.isna(linha[c]) else float(linha[c]) for c in ("pl", "pvpa", "vpa"))
+    info = carregar_info_ativo(ticker)
+    return info["pl"], info["pvpa"], info["vpa"]
+
+# --- FUNÇÕES PARA O INDICADOR MMS 20 (CURTO PRAZO) ---
+def _historico_do_armazem(ticker_yf):
+    """Lê ~6 meses de fechamentos do armazém local, baixando só o intervalo que falta."""
+    # Usa ~6 meses (183 dias) para garantir que temos dados suficientes para IFR (14 dias) e MMS (20 dias)
+    armazem = obter_armazem()
+    armazem.sincronizar([ticker_yf], dias=183, max_idade=3600 * 0.8)
+    data = armazem.fechamentos([ticker_yf], dias=183, dtype=np.float32)
+    if ticker_yf not in data.columns:
+        return SeriePrecos.vazia(ticker_yf)
+    # float32 + índice de datas compartilhado entre os tickers em cache
+    return SeriePrecos.de_series(data[ticker_yf], nome=ticker_yf)
+
+@instrumentado()
+# Chave nova: entradas antigas (Series float64) em caches compartilhados não são lidas como SeriePrecos
+@cacheado(ttl=3600, nome="nucleo.carregar_historico_curto:compacta")
+def carregar_historico_curto(ticker, dias=30):
+    """Carrega dados para calcular indicadores de curto prazo (MMS 20 e IFR)."""
+    ticker_yf = get_yf_ticker(ticker) 
+    try:
+        # Retorna a série de Fechamento (Close) a partir do armazém local
+        return _historico_do_armazem(ticker_yf)
+    except Exception as e:
+        anotar(erro=repr(e))
+        return SeriePrecos.vazia(ticker_yf)
+
+# --- VALIDAÇÃO E FUNDAMENTOS (UM ÚNICO .info POR ATIVO) ---
+@instrumentado()
+@cacheado(ttl=3600 * 4, ttl_falha=TTL_FALHA) 
+def carregar_info_ativo(ticker):
+    """Valida o código e extrai nome e fundamentos do mesmo .info (baixado uma vez só).
+
+    Um código inexistente volta com ``valido=False``; se o Yahoo não responder, levanta FalhaUpstream.
+    """
+    yahoo = obter_cliente("yahoo")
+    info = yahoo.chamar(_info_yahoo, get_yf_ticker(ticker), yahoo.sessao)
+    
+    somar_bytes("yfinance", info)
+    pl, pvpa, vpa = _fundamentos_do_info(info) if info else (None, None, None)
+    return {
+        "valido": _info_valido(info),
+        "nome": info.get('longName', ticker) if info else ticker,
+        "pl": pl, "pvpa": pvpa, "vpa": vpa,
+    }
+
+@instrumentado()
+def calcular_sinal_mms20(df_historico):
+    """Calcula e retorna o sinal de tendência com base na Média Móvel Simples de 20 dias."""
+    df_historico = como_serie(df_historico)
+    
+    # 1. Checagem primária
+    if df_historico.empty or len(df_historico) < 20:
+        return "Dados Insuficientes para Análise", "⚪", pd.Series(dtype=float)
+
+    # 2. Cálculo da MMS 20
+    mms_20_series = indicadores.mms(df_historico, janela=20)
+    
+    # 3. Checagem se o cálculo resultou em algo (o último valor não pode ser NaN)
+    if mms_20_series.empty or np.any(pd.isna(mms_20_series.iloc[-1])):
+        return "Dados Insuficientes para Análise", "⚪", pd.Series(dtype=float)
+
+    # 4. Extração segura dos valores
+    try:
+        preco_atual = df_historico.iloc[-1].item()
+        mms_20 = mms_20_series.iloc[-1].item()
+    except Exception:
+        # Fallback de segurança se algo der errado na indexação
+        return "Erro de Indexação", "⚪", pd.Series(dtype=float)
+
+    # 5. Análise de Sinal
+    diff = (preco_atual - mms_20) / mms_20 * 100
+
+    if preco_atual > mms_20 * 1.01: 
+        sinal = f"**ALTA Confirmada** (Preço está {diff:.2f}% acima da MMS 20)"
+        emoji = "🟢"
+    elif preco_atual < mms_20 * 0.99: 
+        sinal = f"**QUEDA Confirmada** (Preço está {abs(diff):.2f}% abaixo da MMS 20)"
+        emoji = "🔴"
+    else:
+        sinal = f"**NEUTRO** (Preço está próximo da MMS 20)"
+        emoji = "🟡"
+        
+    return sinal, emoji, mms_20_series
+
+# --- FUNÇÕES PARA O INDICADOR IFR (Índice de Força Relativa) ---
+@instrumentado()
+def calcular_rsi(df_historico, window=14):
+    """Calcula o Índice de Força Relativa (IFR) para uma janela (padrão 14)."""
+    df_historico = como_serie(df_historico)
+    if df_historico.empty or len(df_historico) < window + 1: 
+        return pd.Series(dtype=float), None
+
+    rsi_series = indicadores.ifr(df_historico, janela=window)
+
+    # Tratamento seguro para extrair o valor escalar final
+    if not rsi_series.empty:
+        try:
+            # Garante que o último valor é um escalar (float)
+            rsi_last_value = rsi_series.iloc[-1].item() 
+            if not pd.isna(rsi_last_value):
+                rsi_atual = rsi_last_value
+            else:
+                rsi_atual = None
+        except (ValueError, IndexError, AttributeError): 
+            # Captura se .item() falhar ou se houver erro de indexação
+            rsi_atual = None
+    else:
+        rsi_atual = None
+    
+    return rsi_series, rsi_atual
+
+@instrumentado()
+def calcular_sinal_rsi(rsi_atual):
+    """Interpreta o sinal de sobrecompra/sobrevenda do IFR."""
+    if pd.isna(rsi_atual) or rsi_atual is None:
+        return "Dados Insuficientes para IFR", "⚪"
+
+    if rsi_atual > 70:
+        sinal = f"**SOBRECOMPRA** (IFR = {rsi_atual:.2f}). Risco de correção."
+        emoji = "⚠️"
+    elif rsi_atual < 30:
+        sinal = f"**SOBREVENDA** (IFR = {rsi_atual:.2f}). Potencial de recuperação."
+        emoji = "📈"
+    else:
+        sinal = f"**NEUTRO** (IFR = {rsi_atual:.2f}). Sem sinal extremo de sobrecompra/venda."
+        emoji = "⚪"
+        
+    return sinal, emoji
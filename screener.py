@@ -0,0 +1,151 @@
+"""Screener em lote (sem Streamlit): gera um snapshot de indicadores para uma lista de tickers.
+
+Exemplos:
+    python screener.py --saida snapshot.parquet
+    python screener.py --tickers minha_lista.txt --saida snapshot.csv --threads 8 --sem-noticias
+
+A lista de tickers pode ser um .txt (um código por linha) ou um .csv com a coluna
+``ticker`` (padrão: simbolos_b3.csv). Preços e sinais técnicos são calculados de uma
+vez sobre a matriz de fechamentos, assim como o DY (índice local de proventos);
+fundamentos e notícias são buscados em paralelo num pool de threads do próprio
+processo, que passam todas pelos mesmos clientes do upstream (um só limite de taxa
+por fonte; a classificação das manchetes é leve perto da espera pela rede).
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import indicadores
+from armazem_precos import obter_armazem
+from cliente_upstream import FalhaUpstream
+from eventos_corporativos import obter_indice_eventos
+from fundamentos import obter_fundamentos
+from nucleo import (
+    ARQUIVO_SIMBOLOS,
+    get_yf_ticker,
+    carregar_fundamentos_essenciais,
+    buscar_noticias_e_sentimento,
+)
+
+logger = logging.getLogger("screener")
+
+# Tickers analisados ao mesmo tempo (o ritmo de cada fonte é o do seu cliente)
+THREADS_PADRAO = 8
+
+
+def ler_lista_tickers(caminho):
+    """Lê os códigos de um .txt (um por linha) ou de um .csv com a coluna `ticker`."""
+    if caminho.lower().endswith(".csv"):
+        codigos = pd.read_csv(caminho, dtype=str)["ticker"].tolist()
+    else:
+        with open(caminho, encoding="utf-8") as arquivo:
+            codigos = [linha.strip() for linha in arquivo]
+    return list(dict.fromkeys(c.strip().upper() for c in codigos if c and c.strip()))
+
+
+def calcular_tecnicos(codigos):
+    """Sincroniza o armazém em lote e calcula preço, MMS 20, IFR 14 e DY de todos os tickers numa passada."""
+    tickers_yf = [get_yf_ticker(c) for c in codigos]
+    armazem = obter_armazem()
+    armazem.sincronizar(tickers_yf, dias=183, max_idade=3600)
+    sinais = indicadores.calcular_sinais(armazem.fechamentos(tickers_yf, dias=183))
+    sinais.index = [str(t).replace(".SA", "") for t in sinais.index]
+
+    tecnicos = pd.DataFrame(
+        {
+            "preco": sinais["preco"],
+            "sinal_mms20": indicadores.NOMES_MMS[sinais["codigo_mms"].to_numpy(dtype=int)],
+            "ifr14": sinais["ifr"],
+            "sinal_ifr14": indicadores.NOMES_IFR[sinais["codigo_ifr"].to_numpy(dtype=int)],
+        },
+        index=sinais.index,
+    )
+
+    # Proventos de 12 meses do índice local de eventos, contra o mesmo preço
+    indice = obter_indice_eventos()
+    indice.sincronizar(tickers_yf)
+    proventos = indice.total_12m(tickers_yf)
+    proventos.index = [t.replace(".SA", "") for t in proventos.index]
+    tecnicos["dividendos_12m"] = proventos.reindex(tecnicos.index)
+    tecnicos["dy"] = tecnicos["dividendos_12m"] / tecnicos["preco"] * 100
+    # Tickers sem cotação no armazém continuam no snapshot, sem sinal
+    tecnicos = tecnicos.reindex(codigos).fillna({"sinal_mms20": "SEM_DADOS", "sinal_ifr14": "SEM_DADOS"})
+    return tecnicos.rename_axis("ticker")
+
+
+def analisar_ticker(codigo, com_noticias=True):
+    """Fundamentos e (opcionalmente) sentimento de um ticker. Roda nas threads do pool."""
+    try:
+        pl, pvpa, vpa = carregar_fundamentos_essenciais(codigo)
+    except FalhaUpstream as e:
+        logger.warning("Falha ao buscar fundamentos de %s: %s", codigo, e)
+        pl = pvpa = vpa = None
+
+    sentimento = None
+    if com_noticias:
+        try:
+            _, classificacao, _ = buscar_noticias_e_sentimento(codigo)
+            sentimento = classificacao.strip("*")
+        except Exception as e:
+            logger.warning("Falha ao buscar notícias de %s: %s", codigo, e)
+
+    return {
+        "ticker": codigo,
+        "pl": pl,
+        "pvpa": pvpa,
+        "vpa": vpa,
+        "sentimento": sentimento,
+    }
+
+
+def executar(codigos, threads=THREADS_PADRAO, com_noticias=True):
+    """Gera o snapshot (um registro por ticker) usando um pool de threads."""
+    tecnicos = calcular_tecnicos(codigos)
+    # Renova o snapshot de fundamentos em lote; as threads do pool leem dele em vez do .info
+    obter_fundamentos().atualizar([get_yf_ticker(c) for c in codigos])
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="screener") as pool:
+        registros = list(pool.map(lambda codigo: analisar_ticker(codigo, com_noticias), codigos))
+
+    fundamentos = pd.DataFrame(registros).set_index("ticker")
+    snapshot = tecnicos.join(fundamentos)
+    snapshot.insert(0, "data_snapshot", pd.Timestamp.now().normalize())
+    return snapshot.reset_index()
+
+
+def gravar(snapshot, caminho):
+    """Grava em Parquet (requer pyarrow) ou CSV, conforme a extensão."""
+    if caminho.lower().endswith(".parquet"):
+        snapshot.to_parquet(caminho, index=False)
+    else:
+        snapshot.to_csv(caminho, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screener em lote do Monitor B3.")
+    parser.add_argument("--tickers", default=ARQUIVO_SIMBOLOS, help="Arquivo .txt ou .csv com os códigos.")
+    parser.add_argument("--saida", default="snapshot.csv", help="Arquivo de saída (.parquet ou .csv).")
+    parser.add_argument("--threads", type=int, default=THREADS_PADRAO, help="Tickers analisados ao mesmo tempo.")
+    parser.add_argument("--sem-noticias", action="store_true", help="Não busca notícias/sentimento.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    codigos = ler_lista_tickers(args.tickers)
+    inicio = time.perf_counter()
+    snapshot = executar(codigos, threads=args.threads, com_noticias=not args.sem_noticias)
+    gravar(snapshot, args.saida)
+    duracao = time.perf_counter() - inicio
+
+    print(
+        f"{len(codigos)} tickers em {duracao:.1f}s "
+        f"({len(codigos) / duracao:.1f} tickers/s) -> {args.saida}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,178 @@
+"""Léxico de sentimento para títulos de notícias, consultado palavra a palavra.
+
+Os termos e pesos ficam em ``lexico_sentimento.csv``. Um termo terminado em ``*``
+casa qualquer palavra com aquele prefixo (ex.: ``lucro*`` -> lucro, lucros);
+os demais casam só a palavra inteira, então 'alta' não casa 'altamente' e
+'cai' não casa 'caixa'. Acentos e maiúsculas são ignorados.
+
+Cada título é normalizado e quebrado em palavras uma vez só; cada palavra é então
+procurada em dicionários (palavra inteira, prefixos e primeira palavra dos termos
+compostos), sem percorrer a lista de termos.
+"""
+import csv
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+ARQUIVO_LEXICO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexico_sentimento.csv")
+
+_PALAVRA = re.compile(r"\w+")
+
+# Palavras distintas guardadas no cache de consulta de cada léxico
+MAX_PALAVRAS_CACHE = 100_000
+
+
+def _sem_marcas(texto):
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+# Letras latinas acentuadas -> sem acento, numa tabela só (o NFKD fica para o que sobrar)
+_SEM_ACENTO = str.maketrans({
+    chr(codigo): _sem_marcas(chr(codigo))
+    for codigo in range(0xC0, 0x250)
+    if _sem_marcas(chr(codigo)) != chr(codigo) and _sem_marcas(chr(codigo)).isascii()
+})
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos (NFKD sem marcas combinantes)."""
+    texto = str(texto).lower()
+    if texto.isascii():
+        return texto
+    texto = texto.translate(_SEM_ACENTO)
+    return texto if texto.isascii() else _sem_marcas(texto)
+
+
+class _CachePalavras(dict):
+    """Dicionário que calcula (e guarda, até MAX_PALAVRAS_CACHE) as palavras que ainda não viu."""
+
+    def __init__(self, calcular):
+        super().__init__()
+        self.calcular = calcular
+
+    def __missing__(self, palavra):
+        valor = self.calcular(palavra)
+        if len(self) < MAX_PALAVRAS_CACHE:
+            self[palavra] = valor
+        return valor
+
+
+class Lexico:
+    """Termos ponderados indexados por palavra (inteira, prefixo ou início de termo composto)."""
+
+    def __init__(self, termos):
+        # Termos mais longos primeiro: numa mesma posição do título, o de menor índice vence
+        # ('juros sobre capital proprio' antes de qualquer palavra solta)
+        self.termos = sorted(((normalizar(t), p) for t, p in termos), key=lambda tp: -len(tp[0]))
+        self.pesos = np.array([p for _, p in self.termos])
+
+        self._inteiras = {}
+        self._prefixos = {}
+        # Primeira palavra -> [(índice, demais palavras, última é prefixo)]
+        self._compostos = {}
+        for i, (termo, _) in enumerate(self.termos):
+            prefixo = termo.endswith("*")
+            palavras = termo.rstrip("*").split()
+            if len(palavras) > 1:
+                self._compostos.setdefault(palavras[0], []).append((i, palavras[1:], prefixo))
+            elif prefixo:
+                self._prefixos.setdefault(palavras[0], i)
+            else:
+                self._inteiras.setdefault(palavras[0], i)
+        self._tamanhos_prefixo = sorted({len(p) for p in self._prefixos})
+        # Palavra -> termo de uma palavra só que ela casa (None se nenhum), preenchido sob demanda
+        self._cache = _CachePalavras(self._simples)
+        self._pesos = [p for _, p in self.termos]
+
+    @classmethod
+    def de_arquivo(cls, caminho=ARQUIVO_LEXICO):
+        with open(caminho, encoding="utf-8") as arquivo:
+            termos = [(linha["termo"], _numero(linha["peso"])) for linha in csv.DictReader(arquivo)]
+        return cls(termos)
+
+    def _simples(self, palavra):
+        """Índice do termo de uma palavra (inteira ou prefixo) que casa `palavra`, ou None."""
+        candidatos = [self._inteiras[palavra]] if palavra in self._inteiras else []
+        for tamanho in self._tamanhos_prefixo:
+            if tamanho > len(palavra):
+                break
+            indice = self._prefixos.get(palavra[:tamanho])
+            if indice is not None:
+                candidatos.append(indice)
+        return min(candidatos) if candidatos else None
+
+    def _composto(self, palavras, vaos, posicao):
+        """(índice, palavras consumidas) do termo composto que começa em `posicao`, ou None."""
+        for indice, resto, prefixo in self._compostos[palavras[posicao]]:
+            fim = posicao + 1 + len(resto)
+            # Só espaços entre as palavras, como no texto do termo
+            if fim > len(palavras) or not all(vao.isspace() for vao in vaos[posicao:fim - 1]):
+                continue
+            seguintes = palavras[posicao + 1:fim]
+            if seguintes[:-1] != resto[:-1]:
+                continue
+            ultima = seguintes[-1]
+            if ultima.startswith(resto[-1]) if prefixo else ultima == resto[-1]:
+                return indice, len(resto) + 1
+        return None
+
+    def termos_encontrados(self, titulo):
+        """Índices dos termos presentes no título (cada termo conta uma vez só)."""
+        texto = normalizar(titulo)
+        palavras = _PALAVRA.findall(texto)
+        if self._compostos.keys().isdisjoint(palavras):
+            # Caso comum: cada palavra casa no máximo um termo, consultado no cache (laço em C)
+            encontrados = set(map(self._cache.__getitem__, palavras))
+            encontrados.discard(None)
+            return encontrados
+
+        # Termo composto possível: confere também o que separa as palavras no texto
+        achados = list(_PALAVRA.finditer(texto))
+        vaos = [texto[a.end():b.start()] for a, b in zip(achados, achados[1:])]
+        encontrados = set()
+        posicao = 0
+        while posicao < len(palavras):
+            palavra = palavras[posicao]
+            indice = self._cache[palavra]
+            consumidas = 1
+            if palavra in self._compostos:
+                composto = self._composto(palavras, vaos, posicao)
+                # Na mesma posição vence o termo de menor índice (o mais longo)
+                if composto is not None and (indice is None or composto[0] < indice):
+                    indice, consumidas = composto
+            if indice is not None:
+                encontrados.add(indice)
+            posicao += consumidas
+        return encontrados
+
+    def pontuar(self, titulo):
+        """Score do título: soma dos pesos dos termos encontrados."""
+        return sum(map(self._pesos.__getitem__, self.termos_encontrados(titulo)))
+
+    def pontuar_lote(self, titulos):
+        """Scores de uma lista/Series de títulos numa única passada por título."""
+        scores = np.fromiter((self.pontuar(t) for t in titulos), dtype=self.pesos.dtype, count=len(titulos))
+        if isinstance(titulos, pd.Series):
+            return pd.Series(scores, index=titulos.index, name="score")
+        return scores
+
+
+def _numero(texto):
+    valor = float(texto)
+    return int(valor) if valor.is_integer() else valor
+
+
+@lru_cache(maxsize=1)
+def obter_lexico():
+    """Léxico padrão, compilado uma vez por processo."""
+    return Lexico.de_arquivo()
+
+
+def pontuar_titulos(titulos):
+    """Atalho para pontuar vários títulos com o léxico padrão."""
+    return obter_lexico().pontuar_lote(titulos)
@@ -0,0 +1,174 @@
+"""Série temporal do sentimento das notícias: soma e quantidade de scores por ticker e dia.
+
+Os agregados diários são mantidos pelo :mod:`noticias` (um gatilho no SQLite soma cada
+notícia nova no seu dia) e copiados para duas matrizes compactas tickers x dias
+(float32/int32) cobrindo os últimos ``DIAS_HISTORICO`` dias. Cada consulta só lê do
+disco as células alteradas desde a anterior; na virada do dia as colunas deslizam.
+Médias por janela (1d/7d/30d), média com decaimento exponencial, a série diária de
+um ticker e o ranking entre tickers saem de operações vetorizadas sobre as matrizes,
+sem pontuar de novo nenhuma manchete.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from noticias import dia_b3, obter_noticias
+from simbolos import normalizar_codigo
+
+# Dias mantidos em memória (a janela mais longa e o gráfico cabem com folga)
+DIAS_HISTORICO = 90
+
+# Meia-vida (dias) do peso de uma notícia na média com decaimento
+MEIA_VIDA = 3
+
+JANELAS = (1, 7, 30)
+
+# Releitura das células gravadas pouco antes da consulta anterior: o horário gravado é
+# o do início da ingestão, que pode terminar (e ficar visível) depois da consulta
+SOBREPOSICAO = 300
+
+
+class SentimentoDiario:
+    """Matrizes tickers x dias com a soma e a quantidade de scores, atualizadas incrementalmente."""
+
+    def __init__(self, armazem=None, dias=DIAS_HISTORICO):
+        self.armazem = armazem or obter_noticias()
+        self.dias = dias
+        self._trava = threading.Lock()
+        self._posicao = {}
+        # Última linha sempre zerada: tickers sem notícias (posição -1) caem nela
+        self._soma = np.zeros((1, dias), dtype=np.float32)
+        self._quantidade = np.zeros((1, dias), dtype=np.int32)
+        self._hoje = None
+        self._visto_ate = 0.0
+
+    # --- ATUALIZAÇÃO INCREMENTAL ---
+    def _atualizar(self):
+        hoje = dia_b3(time.time())
+        if self._hoje is None:
+            self._hoje = hoje
+        elif hoje > self._hoje:
+            self._deslizar(hoje - self._hoje)
+            self._hoje = hoje
+
+        primeiro_dia = hoje - self.dias + 1
+        alterados = self.armazem.agregados_alterados(primeiro_dia, self._visto_ate - SOBREPOSICAO)
+        if alterados.empty:
+            return
+
+        # Dia no futuro (relógio de outro processo adiantado) só entra depois da virada
+        alterados = alterados[alterados["dia"] <= hoje]
+        novos = [t for t in pd.unique(alterados["ticker"]) if t not in self._posicao]
+        if novos:
+            self._acrescentar(novos)
+
+        # Cada célula guarda o agregado inteiro do dia: regravar uma célula já vista não duplica nada
+        linhas = alterados["ticker"].map(self._posicao).to_numpy()
+        colunas = alterados["dia"].to_numpy() - primeiro_dia
+        self._soma[linhas, colunas] = alterados["soma"].to_numpy(dtype=np.float32)
+        self._quantidade[linhas, colunas] = alterados["quantidade"].to_numpy(dtype=np.int32)
+        self._visto_ate = max(self._visto_ate, float(alterados["atualizado_em"].max()))
+
+    def _deslizar(self, deslocamento):
+        """Descarta os `deslocamento` dias mais antigos e abre colunas zeradas para os novos."""
+        deslocamento = min(deslocamento, self.dias)
+        for matriz in (self._soma, self._quantidade):
+            matriz[:, :self.dias - deslocamento] = matriz[:, deslocamento:]
+            matriz[:, self.dias - deslocamento:] = 0
+
+    def _acrescentar(self, tickers):
+        inicio = len(self._posicao)
+        for i, ticker in enumerate(tickers):
+            self._posicao[ticker] = inicio + i
+        extras = len(tickers)
+        self._soma = np.insert(self._soma, [inicio] * extras, 0, axis=0)
+        self._quantidade = np.insert(self._quantidade, [inicio] * extras, 0, axis=0)
+
+    def _matrizes(self, tickers):
+        """(códigos, soma, quantidade) das linhas dos tickers pedidos (todos, se None)."""
+        with self._trava:
+            self._atualizar()
+            if tickers is None:
+                codigos = list(self._posicao)
+            else:
+                codigos = list(dict.fromkeys(normalizar_codigo(t) for t in tickers))
+            linhas = np.array([self._posicao.get(c, -1) for c in codigos], dtype=np.intp)
+            return codigos, self._soma[linhas].astype(float), self._quantidade[linhas].astype(float)
+
+    # --- CONSULTAS VETORIZADAS ---
+    def medias(self, tickers=None, janelas=JANELAS):
+        """Score médio das notícias de cada janela de dias (NaN sem notícias na janela)."""
+        codigos, soma, quantidade = self._matrizes(tickers)
+        return pd.DataFrame(_medias(soma, quantidade, janelas), index=pd.Index(codigos, name="ticker"))
+
+    def decaido(self, tickers=None, meia_vida=MEIA_VIDA):
+        """Média com peso 0,5 ** (idade em dias / meia-vida): notícias recentes pesam mais."""
+        codigos, soma, quantidade = self._matrizes(tickers)
+        valores = _decaido(soma, quantidade, meia_vida)
+        return pd.Series(valores, index=pd.Index(codigos, name="ticker"), name="decaido")
+
+    def serie(self, ticker, dias=60, meia_vida=MEIA_VIDA):
+        """Série diária de um ticker: média com decaimento até cada dia e média móvel de 7 dias."""
+        _, soma, quantidade = self._matrizes([ticker])
+        soma, quantidade = soma[0], quantidade[0]
+
+        # Soma exponencial até cada dia t: fator**t * cumsum(x_j / fator**j), sem laço em Python
+        fator = 0.5 ** (1 / meia_vida)
+        escala = fator ** -np.arange(self.dias)
+        soma_decaida = np.cumsum(soma * escala) / escala
+        quantidade_decaida = np.cumsum(quantidade * escala) / escala
+
+        soma_7d = np.convolve(soma, np.ones(7))[:self.dias]
+        quantidade_7d = np.convolve(quantidade, np.ones(7))[:self.dias]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            decaida = np.where(quantidade_decaida > 1e-9, soma_decaida / quantidade_decaida, np.nan)
+            media_7d = np.where(quantidade_7d > 0, soma_7d / quantidade_7d, np.nan)
+
+        primeiro_dia = self._hoje - self.dias + 1
+        indice = pd.to_datetime(np.arange(primeiro_dia, self._hoje + 1), unit="D").rename("Data")
+        serie = pd.DataFrame(
+            {"decaido": decaida, "media_7d": media_7d, "noticias": quantidade.astype(int)}, index=indice
+        )
+        return serie.tail(dias)
+
+    def ranking(self, tickers=None, meia_vida=MEIA_VIDA, minimo=2):
+        """Tickers com pelo menos `minimo` notícias em 30 dias, do mais otimista ao mais pessimista."""
+        codigos, soma, quantidade = self._matrizes(tickers)
+        tabela = pd.DataFrame(
+            {"decaido": _decaido(soma, quantidade, meia_vida), **_medias(soma, quantidade, JANELAS)},
+            index=pd.Index(codigos, name="ticker"),
+        )
+        tabela["noticias_30d"] = quantidade[:, -30:].sum(axis=1).astype(int)
+        tabela = tabela[tabela["noticias_30d"] >= minimo]
+        return tabela.sort_values(["decaido", "noticias_30d"], ascending=[False, False])
+
+
+def _medias(soma, quantidade, janelas):
+    colunas = {}
+    for janela in janelas:
+        total = quantidade[:, -janela:].sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            colunas[f"{janela}d"] = np.where(total > 0, soma[:, -janela:].sum(axis=1) / total, np.nan)
+    return colunas
+
+
+def _decaido(soma, quantidade, meia_vida):
+    pesos = 0.5 ** (np.arange(soma.shape[1])[::-1] / meia_vida)
+    total = quantidade @ pesos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, (soma @ pesos) / total, np.nan)
+
+
+_sentimento = None
+_trava_sentimento = threading.Lock()
+
+
+def obter_sentimento_diario():
+    """Instância única da série de sentimento por processo."""
+    global _sentimento
+    with _trava_sentimento:
+        if _sentimento is None:
+            _sentimento = SentimentoDiario()
+        return _sentimento
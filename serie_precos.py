@@ -0,0 +1,119 @@
+"""Representação compacta de uma série de fechamentos: valores float32 e índice de datas compartilhado.
+
+Cada :class:`SeriePrecos` guarda só um vetor float32 contíguo (metade de um float64,
+e precisão de sobra para cotações em reais) e uma referência ao índice de datas. Os
+índices iguais (o mesmo calendário de pregões, que quase todos os tickers têm) são
+internados: as centenas de séries em cache apontam para um único ``DatetimeIndex``.
+:meth:`SeriePrecos.serie` e :meth:`SeriePrecos.cauda` devolvem visões sobre o mesmo
+buffer, sem cópia, para os indicadores e os gráficos.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Quantidade de calendários distintos mantidos internados (LRU)
+MAX_CALENDARIOS = 64
+
+_NS_DIA = 86_400 * 10**9
+
+_calendarios = OrderedDict()
+_trava_calendarios = threading.Lock()
+
+
+def compartilhar_datas(datas):
+    """O índice de datas internado igual a `datas` (o próprio `datas` na primeira vez que aparece)."""
+    datas = pd.DatetimeIndex(datas)
+    chave = (len(datas), datas.asi8.tobytes(), str(datas.tz))
+    with _trava_calendarios:
+        existente = _calendarios.get(chave)
+        if existente is not None:
+            _calendarios.move_to_end(chave)
+            return existente
+        _calendarios[chave] = datas
+        while len(_calendarios) > MAX_CALENDARIOS:
+            _calendarios.popitem(last=False)
+    return datas
+
+
+class SeriePrecos:
+    """Fechamentos de um ticker: vetor float32 + índice de datas compartilhado."""
+
+    __slots__ = ("datas", "valores", "nome")
+
+    def __init__(self, datas, valores, nome=None):
+        self.datas = compartilhar_datas(datas)
+        self.valores = np.ascontiguousarray(valores, dtype=np.float32)
+        self.nome = nome
+        if len(self.datas) != len(self.valores):
+            raise ValueError("datas e valores com tamanhos diferentes")
+
+    @classmethod
+    def de_series(cls, serie, nome=None):
+        """A partir de uma Series de fechamentos (os NaN são descartados)."""
+        serie = serie.dropna()
+        return cls(serie.index, serie.to_numpy(dtype=np.float32), nome or serie.name)
+
+    @classmethod
+    def vazia(cls, nome=None):
+        return cls(pd.DatetimeIndex([]), np.empty(0, dtype=np.float32), nome)
+
+    # No cache serializado (sqlite/redis) as datas diárias vão como dias int32; ao ler, o
+    # internamento é refeito e a série volta a apontar para o índice comum
+    def __getstate__(self):
+        datas = self.datas
+        if datas.tz is None and not (datas.asi8 % _NS_DIA).any():
+            datas = (datas.asi8 // _NS_DIA).astype(np.int32), datas.name
+        return datas, self.valores, self.nome
+
+    def __setstate__(self, estado):
+        datas, valores, nome = estado
+        if isinstance(datas, tuple):
+            dias, nome_indice = datas
+            datas = pd.DatetimeIndex(dias.astype("datetime64[D]").astype("datetime64[ns]"), name=nome_indice)
+        self.datas = compartilhar_datas(datas)
+        self.valores = valores
+        self.nome = nome
+
+    def __len__(self):
+        return len(self.valores)
+
+    def __repr__(self):
+        return f"SeriePrecos({self.nome!r}, {len(self)} pregões)"
+
+    @property
+    def empty(self):
+        return len(self.valores) == 0
+
+    @property
+    def nbytes(self):
+        """Bytes próprios da série (o índice de datas é compartilhado e não entra na conta)."""
+        return self.valores.nbytes
+
+    def ultimo(self):
+        return float(self.valores[-1]) if len(self.valores) else None
+
+    def serie(self):
+        """Visão como Series do pandas (mesmo buffer, sem cópia)."""
+        return pd.Series(self.valores, index=self.datas, name=self.nome, copy=False)
+
+    def cauda(self, quantidade):
+        """Os últimos `quantidade` pregões, como visão sobre o mesmo buffer."""
+        return _visao(self.datas[-quantidade:], self.valores[-quantidade:], self.nome)
+
+
+def _visao(datas, valores, nome):
+    # Fatias de uma série já internada: não passam pelo internamento (seriam índices novos)
+    visao = SeriePrecos.__new__(SeriePrecos)
+    visao.datas, visao.valores, visao.nome = datas, valores, nome
+    return visao
+
+
+def como_serie(historico):
+    """Series do pandas a partir de uma SeriePrecos (visão) ou de uma Series/DataFrame de uma coluna."""
+    if isinstance(historico, SeriePrecos):
+        return historico.serie()
+    if isinstance(historico, pd.DataFrame):
+        return historico.iloc[:, 0]
+    return historico
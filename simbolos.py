@@ -0,0 +1,117 @@
+"""Índice local de símbolos da B3 (código -> nome, classe e ticker do yfinance).
+
+Carregado uma vez do ``simbolos_b3.csv`` e mantido em memória em listas ordenadas:
+a validação de um código digitado, o nome de exibição e a busca por prefixo
+(código ou palavra do nome, para o autocompletar) são feitos com ``bisect``, sem
+nenhuma chamada de rede. Códigos com sufixo de outra bolsa (ex.: ``VOD.L``) não
+estão no índice e continuam sendo validados pelo ``.info`` do yfinance, assim como
+códigos da B3 bem formados que faltam no CSV (ETFs como BOVA11, listagens novas).
+"""
+import bisect
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+from sentimento import normalizar
+
+ARQUIVO_SIMBOLOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simbolos_b3.csv")
+
+SUFIXO_YF = ".SA"
+
+# Código de negociação da B3: 4 letras + número do tipo (3 ON, 4 PN, 5-8 PNA-PND, 11 units/FIIs, 31-39 BDRs)
+PADRAO_B3 = re.compile(r"^[A-Z0-9]{4}(?:[3-8]|11|3[1-9])$")
+
+# Mercado fracionário: mesmo ativo do lote padrão com um "F" no fim (ex.: PETR4F)
+PADRAO_FRACIONARIO = re.compile(r"^([A-Z0-9]{4}(?:[3-8]|11|3[1-9]))F$")
+
+
+def normalizar_codigo(texto):
+    """Código de negociação canônico: maiúsculo, sem espaços, sem ``.SA`` e sem o ``F`` do fracionário."""
+    codigo = re.sub(r"\s+", "", str(texto)).upper()
+    if codigo.endswith(SUFIXO_YF):
+        codigo = codigo[: -len(SUFIXO_YF)]
+    fracionario = PADRAO_FRACIONARIO.match(codigo)
+    return fracionario.group(1) if fracionario else codigo
+
+
+def eh_externo(texto):
+    """True para códigos com sufixo de outra bolsa (fora do índice da B3)."""
+    codigo = re.sub(r"\s+", "", str(texto)).upper()
+    return "." in codigo and not codigo.endswith(SUFIXO_YF)
+
+
+def eh_codigo_b3(texto):
+    """True se `texto` tem o formato de um código de negociação da B3 (esteja ou não no índice)."""
+    return not eh_externo(texto) and PADRAO_B3.match(normalizar_codigo(texto)) is not None
+
+
+class IndiceSimbolos:
+    """Códigos e palavras dos nomes em listas ordenadas, para validação e busca por prefixo."""
+
+    def __init__(self, caminho=ARQUIVO_SIMBOLOS):
+        simbolos = pd.read_csv(caminho, dtype=str).fillna("")
+        simbolos["ticker"] = simbolos["ticker"].map(normalizar_codigo)
+        simbolos = simbolos.drop_duplicates("ticker").sort_values("ticker")
+
+        self._ativos = {
+            linha.ticker: {
+                "codigo": linha.ticker,
+                "ticker_yf": linha.ticker + SUFIXO_YF,
+                "nome": linha.nome or linha.ticker,
+                "classe": linha.classe,
+            }
+            for linha in simbolos.itertuples(index=False)
+        }
+        self._codigos = list(self._ativos)
+
+        # (palavra do nome sem acento, código) para achar "petro" -> PETR3/PETR4
+        self._palavras = sorted(
+            (palavra, codigo)
+            for codigo, ativo in self._ativos.items()
+            for palavra in set(normalizar(ativo["nome"]).split())
+        )
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def __contains__(self, texto):
+        return normalizar_codigo(texto) in self._ativos
+
+    def resolver(self, texto):
+        """Dados do ativo (codigo, ticker_yf, nome, classe) ou None se o código não existe na B3."""
+        return self._ativos.get(normalizar_codigo(texto))
+
+    def buscar(self, prefixo, limite=8):
+        """Ativos cujo código (ou uma palavra do nome) começa com `prefixo`, códigos primeiro."""
+        codigo = normalizar_codigo(prefixo)
+        if not codigo:
+            return []
+
+        encontrados = list(_com_prefixo(self._codigos, codigo, limite))
+
+        termo = normalizar(prefixo).strip()
+        if len(encontrados) < limite and termo:
+            inicio = bisect.bisect_left(self._palavras, (termo,))
+            for palavra, codigo_nome in self._palavras[inicio:]:
+                if not palavra.startswith(termo) or len(encontrados) >= limite:
+                    break
+                if codigo_nome not in encontrados:
+                    encontrados.append(codigo_nome)
+
+        return [self._ativos[c] for c in encontrados]
+
+
+def _com_prefixo(ordenados, prefixo, limite):
+    inicio = bisect.bisect_left(ordenados, prefixo)
+    for item in ordenados[inicio:inicio + limite]:
+        if not item.startswith(prefixo):
+            break
+        yield item
+
+
+@lru_cache(maxsize=1)
+def obter_simbolos():
+    """Índice único por processo (o CSV é lido uma vez só)."""
+    return IndiceSimbolos()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+# Os módulos do app ficam na raiz do repositório (sem pacote)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def yahoo_falso(monkeypatch):
+    """yf.Ticker substituído pelos falsos dos benchmarks e cliente do Yahoo sem esperas entre tentativas."""
+    import yfinance
+
+    import cliente_upstream
+    from benchmarks.falsos import Falsos
+
+    falsos = Falsos()
+    monkeypatch.setattr(yfinance, "Ticker", falsos.Ticker)
+    monkeypatch.setitem(cliente_upstream.FONTES, "yahoo", {**cliente_upstream.FONTES["yahoo"], "espera_base": 0.0})
+    cliente_upstream._clientes.pop("yahoo", None)
+    yield falsos
+    cliente_upstream._clientes.pop("yahoo", None)
@@ -0,0 +1,59 @@
+"""Ciclo do agendador: recarrega o que venceu e deixa de fora o que está com falha em cache."""
+import pytest
+
+import cache
+from agendador import Agendador
+from cliente_upstream import FalhaUpstream
+
+
+@pytest.fixture(autouse=True)
+def backend_memoria(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", cache.CacheMemoria())
+
+
+def test_ciclo_pula_tarefa_com_falha_em_cache():
+    chamadas = []
+
+    @cache.cacheado(ttl=60, nome="teste.agendada", ttl_falha=30)
+    def cotacao(ticker):
+        chamadas.append(ticker)
+        if ticker == "VIIA3":
+            raise FalhaUpstream("fora do ar")
+        return 1.0
+
+    agendador = Agendador()
+    agendador.agendar(cotacao, "VIIA3")
+    agendador.agendar(cotacao, "PETR4")
+    for _ in range(5):
+        agendador.ciclo()
+    # PETR4 fica quente depois do primeiro ciclo; VIIA3 só volta à fonte quando a falha expirar
+    assert sorted(chamadas) == ["PETR4", "VIIA3"]
+
+    cotacao.clear()
+    agendador.ciclo()
+    assert sorted(chamadas) == ["PETR4", "PETR4", "VIIA3", "VIIA3"]
+
+
+def test_grupo_so_aquece_enquanto_solicitado():
+    chamadas = []
+
+    @cache.cacheado(ttl=60, nome="teste.universo")
+    def cotacoes(universo):
+        chamadas.append(universo)
+        return 1.0
+
+    agendador = Agendador(validade_demanda=60)
+    agendador.agendar(cotacoes, "blue_chips")
+    agendador.agendar(cotacoes, "b3", grupo="b3")
+    agendador.ciclo()
+    assert chamadas == ["blue_chips"]
+
+    agendador.solicitar("b3")
+    agendador.ciclo()
+    assert chamadas == ["blue_chips", "b3"]
+
+    # Pedido vencido: a entrada da B3 deixa de ser renovada
+    cotacoes.clear()
+    agendador._demandas["b3"] -= 61
+    agendador.ciclo()
+    assert chamadas == ["blue_chips", "b3", "blue_chips"]
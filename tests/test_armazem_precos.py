@@ -0,0 +1,77 @@
+"""Download por ticker do armazém: falhas do Yahoo aparecem e não viram cobertura."""
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from armazem_precos import ArmazemPrecos, baixar_historico, extrair_ticker
+from cliente_upstream import FalhaUpstream
+
+
+def test_baixar_historico_separa_falhas(yahoo_falso):
+    yahoo_falso.limitados = {"VIIA3.SA"}
+    barras, falhas = baixar_historico(["PETR4.SA", "VALE3.SA", "VIIA3.SA"], "2026-01-05", eventos=True)
+
+    assert list(falhas) == ["VIIA3.SA"]
+    assert set(barras.columns.get_level_values("Ticker")) == {"PETR4.SA", "VALE3.SA"}
+    assert {"Close", "Dividends"} <= set(extrair_ticker(barras, "PETR4.SA").columns)
+    assert extrair_ticker(barras, "VIIA3.SA") is None
+
+
+def test_baixar_historico_sem_nenhuma_resposta_levanta(yahoo_falso):
+    yahoo_falso.limitados = {"PETR4.SA"}
+    with pytest.raises(FalhaUpstream):
+        baixar_historico(["PETR4.SA"], "2026-01-05")
+
+
+def test_sincronizar_nao_marca_ticker_que_falhou(tmp_path, yahoo_falso):
+    armazem = ArmazemPrecos(str(tmp_path / "precos.sqlite"))
+    yahoo_falso.limitados = {"VIIA3.SA"}
+    armazem.sincronizar(["PETR4.SA", "VIIA3.SA"], dias=30)
+    assert list(armazem._estado_sincronizacao(["PETR4.SA", "VIIA3.SA"])) == ["PETR4.SA"]
+
+    yahoo_falso.limitados = set()
+    armazem.sincronizar(["PETR4.SA", "VIIA3.SA"], dias=30)
+    fechamentos = armazem.fechamentos(["PETR4.SA", "VIIA3.SA"], dias=30)
+    assert fechamentos["VIIA3.SA"].notna().sum() > 10
+
+
+@pytest.mark.parametrize("inicio", [
+    pd.Timestamp.now(tz="UTC").floor("min") - pd.Timedelta(days=5),
+    pd.Timestamp.today().normalize() - pd.Timedelta(days=5),
+    date.today() - timedelta(days=5),
+])
+def test_baixar_historico_repassa_datas_ao_yfinance(yahoo_falso, inicio):
+    # Como na consulta intradiária: o Timestamp não pode virar texto com horário
+    barras, falhas = baixar_historico(["PETR4.SA"], inicio, intervalo="1m")
+    assert not falhas
+    assert extrair_ticker(barras, "PETR4.SA")["Close"].notna().any()
+
+
+def test_falso_recusa_texto_com_horario(yahoo_falso):
+    # O falso converte `start` como o yfinance: texto só em AAAA-MM-DD
+    with pytest.raises(FalhaUpstream):
+        baixar_historico(["PETR4.SA"], "2026-01-05T00:00:00")
+
+
+def test_ticker_fora_de_negociacao_fica_sem_dados(tmp_path, yahoo_falso):
+    # Sem fuso horário no Yahoo (YFTzMissingError): resposta válida, sem barras, sem nova tentativa
+    yahoo_falso.delistados = {"VIIA3.SA"}
+    barras, falhas = baixar_historico(["PETR4.SA", "VIIA3.SA"], "2026-01-05")
+    assert not falhas
+    assert extrair_ticker(barras, "VIIA3.SA") is None
+    assert yahoo_falso.chamadas["history"] == 2
+
+    armazem = ArmazemPrecos(str(tmp_path / "precos.sqlite"))
+    armazem.sincronizar(["VIIA3.SA"], dias=30)
+    assert list(armazem._estado_sincronizacao(["VIIA3.SA"])) == ["VIIA3.SA"]
+
+
+def test_codigo_desconhecido_no_info_e_invalido(yahoo_falso, monkeypatch):
+    import cache
+    import nucleo
+
+    monkeypatch.setattr(cache, "_backend", cache.CacheMemoria())
+    # Com as exceções do yfinance ligadas, o .info de um código inexistente é um HTTP 404
+    assert nucleo.carregar_info_ativo("INVALIDO3")["valido"] is False
+    assert nucleo.carregar_info_ativo("PETR4")["valido"] is True
@@ -0,0 +1,146 @@
+"""Backends do cache: acesso LRU preguiçoso no SQLite e o backend Redis (via fakeredis)."""
+import pytest
+
+import cache
+from cliente_upstream import FalhaUpstream
+
+
+def test_sqlite_acerto_nao_regrava_acesso_recente(tmp_path):
+    backend = cache.CacheSQLite(str(tmp_path / "cache.sqlite"))
+    backend.gravar("a", {"x": 1}, ttl=60)
+    with backend._conectar() as conexao:
+        antes = conexao.execute("SELECT acessado_em FROM cache WHERE chave = 'a'").fetchone()[0]
+    assert backend.ler("a") == ({"x": 1},)
+    with backend._conectar() as conexao:
+        depois = conexao.execute("SELECT acessado_em FROM cache WHERE chave = 'a'").fetchone()[0]
+    assert depois == antes
+
+
+def test_sqlite_despeja_o_menos_acessado(tmp_path):
+    backend = cache.CacheSQLite(str(tmp_path / "cache.sqlite"), max_bytes=2500)
+    backend.gravar("velha", b"x" * 1000, ttl=60)
+    backend.gravar("nova", b"x" * 1000, ttl=60)
+    # Um acesso mais antigo que a resolução faz a entrada subir na ordem LRU
+    with backend._conectar() as conexao:
+        conexao.execute("UPDATE cache SET acessado_em = acessado_em - ?", (2 * cache.RESOLUCAO_ACESSO,))
+    assert backend.ler("velha") is not None
+    backend.gravar("terceira", b"x" * 1000, ttl=60)
+    assert backend.ler("nova") is None
+    assert backend.ler("velha") is not None
+    assert backend.estatisticas()["despejos"] == 1
+
+
+@pytest.fixture
+def redis_falso(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    class RedisFalso(fakeredis.FakeRedis):
+        # O fakeredis não implementa INFO nem despeja por maxmemory: o contador vem daqui
+        evicted_keys = 0
+
+        def info(self, secao=None, *args, **kwargs):
+            return {"evicted_keys": RedisFalso.evicted_keys}
+
+    monkeypatch.setattr(redis.Redis, "from_url", RedisFalso.from_url)
+    return RedisFalso
+
+
+def test_redis_ler_gravar_idade_e_limpar(redis_falso):
+    backend = cache.CacheRedis("redis://cache-teste:6379/0")
+    assert backend.ler("mercado:1") is None
+    backend.gravar("mercado:1", {"PETR4": 38.5}, ttl=60)
+    assert backend.ler("mercado:1") == ({"PETR4": 38.5},)
+    assert 0 <= backend.idade("mercado:1") < 5
+    assert backend._cliente.ttl(backend.prefixo + "mercado:1") <= 60
+
+    backend.limpar("mercado:")
+    assert backend.ler("mercado:1") is None
+    assert backend.idade("mercado:1") is None
+    assert backend.estatisticas() == {"acertos": 1, "erros": 2, "gravacoes": 1, "despejos": 0}
+
+
+def test_redis_trava_compartilhada_entre_replicas(redis_falso):
+    replica_a = cache.CacheRedis("redis://cache-teste:6379/0")
+    replica_b = cache.CacheRedis("redis://cache-teste:6379/0")
+    assert replica_a.travar("chave", 30)
+    assert not replica_b.travar("chave", 30)
+
+
+def test_redis_despejos_vem_do_info_stats(redis_falso):
+    redis_falso.evicted_keys = 7
+    backend = cache.CacheRedis("redis://cache-teste:6379/0")
+    redis_falso.evicted_keys = 12
+    assert backend.estatisticas()["despejos"] == 5
+
+
+def test_cacheado_com_redis(redis_falso, monkeypatch):
+    monkeypatch.setattr(cache, "_backend", cache.CacheRedis("redis://cache-teste:6379/1"))
+    chamadas = []
+
+    @cache.cacheado(ttl=60, nome="teste.dobro")
+    def dobro(x):
+        chamadas.append(x)
+        return 2 * x
+
+    assert dobro(21) == 42
+    assert dobro(21) == 42
+    assert chamadas == [21]
+    dobro.clear()
+    assert dobro(21) == 42
+    assert chamadas == [21, 21]
+
+
+def test_recarregar_respeita_falha_em_cache(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", cache.CacheMemoria())
+    chamadas = []
+
+    @cache.cacheado(ttl=60, nome="teste.fora_do_ar", ttl_falha=30)
+    def cotacao(ticker):
+        chamadas.append(ticker)
+        raise FalhaUpstream("fora do ar")
+
+    with pytest.raises(FalhaUpstream):
+        cotacao.recarregar("VIIA3")
+    assert cotacao.em_falha("VIIA3")
+    # Dentro de ttl_falha nem a recarga nem a leitura voltam à fonte
+    assert cotacao.recarregar("VIIA3") is None
+    with pytest.raises(FalhaUpstream):
+        cotacao("VIIA3")
+    assert chamadas == ["VIIA3"]
+    assert not cotacao.em_falha("PETR4")
+
+
+def test_consulta_da_falha_nao_conta_nas_estatisticas(monkeypatch):
+    backend = cache.CacheMemoria()
+    monkeypatch.setattr(cache, "_backend", backend)
+
+    @cache.cacheado(ttl=60, nome="teste.triplo", ttl_falha=30)
+    def triplo(x):
+        return 3 * x
+
+    assert triplo(2) == 6
+    assert not triplo.em_falha(2)
+    assert triplo(2) == 6
+    assert backend.estatisticas() == {"acertos": 1, "erros": 1, "gravacoes": 1, "despejos": 0}
+
+
+def test_redis_fora_do_ar_chama_a_funcao(monkeypatch):
+    pytest.importorskip("redis")
+    # Porta 1 recusa a conexão na hora
+    backend = cache.CacheRedis("redis://127.0.0.1:1/0")
+    monkeypatch.setattr(cache, "_backend", backend)
+    chamadas = []
+
+    @cache.cacheado(ttl=60, nome="teste.quadrado", ttl_falha=30)
+    def quadrado(x):
+        chamadas.append(x)
+        return x * x
+
+    assert quadrado(3) == 9
+    assert quadrado.recarregar(3) == 9
+    assert quadrado.idade(3) is None
+    assert not quadrado.em_falha(3)
+    quadrado.clear()
+    assert chamadas == [3, 3]
+    assert backend.estatisticas()["gravacoes"] == 0
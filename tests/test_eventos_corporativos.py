@@ -0,0 +1,44 @@
+"""Índice de eventos: os proventos vêm do download de barras do armazém, sem consulta própria."""
+import pytest
+
+import eventos_corporativos
+from cliente_upstream import obter_cliente
+
+
+@pytest.fixture
+def indice(tmp_path):
+    return eventos_corporativos.IndiceEventos(str(tmp_path / "precos.sqlite"))
+
+
+def test_ticker_limitado_nao_fica_marcado(indice, yahoo_falso):
+    yahoo_falso.limitados = {"VIIA3.SA"}
+    indice.sincronizar(["PETR4.SA", "VIIA3.SA"])
+
+    assert list(indice._armazem._estado_sincronizacao(["PETR4.SA", "VIIA3.SA"])) == ["PETR4.SA"]
+    assert len(indice.eventos("PETR4.SA", tipo="provento")) > 0
+    # O limite de taxa é tentado de novo pelo cliente (e conta contra o disjuntor)
+    assert yahoo_falso.chamadas["history"] == 1 + obter_cliente("yahoo").tentativas
+
+    # Na próxima sincronização só o que faltou volta à fonte
+    yahoo_falso.limitados = set()
+    yahoo_falso.chamadas["history"] = 0
+    indice.sincronizar(["PETR4.SA", "VIIA3.SA"])
+    assert yahoo_falso.chamadas["history"] == 1
+    assert len(indice._armazem._estado_sincronizacao(["PETR4.SA", "VIIA3.SA"])) == 2
+
+
+def test_lote_inteiro_sem_resposta_nao_grava_nada(indice, yahoo_falso):
+    yahoo_falso.limitados = {"PETR4.SA", "VALE3.SA"}
+    indice.sincronizar(["PETR4.SA", "VALE3.SA"])
+    assert indice._armazem._estado_sincronizacao(["PETR4.SA", "VALE3.SA"]) == {}
+
+
+def test_reaproveita_os_eventos_do_download_de_cotacoes(indice, yahoo_falso):
+    indice._armazem.sincronizar(["PETR4.SA"], dias=365 * eventos_corporativos.ANOS_HISTORICO)
+    assert yahoo_falso.chamadas["history"] == 1
+    total = indice.total_12m(["PETR4.SA"]).iloc[0]
+    assert total > 0
+
+    indice.sincronizar(["PETR4.SA"])
+    assert yahoo_falso.chamadas["history"] == 1
+    assert indice.total_12m(["PETR4.SA"]).iloc[0] == total
@@ -0,0 +1,107 @@
+"""Paridade exata entre os indicadores incrementais e o cálculo em lote."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicadores
+from armazem_precos import ArmazemPrecos
+
+
+def _passeio(quantidade, semente=0):
+    rng = np.random.default_rng(semente)
+    datas = pd.bdate_range("2024-01-02", periods=quantidade)
+    return pd.Series(20 * np.exp(np.cumsum(rng.normal(0, 0.02, quantidade))), index=datas)
+
+
+def _com_repeticoes(quantidade):
+    # Trechos sem negócio (preço repetido) e números redondos, que expõem resíduos de ponto flutuante
+    serie = _passeio(quantidade, semente=1).round(2)
+    serie.iloc[30:60] = serie.iloc[30]
+    serie.iloc[100:103] = 10.0
+    return serie
+
+
+@pytest.mark.parametrize("serie", [
+    _passeio(500),
+    _passeio(500, semente=7) * 1000,
+    _com_repeticoes(250),
+    _passeio(12),
+    pd.Series(np.full(40, 5.0), index=pd.bdate_range("2024-01-02", periods=40)),
+])
+def test_paridade_barra_a_barra(serie):
+    assert indicadores.conferir_paridade(serie) == 0
+
+
+def _gravar_barras(armazem, ticker, serie):
+    with armazem._conectar() as conexao:
+        conexao.executemany(
+            "INSERT OR REPLACE INTO barras (ticker, data, fechamento) VALUES (?, ?, ?)",
+            [(ticker, data.strftime("%Y-%m-%d"), float(preco)) for data, preco in serie.items()],
+        )
+
+
+def test_estado_persistido_bate_com_lote(tmp_path):
+    caminho = str(tmp_path / "precos.sqlite")
+    serie = _passeio(300, semente=3)
+    serie.index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=len(serie))
+
+    # Barras chegando em blocos, com "restart" (instância nova) entre eles
+    for fim in (50, 51, 120, 200, 300):
+        armazem = ArmazemPrecos(caminho)
+        _gravar_barras(armazem, "TESTE3.SA", serie.iloc[:fim])
+        estado = armazem.indicadores_incrementais(["TESTE3.SA"])["TESTE3.SA"]
+
+        parcial = serie.iloc[:fim]
+        # O estado para na penúltima barra; a última entra como barra em formação
+        assert estado.ultima_data == parcial.index[-2]
+        assert estado.mms.espiar(parcial.iloc[-1]) == indicadores.mms(parcial).iloc[-1]
+        assert estado.ifr.espiar(parcial.iloc[-1]) == indicadores.ifr(parcial).iloc[-1]
+
+
+def test_ultima_barra_pode_mudar(tmp_path):
+    armazem = ArmazemPrecos(str(tmp_path / "precos.sqlite"))
+    serie = _passeio(80, semente=5)
+    serie.index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=len(serie))
+    _gravar_barras(armazem, "TESTE3.SA", serie)
+    armazem.indicadores_incrementais(["TESTE3.SA"])
+
+    # Pregão em andamento: o último fechamento é regravado e o estado não pode tê-lo consolidado
+    serie.iloc[-1] *= 1.05
+    _gravar_barras(armazem, "TESTE3.SA", serie.iloc[-1:])
+    estado = armazem.indicadores_incrementais(["TESTE3.SA"])["TESTE3.SA"]
+    assert estado.mms.espiar(serie.iloc[-1]) == indicadores.mms(serie).iloc[-1]
+    assert estado.ifr.espiar(serie.iloc[-1]) == indicadores.ifr(serie).iloc[-1]
+
+
+def test_calcular_sinais_com_lacunas_bate_com_um_ativo_so():
+    import nucleo
+
+    datas = pd.bdate_range("2024-01-02", periods=120)
+    matriz = pd.DataFrame({
+        "CHEIO3.SA": _passeio(120, semente=11).to_numpy(),
+        "LACUNAS3.SA": _passeio(120, semente=12).to_numpy(),
+        "LISTADO3.SA": _passeio(120, semente=13).to_numpy(),
+        "POUCO3.SA": _passeio(120, semente=14).to_numpy(),
+    }, index=datas)
+    # Dias sem negócio espalhados, listagem recente e histórico curto demais para a MMS
+    matriz.iloc[[5, 6, 40, 41, 42, 90, 118], 1] = np.nan
+    matriz.iloc[:95, 2] = np.nan
+    matriz.iloc[:, 3] = np.nan
+    matriz.iloc[[100, 104, 108, 110, 111, 112, 113, 114, 115, 116, 117, 119], 3] = 30.0 + np.arange(12)
+
+    sinais = indicadores.calcular_sinais(matriz)
+    emojis_mms = {indicadores.ALTA: "🟢", indicadores.QUEDA: "🔴", indicadores.NEUTRO: "🟡", indicadores.SEM_DADOS: "⚪"}
+    for ticker in matriz.columns:
+        serie = matriz[ticker].dropna()
+        linha = sinais.loc[ticker]
+        assert linha["preco"] == serie.iloc[-1]
+
+        _, emoji, medias = nucleo.calcular_sinal_mms20(serie)
+        ultima_mms = medias.iloc[-1] if len(medias) else np.nan
+        np.testing.assert_equal(linha["mms"], ultima_mms)
+        assert emojis_mms[linha["codigo_mms"]] == emoji
+
+        _, ifr_atual = nucleo.calcular_rsi(serie)
+        np.testing.assert_equal(linha["ifr"], np.nan if ifr_atual is None else ifr_atual)
+        _, emoji_ifr = nucleo.calcular_sinal_rsi(ifr_atual)
+        assert linha["sinal_ifr"].startswith(emoji_ifr)
@@ -0,0 +1,49 @@
+"""Modo ao vivo: a consulta à rede não segura as leituras nem se sobrepõe a outra."""
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import intraday
+
+
+def _cotacoes(tickers):
+    cotacoes = intraday.CotacoesIntraday(tickers, intervalo=0)
+    vazio = [None] * len(tickers)
+    cotacoes._trocar_referencias(date.today(), np.full(len(tickers), 10.0), np.full(len(tickers), 9.0), None, vazio, vazio)
+    return cotacoes
+
+
+def test_leituras_nao_esperam_a_consulta(monkeypatch):
+    cotacoes = _cotacoes(["PETR4.SA", "VALE3.SA"])
+    chegou, liberar = threading.Event(), threading.Event()
+    chamadas = []
+
+    def baixar(lote, inicio, intervalo):
+        chamadas.append(lote)
+        chegou.set()
+        liberar.wait(5)
+        indice = pd.DatetimeIndex([pd.Timestamp.now(tz="UTC").floor("min")])
+        colunas = pd.MultiIndex.from_product([["Close"], lote], names=["Price", "Ticker"])
+        return pd.DataFrame([[11.0] * len(lote)], index=indice, columns=colunas), {}
+
+    monkeypatch.setattr(intraday, "baixar_historico", baixar)
+    consulta = threading.Thread(target=cotacoes.atualizar)
+    consulta.start()
+    assert chegou.wait(5)
+
+    # Durante o download: leituras respondem com o último pregão e uma segunda consulta não vai à rede
+    assert cotacoes.quadro()["Preço (R$)"].tolist() == [10.0, 10.0]
+    assert cotacoes.atualizar(forcar=True) == 0
+    assert len(chamadas) == 1
+
+    liberar.set()
+    consulta.join(5)
+    assert cotacoes.alterados == 2
+    assert cotacoes.quadro()["Preço (R$)"].tolist() == [11.0, 11.0]
+
+
+def test_intervalo_acompanha_o_tamanho_do_universo(yahoo_falso):
+    assert intraday.intervalo_minimo(10) == intraday.INTERVALO_PADRAO
+    assert intraday.intervalo_minimo(474) == 24
@@ -0,0 +1,29 @@
+"""Regras de casamento do léxico de sentimento."""
+import pytest
+
+from sentimento import Lexico, normalizar, obter_lexico
+
+
+@pytest.mark.parametrize("titulo, score", [
+    ("Ações em ALTA após lucro recorde", 3),
+    ("Resultado altamente volátil", 0),
+    ("Caixa eleva recomendação", 0),
+    ("Papel cai 5%", -1),
+    ("Empresa aprova juros sobre capital próprio", 2),
+    ("Juros, sobre capital próprio", 0),
+    ("Prejuízo e dívida: ações caem", -3),
+    ("lucros lucro LUCROS", 1),
+])
+def test_pontuar(titulo, score):
+    assert obter_lexico().pontuar(titulo) == score
+
+
+def test_termo_composto_vence_palavras_soltas():
+    lexico = Lexico([("juros", -1), ("juros sobre capital proprio", 2), ("capital*", 5)])
+    assert lexico.pontuar("JCP: juros sobre capital próprio") == 2
+    assert lexico.pontuar("juros sobre o capital") == 4
+
+
+def test_normalizar():
+    assert normalizar("Ação ÉPICA") == "acao epica"
+    assert normalizar("Ação") == "acao"
@@ -0,0 +1,19 @@
+"""Índice local de símbolos e o formato dos códigos da B3."""
+import pytest
+
+from simbolos import eh_codigo_b3, obter_simbolos
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("PETR4", True), ("petr4.sa", True), ("PETR4F", True), ("BOVA11", True),
+    ("VIIA3", True), ("AAPL34", True), ("XPTO", False), ("PETR9", False), ("VOD.L", False),
+])
+def test_eh_codigo_b3(texto, esperado):
+    assert eh_codigo_b3(texto) is esperado
+
+
+def test_codigo_fora_do_csv_fica_para_o_info():
+    # ETFs não estão no CSV: a validação cai no .info, não numa rejeição local
+    simbolos = obter_simbolos()
+    assert "PETR4" in simbolos
+    assert "BOVA11" not in simbolos and eh_codigo_b3("BOVA11")